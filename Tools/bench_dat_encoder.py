@@ -0,0 +1,113 @@
+"""
+.dat 编码基准：比较 columnar 与 protobuf 两种编码方式在不同行数、列数下的耗时，并校验输出一致。
+
+用法（在仓库根目录执行）：
+    poetry run python Tools/bench_dat_encoder.py --rows 1000,10000,100000 --columns 4,16,32
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import data_generator
+import dat_encoder
+
+# 合成表按此顺序循环使用各字段类型
+TYPE_CYCLE = ("int", "string", "float", "bool", "long", "time", "string|null", "int|null")
+
+
+def make_table(row_count, column_count, seed=0):
+    """
+    生成合成表：首列为 id|int，其余列按 TYPE_CYCLE 循环取类型。
+    """
+    rng = np.random.default_rng(seed)
+    data = {"id|int": np.arange(1, row_count + 1, dtype=np.int64)}
+
+    for index in range(1, column_count):
+        field_type = TYPE_CYCLE[index % len(TYPE_CYCLE)]
+        base_type = field_type.split('|')[0]
+        column = f"f{index}|{field_type}"
+
+        if base_type == "int":
+            values = rng.integers(-1000, 100000, row_count)
+        elif base_type == "long":
+            values = rng.integers(-(1 << 40), 1 << 40, row_count)
+        elif base_type == "float":
+            values = rng.uniform(-1000, 1000, row_count)
+        elif base_type == "bool":
+            values = rng.integers(0, 2, row_count)
+        elif base_type == "time":
+            seconds = rng.integers(0, 2_000_000_000, row_count).astype("datetime64[s]")
+            values = pd.to_datetime(seconds).strftime(dat_encoder.TIME_FORMAT).to_numpy(dtype=object)
+        else:
+            values = np.array([f"key_{v}" for v in rng.integers(0, 5000, row_count)], dtype=object)
+
+        if field_type.endswith("|null"):
+            values = values.astype(object)
+            values[rng.random(row_count) < 0.1] = np.nan
+
+        data[column] = values
+
+    return pd.DataFrame(data)
+
+
+def time_call(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(row_counts, column_counts, repeat, skip_protobuf):
+    results = []
+    for column_count in column_counts:
+        for row_count in row_counts:
+            table_name = f"Bench{column_count}x{row_count}"
+            df = make_table(row_count, column_count)
+
+            columnar_time, columnar_bytes = time_call(lambda: dat_encoder.encode_table(df), repeat)
+            result = {
+                "rows": row_count,
+                "columns": column_count,
+                "bytes": len(columnar_bytes),
+                "columnar_seconds": columnar_time,
+            }
+
+            if not skip_protobuf:
+                protobuf_time, protobuf_bytes = time_call(
+                    lambda: data_generator.encode_table_protobuf(df, table_name), repeat)
+                if protobuf_bytes != columnar_bytes:
+                    raise RuntimeError(f"Encoders disagree for {table_name}")
+                result["protobuf_seconds"] = protobuf_time
+                result["speedup"] = protobuf_time / columnar_time if columnar_time > 0 else float("inf")
+
+            results.append(result)
+            print_result(result)
+    return results
+
+
+def print_result(result):
+    line = f"rows={result['rows']:>8} columns={result['columns']:>3} bytes={result['bytes']:>11} " \
+           f"columnar={result['columnar_seconds'] * 1000:>10.1f}ms"
+    if "protobuf_seconds" in result:
+        line += f" protobuf={result['protobuf_seconds'] * 1000:>10.1f}ms speedup={result['speedup']:>6.1f}x"
+    print(line)
+
+
+def parse_int_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the columnar .dat encoder against the protobuf encoder.")
+    parser.add_argument("--rows", type=parse_int_list, default=[1000, 10000, 100000], help="逗号分隔的行数列表")
+    parser.add_argument("--columns", type=parse_int_list, default=[4, 16, 32], help="逗号分隔的列数列表")
+    parser.add_argument("--repeat", type=int, default=3, help="每组取最快的一次")
+    parser.add_argument("--skip-protobuf", action="store_true", help="只测 columnar 编码")
+    args = parser.parse_args()
+
+    run(args.rows, args.columns, args.repeat, args.skip_protobuf)
@@ -0,0 +1,324 @@
+"""
+整条流水线的基准：生成合成工作簿，分别统计读取、表头解析、校验、.proto、protoc、.dat 各阶段耗时，
+结果保存为 JSON，并可与基线结果比较以发现性能回退。
+
+用法（在仓库根目录执行）：
+    poetry run python Tools/bench_pipeline.py --rows 20000 --columns 24 --tables 4 --output bench.json
+    poetry run python Tools/bench_pipeline.py --rows 20000 --columns 24 --tables 4 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import code_generator
+import data_generator
+import dat_encoder
+import excel_reader
+import util
+import validator
+from key_index import KeyIndex
+from schema import SUPPORTED_TYPES, build_table_schema
+
+RESULT_FORMAT = 1
+
+# 合成表引用的父表
+PARENT_TABLE_NAME = "BenchParent"
+
+# 各阶段，按流水线顺序
+STAGES = ("read_excel", "build_schema", "validate_excel", "generate_proto_file", "protoc", "generate_dat_file")
+
+DEFAULT_TYPE_MIX = "int:3,string:3,float:1,bool:1,long:1,time:1"
+
+# 耗时差小于该值（秒）时不视为回退，避免短阶段的噪声
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def parse_type_mix(text):
+    """
+    解析 'int:3,string:2,float' 形式的类型权重。
+
+    :return: (类型列表, 归一化后的权重数组)
+    """
+    types = []
+    weights = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        field_type, _, weight = item.partition(':')
+        if field_type not in SUPPORTED_TYPES:
+            raise argparse.ArgumentTypeError(f"Unsupported type in type mix: '{field_type}'")
+        types.append(field_type)
+        weights.append(float(weight) if weight else 1.0)
+    if not types or sum(weights) <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid type mix: '{text}'")
+    weights = np.array(weights)
+    return types, weights / weights.sum()
+
+
+def make_parent_table(row_count):
+    return pd.DataFrame({
+        "id|int": np.arange(1, row_count + 1),
+        "name|string": [f"parent_{i}" for i in range(1, row_count + 1)],
+    })
+
+
+def make_table(row_count, column_count, type_mix, null_ratio, fk_fanout, parent_rows, seed=0):
+    """
+    生成一张合成表：首列为 id|int，其后 fk_fanout 列引用父表 id，其余列按 type_mix 随机取类型。
+    null_ratio 大于 0 时 string/float/bool/time 列带 |null 标记并按比例置空
+    （int/long 列含空值时会被 pandas 读为浮点列而无法通过整数校验，因此不置空）；一半的 int 列带 Range 约束。
+    """
+    rng = np.random.default_rng(seed)
+    types, weights = type_mix
+    data = {"id|int": np.arange(1, row_count + 1)}
+
+    def with_nulls(values, header, field_type):
+        if null_ratio <= 0 or field_type in dat_encoder.INT_RANGES:
+            return values, header
+        values = np.asarray(values, dtype=object)
+        values[rng.random(row_count) < null_ratio] = None
+        return values, header + "|null"
+
+    for index in range(1, column_count):
+        if index <= fk_fanout:
+            values = rng.integers(1, parent_rows + 1, row_count)
+            field_type = "int"
+            header = f"ref{index}|int^id({PARENT_TABLE_NAME})"
+        else:
+            field_type = types[rng.choice(len(types), p=weights)]
+            header = f"f{index}|{field_type}"
+            if field_type == "int":
+                values = rng.integers(0, 100000, row_count)
+                if index % 2 == 0:
+                    header = f"f{index}|int^Range(0,100000)"
+            elif field_type == "long":
+                values = rng.integers(-(1 << 40), 1 << 40, row_count)
+            elif field_type == "float":
+                values = rng.uniform(-1000, 1000, row_count).round(3)
+            elif field_type == "bool":
+                values = rng.integers(0, 2, row_count).astype(bool)
+            elif field_type == "time":
+                seconds = rng.integers(0, 2_000_000_000, row_count).astype("datetime64[s]")
+                values = pd.to_datetime(seconds).strftime(dat_encoder.TIME_FORMAT).to_numpy(dtype=object)
+            else:
+                values = np.array([f"key_{v}" for v in rng.integers(0, 5000, row_count)], dtype=object)
+        values, header = with_nulls(values, header, field_type)
+        data[header] = values
+
+    return pd.DataFrame(data)
+
+
+def write_workbook(df, file_path):
+    """
+    用 openpyxl 只写模式写出工作簿（第一行为表头）。
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        sheet.append([_to_cell(value) for value in row])
+    workbook.save(file_path)
+
+
+def _to_cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def generate_workbooks(work_dir, args):
+    """
+    生成父表和 args.tables 张合成表。
+
+    :return: 工作簿路径列表
+    """
+    excel_dir = os.path.join(work_dir, "Excel")
+    os.makedirs(excel_dir, exist_ok=True)
+
+    file_paths = [os.path.join(excel_dir, f"{PARENT_TABLE_NAME}.xlsx")]
+    write_workbook(make_parent_table(args.parent_rows), file_paths[0])
+
+    for index in range(args.tables):
+        df = make_table(args.rows, args.columns, args.types, args.null_ratio, args.fk_fanout, args.parent_rows,
+                        args.seed + index)
+        file_path = os.path.join(excel_dir, f"Bench{index}.xlsx")
+        write_workbook(df, file_path)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def run_pipeline(file_paths, out_dir, reader, skip_protoc):
+    """
+    按流水线顺序执行一次，返回各阶段的总耗时（秒）。
+    """
+    dirs = {name: os.path.join(out_dir, name) for name in ("proto", "dat", "python", "csharp")}
+    for directory in dirs.values():
+        os.makedirs(directory, exist_ok=True)
+
+    stages = dict.fromkeys(STAGES, 0.0)
+    table_names = [os.path.splitext(os.path.basename(file_path))[0] for file_path in file_paths]
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        stages[stage] += time.perf_counter() - start
+        return result
+
+    tables = {name: timed("read_excel", excel_reader.read_excel, path, reader)
+              for name, path in zip(table_names, file_paths)}
+    schemas = {name: timed("build_schema", build_table_schema, name, tables[name].columns) for name in table_names}
+
+    key_index = KeyIndex(tables, schemas)
+    for name in table_names:
+        tables[name] = timed("validate_excel", validator.validate_excel, tables[name], schemas[name], key_index)
+
+    proto_files = []
+    for name in table_names:
+        proto_file = os.path.join(dirs["proto"], f"{name}.proto")
+        timed("generate_proto_file", data_generator.generate_proto_file, proto_file, name, schemas[name])
+        proto_files.append(proto_file)
+
+    if skip_protoc:
+        del stages["protoc"]
+    else:
+        errors = timed("protoc", code_generator.generate_code, proto_files, dirs["python"], dirs["csharp"])
+        if errors:
+            raise RuntimeError(f"protoc failed: {errors}")
+
+    for name in table_names:
+        dat_file = os.path.join(dirs["dat"], f"{name}.dat")
+        timed("generate_dat_file", data_generator.generate_dat_file, tables[name], name, dat_file, "columnar",
+              schemas[name])
+
+    return stages
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.keep_dir or tmp_dir
+        start = time.perf_counter()
+        file_paths = generate_workbooks(work_dir, args)
+        print(f"Generated {len(file_paths)} workbooks in {time.perf_counter() - start:.1f}s")
+
+        best = None
+        for repeat in range(args.repeat):
+            # 每次使用新的输出目录，避免内容未变化时跳过写文件
+            stages = run_pipeline(file_paths, os.path.join(work_dir, f"out{repeat}"), args.reader, args.skip_protoc)
+            best = stages if best is None else {stage: min(best[stage], stages[stage]) for stage in best}
+
+    return {
+        "format": RESULT_FORMAT,
+        "config": get_config(args),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "tool_version": util.TOOL_VERSION,
+        },
+        "stages": best,
+        "total": sum(best.values()),
+    }
+
+
+def get_config(args):
+    return {
+        "rows": args.rows,
+        "columns": args.columns,
+        "tables": args.tables,
+        "types": args.type_mix_text,
+        "null_ratio": args.null_ratio,
+        "fk_fanout": args.fk_fanout,
+        "parent_rows": args.parent_rows,
+        "reader": args.reader,
+        "repeat": args.repeat,
+        "seed": args.seed,
+    }
+
+
+def print_result(result):
+    for stage, seconds in result["stages"].items():
+        print(f"{stage:<22}{seconds * 1000:>12.1f}ms")
+    print(f"{'total':<22}{result['total'] * 1000:>12.1f}ms")
+
+
+def compare(result, baseline, threshold):
+    """
+    与基线比较：耗时超过基线 (1 + threshold) 倍且差值超过 MIN_REGRESSION_SECONDS 的阶段视为回退。
+
+    :return: 回退的阶段列表
+    """
+    if baseline.get("config") != result["config"]:
+        print("Warning: benchmark config differs from the baseline; results may not be comparable.")
+
+    regressions = []
+    print(f"\n{'stage':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    rows = list(result["stages"].items()) + [("total", result["total"])]
+    for stage, seconds in rows:
+        base = baseline["total"] if stage == "total" else baseline.get("stages", {}).get(stage)
+        if base is None:
+            print(f"{stage:<22}{'-':>12}{seconds * 1000:>10.1f}ms")
+            continue
+        change = (seconds - base) / base if base > 0 else 0.0
+        regressed = seconds > base * (1 + threshold) and seconds - base > MIN_REGRESSION_SECONDS
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{stage:<22}{base * 1000:>10.1f}ms{seconds * 1000:>10.1f}ms{change:>+10.1%}{flag}")
+        if regressed:
+            regressions.append(stage)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the Excel -> .proto/.dat pipeline.")
+    parser.add_argument("--rows", type=int, default=10000, help="每张合成表的行数")
+    parser.add_argument("--columns", type=int, default=16, help="每张合成表的列数（含 id 和外键列）")
+    parser.add_argument("--tables", type=int, default=4, help="合成表数量（不含父表）")
+    parser.add_argument("--types", default=DEFAULT_TYPE_MIX, help="字段类型权重，如 'int:3,string:2,float:1'")
+    parser.add_argument("--null-ratio", type=float, default=0.1, help="非 id 列的空值比例，0 表示不带 |null")
+    parser.add_argument("--fk-fanout", type=int, default=2, help="每张合成表引用父表 id 的外键列数")
+    parser.add_argument("--parent-rows", type=int, default=1000, help="父表行数")
+    parser.add_argument("--reader", choices=excel_reader.READER_MODES, default="pandas", help="工作簿读取方式")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数，各阶段取最快的一次")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-protoc", action="store_true", help="跳过 protoc 阶段")
+    parser.add_argument("--keep-dir", default=None, help="保留合成工作簿和输出的目录（默认使用临时目录）")
+    parser.add_argument("--output", default=None, help="结果 JSON 的保存路径")
+    parser.add_argument("--compare", default=None, help="基线结果 JSON，与之比较并在回退时返回非零退出码")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定回退的相对阈值")
+    args = parser.parse_args(argv)
+
+    if args.fk_fanout >= args.columns:
+        parser.error("--fk-fanout must be less than --columns")
+    args.type_mix_text = args.types
+    args.types = parse_type_mix(args.types)
+    return args
+
+
+if __name__ == "__main__":
+
+    args = parse_args()
+    result = run(args)
+    print_result(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
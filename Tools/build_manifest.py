@@ -0,0 +1,127 @@
+import json
+import os
+import util
+
+# 清单文件格式版本：结构变化时修改
+MANIFEST_FORMAT = 1
+
+
+class BuildManifest:
+    """
+    增量构建清单：记录每张表上次成功构建时的输入摘要、表头和输出文件摘要。
+
+    构建时只重做输入变化、输出缺失/被改动的表，以及外键引用了这些表的表；
+    其余表的输出文件保持原样（内容和修改时间都不变）。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tables = {}  # table_name -> 记录
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取清单文件；文件不存在、损坏或工具版本不一致时返回空清单（即全量构建）。
+        """
+        manifest = cls(path)
+        if not path or not os.path.exists(path):
+            return manifest
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+
+        if content.get("format") != MANIFEST_FORMAT or content.get("tool_version") != util.TOOL_VERSION:
+            return manifest
+
+        manifest.tables = content.get("tables", {})
+        return manifest
+
+    def save(self):
+        if not self.path:
+            return
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        content = {
+            "format": MANIFEST_FORMAT,
+            "tool_version": util.TOOL_VERSION,
+            "tables": self.tables,
+        }
+        util.write_file_if_changed(self.path, json.dumps(content, indent=2, sort_keys=True, ensure_ascii=False))
+
+    def is_table_changed(self, table_name, registry, output_dirs, options=None):
+        """
+        一张已读取的表自身是否有变化：没有记录、输入或表头变化、构建选项变化，或输出缺失/被改动。
+
+        外键引用了变化表的表同样需要重新校验，由调用方根据各表的引用关系判断（见 main.process_excel_directory）。
+
+        :param output_dirs: 输出类型 -> 输出目录
+        :param options: 影响输出内容的构建选项，与上次不同的表需要重建
+        """
+        record = self.tables.get(table_name)
+        if record is None:
+            return True
+        if record.get("input_hash") != registry.content_hashes.get(table_name):
+            return True
+        if record.get("header") != [str(c) for c in registry.tables[table_name].columns]:
+            return True
+        if record.get("options") != (options or {}):
+            return True
+        return not self._outputs_intact(record, output_dirs)
+
+    def record_table(self, table_name, registry, output_files, options=None):
+        """
+        记录一张表的成功构建结果。
+
+        :param output_files: 输出类型 -> 输出文件路径
+        :param options: 影响输出内容的构建选项
+        """
+        df = registry.tables[table_name]
+        outputs = {}
+        for kind, file_path in output_files.items():
+            if os.path.exists(file_path):
+                outputs[kind] = {
+                    "file": os.path.basename(file_path),
+                    "hash": util.get_file_hash(file_path),
+                }
+
+        self.tables[table_name] = {
+            "input_hash": registry.content_hashes.get(table_name),
+            "header": [str(c) for c in df.columns],
+            "references": sorted(util.get_referenced_tables(df.columns)),
+            "outputs": outputs,
+            "options": options or {},
+        }
+
+    def remove_table(self, table_name, output_dirs=None):
+        """
+        移除一张表的记录；传入 output_dirs 时同时删除其输出文件。
+        """
+        record = self.tables.pop(table_name, None)
+        if record is None or output_dirs is None:
+            return
+
+        for kind, output in record.get("outputs", {}).items():
+            output_dir = output_dirs.get(kind)
+            if output_dir is None:
+                continue
+            file_path = os.path.join(output_dir, output["file"])
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    def _outputs_intact(self, record, output_dirs):
+        outputs = record.get("outputs", {})
+        for kind in output_dirs:
+            if kind not in outputs:
+                return False
+
+        for kind, output in outputs.items():
+            output_dir = output_dirs.get(kind)
+            if output_dir is None:
+                continue
+            file_path = os.path.join(output_dir, output["file"])
+            if not os.path.exists(file_path) or util.get_file_hash(file_path) != output["hash"]:
+                return False
+        return True
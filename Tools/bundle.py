@@ -0,0 +1,347 @@
+"""
+把 dat 目录下的所有 .dat 打包为单个 bundle 文件（--bundle）。
+
+运行时只需打开一个文件、读取一次目录（TOC），之后按偏移切出各表的数据，减少启动时的文件打开次数；
+各条目可单独使用 zlib 压缩，压缩后没有变小的条目按原样存储。
+
+文件布局（整数均为小端）：
+
+    header   magic "XCBN" | u32 version | u32 entry_count | u32 toc_size
+    toc      entry_count × (u16 name_length | name (UTF-8) | u64 offset | u64 stored_length
+             | u64 raw_length | u8 flags | 32 字节 SHA-256（原始数据）)
+    payload  各条目数据，offset 为相对文件开头的偏移
+
+flags 的第 0 位表示该条目为 zlib 压缩。
+"""
+import hashlib
+import os
+import struct
+import zlib
+import util
+
+MAGIC = b"XCBN"
+FORMAT_VERSION = 1
+
+FLAG_ZLIB = 1
+
+# 打包方式：none 为原样存储；zlib 为逐条目压缩（压缩后没有变小的条目原样存储）
+COMPRESSIONS = ("none", "zlib")
+DEFAULT_COMPRESSION_LEVEL = 6
+
+HEADER = struct.Struct("<4sIII")
+NAME_LENGTH = struct.Struct("<H")
+ENTRY = struct.Struct("<QQQB32s")
+
+LOADER_FILE_NAME = "ConfigBundle.cs"
+
+
+def write_bundle(dat_dir, bundle_path, compression="zlib", level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    打包 dat_dir 下的所有 .dat 文件。
+
+    旧 bundle 中原始数据摘要和压缩方式都没有变化的条目直接复用，不重新压缩。
+
+    :param dat_dir: .dat 文件目录
+    :param bundle_path: 输出的 bundle 文件路径
+    :param compression: 压缩方式，见 COMPRESSIONS
+    :param level: zlib 压缩级别
+    :return: (bundle 是否有变化, 条目列表)
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported bundle compression: '{compression}' (expected one of {COMPRESSIONS})")
+
+    previous = _read_previous_entries(bundle_path, compression)
+
+    entries = []
+    payloads = []
+    for file_name in sorted(os.listdir(dat_dir)):
+        if not file_name.endswith(".dat"):
+            continue
+        name = os.path.splitext(file_name)[0]
+        with open(os.path.join(dat_dir, file_name), 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).digest()
+
+        reused = previous.get(name)
+        if reused is not None and reused["hash"] == digest:
+            flags, stored = reused["flags"], reused["data"]
+        else:
+            flags, stored = _compress(raw, compression, level)
+
+        entries.append({"name": name, "stored_length": len(stored), "raw_length": len(raw), "flags": flags,
+                        "hash": digest})
+        payloads.append(stored)
+
+    # 先计算 TOC 大小，再确定每个条目的偏移
+    encoded_names = [entry["name"].encode("utf-8") for entry in entries]
+    toc_size = sum(NAME_LENGTH.size + len(name) + ENTRY.size for name in encoded_names)
+    offset = HEADER.size + toc_size
+
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), toc_size)]
+    for entry, name in zip(entries, encoded_names):
+        entry["offset"] = offset
+        offset += entry["stored_length"]
+        parts.append(NAME_LENGTH.pack(len(name)))
+        parts.append(name)
+        parts.append(ENTRY.pack(entry["offset"], entry["stored_length"], entry["raw_length"], entry["flags"],
+                                entry["hash"]))
+    parts.extend(payloads)
+
+    os.makedirs(os.path.dirname(os.path.abspath(bundle_path)), exist_ok=True)
+    changed = util.write_file_if_changed(bundle_path, b"".join(parts))
+    return changed, entries
+
+
+def read_toc(bundle_path):
+    """
+    读取 bundle 的目录。
+
+    :return: 条目名 -> {"name", "offset", "stored_length", "raw_length", "flags", "hash"}
+    """
+    with open(bundle_path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            raise ValueError(f"Invalid config bundle: {bundle_path}")
+        magic, version, entry_count, toc_size = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"Invalid config bundle: {bundle_path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported config bundle version {version} in {bundle_path}")
+        toc = f.read(toc_size)
+
+    entries = {}
+    position = 0
+    for _ in range(entry_count):
+        (name_length,) = NAME_LENGTH.unpack_from(toc, position)
+        position += NAME_LENGTH.size
+        name = toc[position:position + name_length].decode("utf-8")
+        position += name_length
+        offset, stored_length, raw_length, flags, digest = ENTRY.unpack_from(toc, position)
+        position += ENTRY.size
+        entries[name] = {"name": name, "offset": offset, "stored_length": stored_length, "raw_length": raw_length,
+                         "flags": flags, "hash": digest}
+    return entries
+
+
+def read_entry(bundle_path, name, entries=None):
+    """
+    读取 bundle 中一张表的原始 .dat 数据，并校验摘要。
+    """
+    entries = entries if entries is not None else read_toc(bundle_path)
+    entry = entries.get(name)
+    if entry is None:
+        raise KeyError(f"Table '{name}' not found in {bundle_path}")
+
+    with open(bundle_path, 'rb') as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["stored_length"])
+    if entry["flags"] & FLAG_ZLIB:
+        data = zlib.decompress(data)
+    if hashlib.sha256(data).digest() != entry["hash"]:
+        raise ValueError(f"Hash mismatch for table '{name}' in {bundle_path}")
+    return data
+
+
+def _compress(raw, compression, level):
+    if compression == "zlib":
+        compressed = zlib.compress(raw, level)
+        if len(compressed) < len(raw):
+            return FLAG_ZLIB, compressed
+    return 0, raw
+
+
+def _read_previous_entries(bundle_path, compression):
+    """
+    读取旧 bundle 中可复用的条目：只复用与当前压缩方式一致的条目（zlib 下原样存储的条目重新尝试压缩）。
+    """
+    if not os.path.exists(bundle_path):
+        return {}
+    try:
+        entries = read_toc(bundle_path)
+        with open(bundle_path, 'rb') as f:
+            for entry in entries.values():
+                f.seek(entry["offset"])
+                entry["data"] = f.read(entry["stored_length"])
+    except (OSError, ValueError, struct.error):
+        return {}
+
+    compressed = compression == "zlib"
+    return {name: entry for name, entry in entries.items() if bool(entry["flags"] & FLAG_ZLIB) == compressed}
+
+
+def generate_loader_cs(output_dir):
+    """
+    生成 C# 端的 ConfigBundle 读取器。
+
+    :return: 文件是否有变化
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    return util.write_file_if_changed(os.path.join(output_dir, LOADER_FILE_NAME), LOADER_TEMPLATE)
+
+
+LOADER_TEMPLATE = """
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.IO.Compression;
+using System.Security.Cryptography;
+using System.Text;
+
+// 单文件配置包读取器，文件格式见 Tools/bundle.py
+// 打开时只读取一次目录（TOC），之后按偏移切出各表的 .dat 数据
+public sealed class ConfigBundle : IDisposable
+{
+    private const uint Magic = 0x4E424358; // "XCBN"
+    private const uint FormatVersion = 1;
+    private const byte FlagZlib = 1;
+
+    private struct Entry
+    {
+        public long Offset;
+        public int StoredLength;
+        public int RawLength;
+        public byte Flags;
+        public byte[] Hash;
+    }
+
+    private readonly Dictionary<string, Entry> entries = new Dictionary<string, Entry>();
+    private readonly object streamLock = new object();
+    private Stream stream;
+    private byte[] bytes;
+
+    // 从文件打开：保持文件句柄，按需读取各表
+    public static ConfigBundle Open(string path)
+    {
+        if (!File.Exists(path))
+            throw new FileNotFoundException($"Config bundle not found: {path}");
+
+        var bundle = new ConfigBundle();
+        bundle.stream = File.OpenRead(path);
+        try
+        {
+            bundle.ReadToc(new BinaryReader(bundle.stream, Encoding.UTF8, true));
+        }
+        catch
+        {
+            bundle.Dispose();
+            throw;
+        }
+        return bundle;
+    }
+
+    // 从内存打开（如 Android 上通过 UnityWebRequest 读取的 StreamingAssets）
+    public static ConfigBundle FromBytes(byte[] data)
+    {
+        var bundle = new ConfigBundle();
+        bundle.bytes = data;
+        using (var reader = new BinaryReader(new MemoryStream(data, false), Encoding.UTF8))
+        {
+            bundle.ReadToc(reader);
+        }
+        return bundle;
+    }
+
+    private void ReadToc(BinaryReader reader)
+    {
+        if (reader.ReadUInt32() != Magic)
+            throw new InvalidDataException("Invalid config bundle");
+        if (reader.ReadUInt32() != FormatVersion)
+            throw new InvalidDataException("Unsupported config bundle version");
+
+        var count = reader.ReadUInt32();
+        reader.ReadUInt32(); // toc_size
+        for (int i = 0; i < count; i++)
+        {
+            var name = Encoding.UTF8.GetString(reader.ReadBytes(reader.ReadUInt16()));
+            entries[name] = new Entry
+            {
+                Offset = (long)reader.ReadUInt64(),
+                StoredLength = checked((int)reader.ReadUInt64()),
+                RawLength = checked((int)reader.ReadUInt64()),
+                Flags = reader.ReadByte(),
+                Hash = reader.ReadBytes(32),
+            };
+        }
+    }
+
+    // 包内的表名
+    public IEnumerable<string> TableNames => entries.Keys;
+
+    public bool Contains(string tableName)
+    {
+        return entries.ContainsKey(tableName);
+    }
+
+    // 读取一张表的 .dat 数据（已解压），可直接交给 {Table}.Parser.ParseFrom
+    public byte[] ReadTable(string tableName, bool verifyHash = false)
+    {
+        if (!entries.TryGetValue(tableName, out var entry))
+            throw new KeyNotFoundException($"Table '{tableName}' not found in config bundle");
+
+        var stored = ReadRange(entry.Offset, entry.StoredLength);
+        var data = stored;
+        if ((entry.Flags & FlagZlib) != 0)
+        {
+            // zlib = 2 字节头 + deflate 数据 + 4 字节 Adler-32
+            data = new byte[entry.RawLength];
+            using (var deflate = new DeflateStream(new MemoryStream(stored, 2, stored.Length - 2), CompressionMode.Decompress))
+            {
+                int read = 0;
+                while (read < data.Length)
+                {
+                    int n = deflate.Read(data, read, data.Length - read);
+                    if (n <= 0)
+                        throw new InvalidDataException($"Truncated table '{tableName}' in config bundle");
+                    read += n;
+                }
+            }
+        }
+
+        if (verifyHash)
+        {
+            using (var sha = SHA256.Create())
+            {
+                var hash = sha.ComputeHash(data);
+                for (int i = 0; i < hash.Length; i++)
+                {
+                    if (hash[i] != entry.Hash[i])
+                        throw new InvalidDataException($"Hash mismatch for table '{tableName}' in config bundle");
+                }
+            }
+        }
+        return data;
+    }
+
+    private byte[] ReadRange(long offset, int length)
+    {
+        var buffer = new byte[length];
+        if (bytes != null)
+        {
+            Buffer.BlockCopy(bytes, checked((int)offset), buffer, 0, length);
+            return buffer;
+        }
+
+        lock (streamLock)
+        {
+            stream.Seek(offset, SeekOrigin.Begin);
+            int read = 0;
+            while (read < length)
+            {
+                int n = stream.Read(buffer, read, length - read);
+                if (n <= 0)
+                    throw new EndOfStreamException("Truncated config bundle");
+                read += n;
+            }
+        }
+        return buffer;
+    }
+
+    public void Dispose()
+    {
+        stream?.Dispose();
+        stream = null;
+        bytes = null;
+        entries.Clear();
+    }
+}
+"""
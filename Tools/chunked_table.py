@@ -0,0 +1,164 @@
+"""
+分块（有界内存）模式：超大工作簿逐批读取、校验、编码并追加写出 .dat，不在内存中保留整张表。
+
+普通模式下一张表同时以多种形式存在于内存中：TableRegistry 中的 DataFrame、进程池子进程中的副本、
+编码的中间数组以及整个 .dat 字节串，百万行级别的表会超出 CI 机器的内存。
+不小于 --chunked-threshold 的工作簿按分块模式处理：
+
+- TableRegistry 只读取表头（见 table_registry.py），数据在处理时以 openpyxl 只读模式逐批读取；
+- 每批的行数由内存上限（--chunked-memory）确定，见 excel_reader.iter_column_batches；
+- 每批按普通模式的规则校验，外键对照预先构建的被引用字段键集合（KeyIndex）检查，唯一索引跨批检查；
+- 每批编码后追加到临时文件，全部写完后替换 .dat（内容未变化时保持原文件不变）。
+
+表数据之外常驻内存的只有：唯一索引字段已出现的值及其行号、indexed 格式每行的记录长度和主键（16 字节/行）以及 id 的取值范围。
+message 和 indexed 格式的输出与 --reader stream 的普通模式一致；soa 格式按列连续存放，不支持分块模式。
+"""
+import os
+from contextlib import closing
+import numpy as np
+import data_generator
+import dat_encoder
+import excel_reader
+import indexed_dat
+import util
+import validator
+
+# 分块模式下并行处理的各表合计的默认内存上限（MB）
+DEFAULT_MEMORY_LIMIT_MB = 256
+
+# 一批数据处理时占用的内存约为其 DataFrame 的若干倍：openpyxl 的原始行、校验和编码的中间数组以及编码结果
+WORKING_SET_FACTOR = 8
+
+# 每批行数的上限
+MAX_BATCH_ROWS = 1 << 18
+
+
+def iter_batches(file_path, memory_limit, usecols=None):
+    """
+    按内存上限逐批读取工作簿。
+
+    :param memory_limit: 一批数据处理时的内存上限（字节）
+    :return: 生成器，产出 DataFrame，行索引为在整张表中的行位置
+    """
+    batches = excel_reader.iter_column_batches(file_path, MAX_BATCH_ROWS, max(1, memory_limit // WORKING_SET_FACTOR),
+                                               usecols)
+    with closing(batches):
+        for _, batch in batches:
+            yield batch
+
+
+def collect_strings(file_path, schema, memory_limit):
+    """
+    按出现顺序收集整张表 string 字段中去重后的字符串（与 dat_encoder.collect_strings 对整张表的结果一致），
+    用于字符串池。
+    """
+    columns = [field.column for field in schema.fields if field.field_type == "string"]
+    if not columns:
+        return []
+
+    strings = {}
+    for batch in iter_batches(file_path, memory_limit):
+        strings.update(dict.fromkeys(dat_encoder.collect_strings(batch, schema)))
+    return list(strings)
+
+
+def build_chunked_table(file_path, schema, key_index, output_files, memory_limit, table_profiler,
+                        dat_format="message", chunk_rows=indexed_dat.DEFAULT_CHUNK_ROWS, string_pool=None,
+                        backend="protobuf"):
+    """
+    以分块模式校验一张表并生成 .proto、.schema.json 和 .dat。
+
+    :param output_files: 输出类型 -> 文件路径（见 main.get_output_files）
+    :param memory_limit: 本表一批数据处理时的内存上限（字节）
+    :param table_profiler: profiler.TableProfiler，读取、校验、编码各阶段的耗时按批累加
+    :return: .proto 是否有变化
+    """
+    if backend != "protobuf":
+        raise ValueError(f"Chunked mode does not support the '{backend}' backend")
+
+    with table_profiler.stage("validate"):
+        validator.validate_header(schema, key_index)
+
+    with table_profiler.stage("proto"):
+        proto_changed = data_generator.generate_proto_file(output_files["proto"], schema.table_name, schema,
+                                                           string_pool is not None)
+
+    unique_values = {field: {} for field in schema.fields if field.index_kind == "unique"}
+    id_range = None
+    tmp_path = util.get_temp_path(output_files["dat"])
+    try:
+        with open(tmp_path, 'wb') as f:
+            writer = _create_writer(f, schema, dat_format, chunk_rows, string_pool)
+            batches = iter_batches(file_path, memory_limit)
+            with closing(batches):
+                while True:
+                    with table_profiler.stage("read"):
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+
+                    with table_profiler.stage("validate"):
+                        row_offset = int(batch.index[0]) if len(batch) else 0
+                        validator.validate_data(batch, schema, key_index, row_offset)
+                        _check_unique_across_batches(batch, unique_values, row_offset)
+                        id_range = data_generator.get_id_range(batch, schema, id_range)
+
+                    with table_profiler.stage("dat"):
+                        writer.write_rows(batch)
+
+            with table_profiler.stage("dat"):
+                writer.close()
+
+        with table_profiler.stage("dat"):
+            util.replace_file_if_changed(tmp_path, output_files["dat"])
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    with table_profiler.stage("proto"):
+        data_generator.generate_schema_file(output_files["schema"], schema, id_range, backend)
+    return proto_changed
+
+
+class MessageTableWriter:
+    """
+    分块写出 message 格式：{Table}.rows 是 repeated 字段，各批编码结果首尾相接即为整张表的编码。
+    """
+
+    def __init__(self, file, schema, string_pool=None):
+        self.file = file
+        self.schema = schema
+        self.string_pool = string_pool
+
+    def write_rows(self, df):
+        self.file.write(dat_encoder.encode_table(df, self.schema, self.string_pool))
+
+    def close(self):
+        pass
+
+
+def _create_writer(file, schema, dat_format, chunk_rows, string_pool):
+    if dat_format == "indexed":
+        return indexed_dat.IndexedTableWriter(file, schema, chunk_rows, string_pool)
+    if dat_format != "message":
+        raise ValueError(f"Unsupported dat format: '{dat_format}' (expected one of {data_generator.DAT_FORMATS})")
+    return MessageTableWriter(file, schema, string_pool)
+
+
+def _check_unique_across_batches(batch, unique_values, row_offset):
+    """
+    唯一索引字段的值不能与之前各批重复（批内重复由 validator.validate_constraints 检查）。
+
+    :param unique_values: FieldSchema -> {之前各批出现过的值: 首次出现的行位置}
+    """
+    for field, seen in unique_values.items():
+        column = batch[field.column]
+        positions = np.flatnonzero(column.notna().to_numpy())
+        values = column.iloc[positions].tolist()
+        duplicated = [position for position, value in zip(positions, values) if value in seen]
+        if duplicated:
+            first_rows = {seen[value] for value in values if value in seen}
+            rows = sorted(first_rows) + [int(position) + row_offset for position in duplicated]
+            raise ValueError(f"Column '{field.field_name}' has duplicate values in a unique index"
+                             f"{validator.format_rows(rows)}.")
+        seen.update(zip(values, (int(position) + row_offset for position in positions)))
@@ -1,32 +1,194 @@
 import os
 import platform
+import shutil
+import subprocess
+import tempfile
 import util
 
+# 单次 protoc 调用最多处理的 .proto 文件数；命令行长度同样受限（Windows 约 32K 字符）
+DEFAULT_CHUNK_SIZE = 200
+MAX_COMMAND_LENGTH = 24000
+
+# Python 运行时（见 config_database.py）在 Python 输出目录中的文件名
+PYTHON_RUNTIME_FILE_NAME = "config_database.py"
+
+
+def generate_code(proto_files, python_out_dir, csharp_out_dir, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    一次（或按块少数几次）调用 protoc，同时生成 Python 和 C# 文件。
+
+    生成结果先写入临时目录，再逐个复制到输出目录，内容未变化的文件不会被重写。
+    某一块失败时逐个文件重试，以定位出错的表。
+
+    :param proto_files: .proto 文件路径列表（需位于同一目录）
+    :param python_out_dir: Python 输出目录
+    :param csharp_out_dir: C# 输出目录
+    :return: 失败的 .proto 文件 -> 错误信息
+    """
+    errors = {}
+    if not proto_files:
+        return errors
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_python_dir = os.path.join(tmp_dir, "python")
+        tmp_csharp_dir = os.path.join(tmp_dir, "csharp")
+
+        for chunk in _split_chunks(proto_files, chunk_size):
+            os.makedirs(tmp_python_dir, exist_ok=True)
+            os.makedirs(tmp_csharp_dir, exist_ok=True)
+
+            error = run_protoc(chunk, python_out=tmp_python_dir, csharp_out=tmp_csharp_dir)
+            if error is not None and len(chunk) > 1:
+                # 整块失败时 protoc 不输出任何文件，逐个重试以区分出错的表
+                for proto_file in chunk:
+                    file_error = run_protoc([proto_file], python_out=tmp_python_dir, csharp_out=tmp_csharp_dir)
+                    if file_error is not None:
+                        errors[proto_file] = file_error
+            elif error is not None:
+                errors[chunk[0]] = error
+
+            for proto_file in chunk:
+                if proto_file in errors:
+                    continue
+                _copy_output(tmp_python_dir, python_out_dir, get_python_file_name(proto_file))
+                _copy_output(tmp_csharp_dir, csharp_out_dir, get_csharp_file_name(proto_file))
+
+            shutil.rmtree(tmp_python_dir)
+            shutil.rmtree(tmp_csharp_dir)
+
+    return errors
+
+
 def generate_python_code(proto_file, output_dir):
     """
     使用 protoc 生成 Python 文件
     """
-    protoc_path = get_protoc_path()
-    command = f'{protoc_path} --python_out="{output_dir}" --proto_path="{os.path.dirname(proto_file)}" "{proto_file}"'
-    #print(f"Executing: {command}")
+    error = run_protoc([proto_file], python_out=output_dir)
+    if error is not None:
+        raise RuntimeError(f"Failed to generate Python code for {proto_file}: {error}")
+
 
-    result = os.system(command)
-    if result != 0:
-        raise RuntimeError(f"Failed to generate Python code for {proto_file}")
-    
-    
 def generate_csharp_code(proto_file, output_dir):
     """
     使用 protoc 生成 C# 文件
     """
-    protoc_path = get_protoc_path()
-    command = f'{protoc_path} --csharp_out="{output_dir}" --proto_path="{os.path.dirname(proto_file)}" "{proto_file}"'
+    error = run_protoc([proto_file], csharp_out=output_dir)
+    if error is not None:
+        raise RuntimeError(f"Failed to generate C# code for {proto_file}: {error}")
+
+
+def run_protoc(proto_files, python_out=None, csharp_out=None):
+    """
+    以参数列表方式调用 protoc（不经过 shell）。
+
+    :return: 成功返回 None，失败返回 protoc 的错误输出
+    """
+    proto_path = os.path.dirname(proto_files[0])
+    command = [get_protoc_path(), f"--proto_path={proto_path}"]
+    if python_out is not None:
+        command.append(f"--python_out={python_out}")
+    if csharp_out is not None:
+        command.append(f"--csharp_out={csharp_out}")
+    command.extend(proto_files)
     #print(f"Executing: {command}")
 
-    result = os.system(command)
-    if result != 0:
-        raise RuntimeError(f"Failed to generate Python code for {proto_file}")
-    
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except OSError as e:
+        return f"Failed to run protoc: {e}"
+
+    if result.returncode != 0:
+        return (result.stderr or result.stdout).strip() or f"protoc exited with code {result.returncode}"
+    return None
+
+
+def get_protoc_version():
+    """
+    protoc 的版本（protoc --version 的输出），无法运行时返回 None。
+    """
+    try:
+        result = subprocess.run([get_protoc_path(), "--version"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def generate_python_runtime(output_dir, string_pool_fields=None):
+    """
+    把 config_database.py 复制到 Python 输出目录，并写入启用字符串池的表及其 string 字段。
+
+    :param string_pool_fields: 表名 -> 写为字符串池下标的 string 字段名列表
+    :return: 文件是否有变化
+    """
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), PYTHON_RUNTIME_FILE_NAME), encoding='utf-8') as f:
+        source = f.read()
+
+    placeholder = "STRING_POOL_FIELDS = {}\n"
+    if placeholder not in source:
+        raise RuntimeError(f"STRING_POOL_FIELDS not found in {PYTHON_RUNTIME_FILE_NAME}")
+    fields = "".join(f"    {table_name!r}: {tuple(field_names)!r},\n"
+                     for table_name, field_names in sorted((string_pool_fields or {}).items()) if field_names)
+    source = source.replace(placeholder, f"STRING_POOL_FIELDS = {{\n{fields}}}\n" if fields else placeholder, 1)
+
+    os.makedirs(output_dir, exist_ok=True)
+    return util.write_file_if_changed(os.path.join(output_dir, PYTHON_RUNTIME_FILE_NAME), source)
+
+
+def _split_chunks(proto_files, chunk_size):
+    chunk = []
+    command_length = 0
+    for proto_file in proto_files:
+        if chunk and (len(chunk) >= chunk_size or command_length + len(proto_file) + 1 > MAX_COMMAND_LENGTH):
+            yield chunk
+            chunk = []
+            command_length = 0
+        chunk.append(proto_file)
+        command_length += len(proto_file) + 1
+    if chunk:
+        yield chunk
+
+
+def _copy_output(src_dir, dst_dir, file_name):
+    src_file = os.path.join(src_dir, file_name)
+    if not os.path.exists(src_file):
+        return
+    with open(src_file, 'rb') as f:
+        util.write_file_if_changed(os.path.join(dst_dir, file_name), f.read())
+
+
+def get_python_file_name(proto_file):
+    """
+    protoc 为 .proto 生成的 Python 文件名，如 Sample.proto -> Sample_pb2.py
+    """
+    return os.path.splitext(os.path.basename(proto_file))[0] + "_pb2.py"
+
+
+def get_csharp_file_name(proto_file):
+    """
+    protoc 为 .proto 生成的 C# 文件名：文件名转换为 PascalCase，如 item_drop.proto -> ItemDrop.cs
+    """
+    base_name = os.path.splitext(os.path.basename(proto_file))[0]
+    return to_pascal_case(base_name) + ".cs"
+
+
+def to_pascal_case(name):
+    """
+    与 protoc 的 C# 命名规则一致：去掉非字母数字字符，首字母及其后、数字后的字母大写，
+    如 item_drop -> ItemDrop，start_time -> StartTime。
+    """
+    result = ""
+    cap_next = True
+    for c in name:
+        if c.isascii() and c.isalpha():
+            result += c.upper() if cap_next else c
+            cap_next = False
+        elif c.isascii() and c.isdigit():
+            result += c
+            cap_next = True
+        else:
+            cap_next = True
+    return result
+
 
 def get_protoc_path():
     """
@@ -34,4 +196,4 @@ def get_protoc_path():
     """
     base_path = os.path.abspath("Tools/protoc/bin/")
     executable_name = "protoc.exe" if platform.system() == "Windows" else "protoc"
-    return os.path.join(base_path, executable_name)
\ No newline at end of file
+    return os.path.join(base_path, executable_name)
@@ -0,0 +1,688 @@
+"""
+配置表 Python 运行时（构建时复制到 Python 输出目录，与 *_pb2.py 放在一起，请勿手动修改输出目录中的副本）。
+
+ConfigDatabase 按需加载 .dat：第一次访问某张表时才内存映射其文件（多个进程映射同一文件时共享物理内存），
+读取某一行时才解析该行；主键索引和二级索引在第一次查询时建立。已加载的表可在多个线程间共享。
+message、indexed（见 indexed_dat.py）、soa（见 soa_dat.py）三种 .dat 格式按文件头自动识别，
+启用 --string-pool 时通过 value() 读取池中的字符串。
+
+用法（Python 输出目录需在 sys.path 中，或作为包导入）：
+
+    from config_database import ConfigDatabase
+
+    db = ConfigDatabase("Output/dat")
+    table = db["Sample"]
+    row = table.get(1001)                 # 按主键 id 查询，返回 SampleRow（soa 格式为 SoaRow）
+    rows = table.find("level", 3)         # 按字段值查询，首次调用时建立该字段的索引
+    name = table.value(row, "name")       # 读取字段值，string 字段使用字符串池时返回池中的字符串
+    db.start_auto_reload()                # 后台轮询 .dat，变化的表重新加载
+
+表对象加载后不再变化，重新加载时整体替换为新的表对象，已取得的表对象和行仍然有效；
+一次业务处理中应使用同一个表对象，避免前后读到两个版本的数据。
+重新构建改变了表结构时，新的 *_pb2.py 无法再导入到默认 DescriptorPool（同名 .proto 已注册），
+此时从 pb2 文件读出新的消息定义，在独立的 DescriptorPool 中构造消息类（见 _load_message_classes）。
+解析出的 Protobuf 消息是可变对象，不做缓存，也不要在线程间共享后修改。
+"""
+import ast
+import bisect
+import importlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+from google.protobuf.timestamp_pb2 import Timestamp
+
+# 启用字符串池时各表写为池下标的 string 字段：表名 -> 字段名元组（构建时生成）
+STRING_POOL_FIELDS = {}
+
+# 与 string_pool.py 一致
+POOL_TABLE_NAME = "ConfigStrings"
+REF_SUFFIX = "_ref"
+
+# 主键字段名，与 indexed_dat.py 一致
+KEY_FIELD_NAME = "id"
+
+DAT_SUFFIX = ".dat"
+
+# 后台重新加载的默认轮询间隔（秒）
+DEFAULT_RELOAD_INTERVAL = 1.0
+
+# message 格式：{Table} 消息中 rows 字段（编号 1，length-delimited）的 tag
+ROWS_TAG = 0x0A
+
+# indexed 格式，见 indexed_dat.py
+INDEXED_MAGIC = b"XDAT"
+INDEXED_VERSION = 1
+INDEXED_HEADER = struct.Struct("<4sIII")
+INDEXED_TRAILER = struct.Struct("<QIQII4s")
+INDEXED_CHUNK_ENTRY = struct.Struct("<QII")
+INDEXED_KEY_ENTRY = struct.Struct("<qII")
+
+# soa 格式，见 soa_dat.py
+SOA_MAGIC = b"XSOA"
+SOA_VERSION = 1
+SOA_HEADER = struct.Struct("<4sIIIIIQQQ")
+SOA_COLUMN_ENTRY = struct.Struct("<IBBHQQ")
+SOA_FLAG_NULLABLE = 1
+
+# soa 列类型编号 -> (类型名, memoryview 元素格式)
+SOA_COLUMN_TYPES = {
+    1: ("int", "i"),
+    2: ("long", "q"),
+    3: ("float", "f"),
+    4: ("bool", "B"),
+    5: ("time", "q"),
+    6: ("string", "I"),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigTable(ABC):
+    """
+    一张已加载的表（只读）。行号从 0 开始，与 Excel 中数据行的顺序一致；id 重复时主键查询返回最后一行。
+    """
+
+    def __init__(self, name, path, data, row_class, pooled_fields=(), strings=None):
+        """
+        :param data: .dat 文件内容（mmap，空文件为 b""）
+        :param row_class: 生成的 {Table}Row 消息类
+        :param pooled_fields: 写为字符串池下标的 string 字段名
+        :param strings: 字符串池（字符串列表）
+        """
+        self.name = name
+        self.path = path
+        self.row_class = row_class
+        self._data = data
+        self._pooled_fields = frozenset(pooled_fields)
+        self._strings = strings
+        self._lock = threading.RLock()
+        self._indexes = {}  # 字段名 -> {值: (行号, ...)}
+
+    def __len__(self):
+        return self.row_count
+
+    def __iter__(self):
+        return self._iter_rows()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    @abstractmethod
+    def row(self, row):
+        """
+        按行号读取一行。
+        """
+
+    @abstractmethod
+    def get(self, key, default=None):
+        """
+        按主键 id 读取一行；不存在或表没有 id 字段时返回 default。
+        """
+
+    def value(self, row, field_name):
+        """
+        读取一行中的字段值；string 字段使用字符串池时返回池中的字符串。
+        """
+        if field_name in self._pooled_fields:
+            string_id = getattr(row, field_name + REF_SUFFIX)
+            return self._strings[string_id] if 0 <= string_id < len(self._strings) else ""
+        return getattr(row, field_name)
+
+    def find(self, field_name, value):
+        """
+        返回字段值等于 value 的所有行（按行号顺序）；第一次按该字段查询时建立索引。
+        time 字段的值为 UTC 秒数或 Timestamp。
+        """
+        return [self.row(row) for row in self._get_index(field_name).get(_to_index_key(value), ())]
+
+    def find_one(self, field_name, value, default=None):
+        """
+        返回字段值等于 value 的最后一行，与主键的重复规则一致。
+        """
+        rows = self._get_index(field_name).get(_to_index_key(value))
+        return self.row(rows[-1]) if rows else default
+
+    def _get_index(self, field_name):
+        index = self._indexes.get(field_name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(field_name)
+                if index is None:
+                    self._check_field(field_name)
+                    index = {}
+                    for row, value in enumerate(self._iter_field_values(field_name)):
+                        index.setdefault(_to_index_key(value), []).append(row)
+                    index = {value: tuple(rows) for value, rows in index.items()}
+                    self._indexes[field_name] = index
+        return index
+
+    def _check_field(self, field_name):
+        fields = self.row_class.DESCRIPTOR.fields_by_name
+        if field_name not in fields and not (field_name in self._pooled_fields
+                                             and field_name + REF_SUFFIX in fields):
+            raise ValueError(f"Field '{field_name}' not found in table {self.name}")
+
+    def _iter_rows(self):
+        for row in range(self.row_count):
+            yield self.row(row)
+
+    def _iter_field_values(self, field_name):
+        for row in self._iter_rows():
+            yield self.value(row, field_name)
+
+
+class MessageTable(ConfigTable):
+    """
+    message 格式：整张表为一条 {Table} 消息。第一次按行读取时扫描出每条记录的位置。
+    """
+
+    def __init__(self, name, path, data, row_class, table_class, pooled_fields=(), strings=None):
+        super().__init__(name, path, data, row_class, pooled_fields, strings)
+        self.table_class = table_class
+        self._records = None  # (偏移数组, 长度数组)
+        self._keys = None     # id -> 行号
+
+    @property
+    def row_count(self):
+        return len(self._get_records()[0])
+
+    def row(self, row):
+        offsets, lengths = self._get_records()
+        offset = offsets[row]
+        return self.row_class.FromString(self._data[offset:offset + lengths[row]])
+
+    def get(self, key, default=None):
+        row = self._get_keys().get(key)
+        return self.row(row) if row is not None else default
+
+    def _get_records(self):
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    self._records = self._scan_records()
+        return self._records
+
+    def _scan_records(self):
+        data = self._data
+        offsets = array("Q")
+        lengths = array("Q")
+        position = 0
+        while position < len(data):
+            if data[position] != ROWS_TAG:
+                raise ValueError(f"Invalid .dat file: {self.path}")
+            length, position = _read_varint(data, position + 1)
+            offsets.append(position)
+            lengths.append(length)
+            position += length
+        if position != len(data):
+            raise ValueError(f"Truncated .dat file: {self.path}")
+        return offsets, lengths
+
+    def _get_keys(self):
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    keys = {}
+                    if _is_key_field(self.row_class):
+                        # 后出现的行覆盖前面的行
+                        keys = {row.id: index for index, row in enumerate(self._iter_rows())}
+                    self._keys = keys
+        return self._keys
+
+    def _iter_rows(self):
+        # 建立索引时整表解析一次（由 Protobuf 的 C 实现完成）比逐行解析快得多，解析结果用完即释放；
+        # 传入映射内存的视图，不把整个文件复制为 bytes
+        return iter(self.table_class.FromString(memoryview(self._data)).rows)
+
+
+class IndexedTable(ConfigTable):
+    """
+    indexed 格式：按文件中的主键表二分查找，只解析命中的一行。
+    """
+
+    def __init__(self, name, path, data, row_class, pooled_fields=(), strings=None):
+        super().__init__(name, path, data, row_class, pooled_fields, strings)
+        if len(data) < INDEXED_HEADER.size + INDEXED_TRAILER.size:
+            raise ValueError(f"Invalid indexed .dat file: {path}")
+        magic, version, self.row_count, self.chunk_rows = INDEXED_HEADER.unpack_from(data, 0)
+        self._chunk_table_offset, self._chunk_count, self._key_table_offset, key_count, _, end_magic = \
+            INDEXED_TRAILER.unpack_from(data, len(data) - INDEXED_TRAILER.size)
+        if magic != INDEXED_MAGIC or end_magic != INDEXED_MAGIC:
+            raise ValueError(f"Invalid indexed .dat file: {path}")
+        if version != INDEXED_VERSION:
+            raise ValueError(f"Unsupported indexed .dat version {version} in {path}")
+
+        # 主键表每项为 (i64 key, u32 chunk, u32 offset)，取出 key 列的视图直接二分查找
+        key_table = memoryview(data)[self._key_table_offset:self._key_table_offset + key_count * INDEXED_KEY_ENTRY.size]
+        self._keys = key_table.cast("q")[::2]
+
+    def row(self, row):
+        if not 0 <= row < self.row_count:
+            raise IndexError(f"Row {row} out of range")
+        chunk = row // self.chunk_rows
+        offset, _, first_row = INDEXED_CHUNK_ENTRY.unpack_from(
+            self._data, self._chunk_table_offset + chunk * INDEXED_CHUNK_ENTRY.size)
+        for _ in range(row - first_row):
+            length, offset = _read_varint(self._data, offset)
+            offset += length
+        return self._read_record(offset)[0]
+
+    def get(self, key, default=None):
+        position = bisect.bisect_left(self._keys, key)
+        if position >= len(self._keys) or self._keys[position] != key:
+            return default
+        _, chunk, offset = INDEXED_KEY_ENTRY.unpack_from(
+            self._data, self._key_table_offset + position * INDEXED_KEY_ENTRY.size)
+        chunk_offset, _, _ = INDEXED_CHUNK_ENTRY.unpack_from(
+            self._data, self._chunk_table_offset + chunk * INDEXED_CHUNK_ENTRY.size)
+        return self._read_record(chunk_offset + offset)[0]
+
+    def _iter_rows(self):
+        offset = INDEXED_HEADER.size
+        for _ in range(self.row_count):
+            row, offset = self._read_record(offset)
+            yield row
+
+    def _read_record(self, offset):
+        length, offset = _read_varint(self._data, offset)
+        return self.row_class.FromString(self._data[offset:offset + length]), offset + length
+
+
+class SoaTable(ConfigTable):
+    """
+    soa 格式：各列为映射内存上的定长数组，按 (列, 行) 直接读取，不解析也不创建消息对象。
+    行为 SoaRow，字段名与生成的 {Table}Row 相同。
+    """
+
+    def __init__(self, name, path, data, row_class):
+        super().__init__(name, path, data, row_class)
+        if len(data) < SOA_HEADER.size:
+            raise ValueError(f"Invalid soa .dat file: {path}")
+        magic, version, self.row_count, column_count, _, key_count, key_table_offset, self._heap_offset, _ = \
+            SOA_HEADER.unpack_from(data, 0)
+        if magic != SOA_MAGIC:
+            raise ValueError(f"Invalid soa .dat file: {path}")
+        if version != SOA_VERSION:
+            raise ValueError(f"Unsupported soa .dat version {version} in {path}")
+
+        view = memoryview(data)
+        columns = {}  # 字段编号 -> (类型名, 列视图, 空值位图或 None)
+        for index in range(column_count):
+            field_number, type_code, flags, _, data_offset, null_offset = \
+                SOA_COLUMN_ENTRY.unpack_from(data, SOA_HEADER.size + index * SOA_COLUMN_ENTRY.size)
+            type_name, item_format = SOA_COLUMN_TYPES[type_code]
+            count = self.row_count * 2 if type_name == "string" else self.row_count
+            size = struct.calcsize(item_format)
+            values = view[data_offset:data_offset + count * size].cast(item_format)
+            nulls = None
+            if flags & SOA_FLAG_NULLABLE:
+                nulls = view[null_offset:null_offset + (self.row_count + 7) // 8]
+            columns[field_number] = (type_name, values, nulls)
+
+        # 字段名 -> 列；.proto 与 .dat 由同一次构建生成，字段编号一一对应
+        self._columns = {}
+        for field in row_class.DESCRIPTOR.fields:
+            if field.number not in columns:
+                raise ValueError(f"Field '{field.name}' not found in {path}; regenerate the Python code")
+            self._columns[field.name] = columns[field.number]
+
+        self._keys = view[key_table_offset:key_table_offset + key_count * 8].cast("q")
+        self._key_rows = view[key_table_offset + key_count * 8:key_table_offset + key_count * 12].cast("I")
+
+    def row(self, row):
+        if not 0 <= row < self.row_count:
+            raise IndexError(f"Row {row} out of range")
+        return SoaRow(self, row)
+
+    def get(self, key, default=None):
+        position = bisect.bisect_left(self._keys, key)
+        if position >= len(self._keys) or self._keys[position] != key:
+            return default
+        return SoaRow(self, self._key_rows[position])
+
+    def read(self, row, field_name):
+        """
+        读取一个单元格：time 字段返回 Timestamp，与 Protobuf 行一致。
+        """
+        column = self._columns.get(field_name)
+        if column is None:
+            raise AttributeError(f"Field '{field_name}' not found in table {self.name}")
+        type_name, values, _ = column
+        if type_name == "string":
+            start = self._heap_offset + values[row * 2]
+            return self._data[start:start + values[row * 2 + 1]].decode("utf-8")
+        if type_name == "bool":
+            return bool(values[row])
+        if type_name == "time":
+            return Timestamp(seconds=values[row])
+        return values[row]
+
+    def is_null(self, row, field_name):
+        """
+        可空字段在 Excel 中是否为空（不可空字段总是返回 False）。
+        """
+        nulls = self._columns[field_name][2]
+        return nulls is not None and not (nulls[row >> 3] >> (row & 7)) & 1
+
+    def value(self, row, field_name):
+        return self.read(row.row, field_name)
+
+    def _iter_field_values(self, field_name):
+        for row in range(self.row_count):
+            yield self.read(row, field_name)
+
+
+class SoaRow:
+    """
+    soa 表中的一行：只记录行号，读取属性时才从列中取值。
+    """
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getattr__(self, name):
+        return self.table.read(self.row, name)
+
+    def is_null(self, field_name):
+        return self.table.is_null(self.row, field_name)
+
+    def to_dict(self):
+        return {field_name: self.table.read(self.row, field_name) for field_name in self.table._columns}
+
+    def __repr__(self):
+        return f"SoaRow({self.table.name}, {self.to_dict()})"
+
+
+class ConfigDatabase:
+    """
+    一个 .dat 目录中所有表的共享入口：按需加载，线程安全，可在后台重新加载有变化的表。
+    """
+
+    def __init__(self, dat_dir, string_pool_fields=None):
+        """
+        :param dat_dir: .dat 文件目录
+        :param string_pool_fields: 表名 -> 写为字符串池下标的 string 字段，默认使用构建时生成的 STRING_POOL_FIELDS
+        """
+        self.dat_dir = dat_dir
+        self.string_pool_fields = STRING_POOL_FIELDS if string_pool_fields is None else string_pool_fields
+        self._lock = threading.RLock()
+        self._tables = {}    # 表名 -> ConfigTable
+        self._versions = {}  # 表名 -> 加载时的文件状态
+        self._strings = None
+        self._strings_version = None
+        self._reload_thread = None
+        self._reload_stop = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getitem__(self, table_name):
+        return self.table(table_name)
+
+    def __contains__(self, table_name):
+        return table_name != POOL_TABLE_NAME and os.path.exists(self._get_path(table_name))
+
+    def table_names(self):
+        """
+        目录中所有表的名称（不含字符串池）。
+        """
+        return sorted(file_name[:-len(DAT_SUFFIX)] for file_name in os.listdir(self.dat_dir)
+                      if file_name.endswith(DAT_SUFFIX) and file_name != POOL_TABLE_NAME + DAT_SUFFIX)
+
+    def table(self, table_name):
+        """
+        返回表对象；第一次访问时加载，之后各线程共享同一个对象，直到重新加载。
+        """
+        table = self._tables.get(table_name)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(table_name)
+                if table is None:
+                    if table_name not in self:
+                        raise KeyError(f"Config table not found: {table_name}")
+                    table, version = self._load_table(table_name)
+                    self._tables[table_name] = table
+                    self._versions[table_name] = version
+        return table
+
+    def get(self, table_name, key, default=None):
+        return self.table(table_name).get(key, default)
+
+    @property
+    def strings(self):
+        """
+        字符串池（下标 -> 字符串）；未启用字符串池时为空列表。
+        """
+        if self._strings is None:
+            with self._lock:
+                if self._strings is None:
+                    self._strings, self._strings_version = self._load_strings()
+        return self._strings
+
+    def reload(self):
+        """
+        重新加载文件有变化的已加载表（以及字符串池）；删除的表从数据库中移除。
+        加载失败的表保留旧版本，下次调用时重试。
+
+        :return: 重新加载或移除的表名列表
+        """
+        with self._lock:
+            # 字符串池只追加，先于引用它的表更新
+            if self._strings is not None and _get_file_version(self._get_path(POOL_TABLE_NAME)) != self._strings_version:
+                self._strings, self._strings_version = self._load_strings()
+
+            reloaded = []
+            for table_name, old_version in list(self._versions.items()):
+                version = _get_file_version(self._get_path(table_name))
+                if version == old_version:
+                    continue
+                if version is None:
+                    del self._tables[table_name]
+                    del self._versions[table_name]
+                    reloaded.append(table_name)
+                    continue
+                try:
+                    table, version = self._load_table(table_name)
+                except Exception:
+                    logger.exception("Failed to reload config table %s", table_name)
+                    continue
+                self._tables[table_name] = table
+                self._versions[table_name] = version
+                reloaded.append(table_name)
+            return reloaded
+
+    def start_auto_reload(self, interval=DEFAULT_RELOAD_INTERVAL, on_reload=None):
+        """
+        启动后台线程，每隔 interval 秒检查一次并重新加载有变化的表。
+
+        :param on_reload: 有表重新加载时在后台线程中调用，参数为表名列表
+        """
+        self.stop_auto_reload()
+        self._reload_stop = threading.Event()
+        self._reload_thread = threading.Thread(target=self._reload_loop, args=(interval, on_reload, self._reload_stop),
+                                               name="ConfigDatabaseReload", daemon=True)
+        self._reload_thread.start()
+
+    def stop_auto_reload(self):
+        if self._reload_thread is not None:
+            self._reload_stop.set()
+            self._reload_thread.join()
+            self._reload_thread = None
+            self._reload_stop = None
+
+    def close(self):
+        """
+        停止后台重新加载并释放所有表；已取得的表对象在不再被引用后释放映射。
+        """
+        self.stop_auto_reload()
+        with self._lock:
+            self._tables = {}
+            self._versions = {}
+            self._strings = None
+            self._strings_version = None
+
+    def _reload_loop(self, interval, on_reload, stop):
+        while not stop.wait(interval):
+            try:
+                reloaded = self.reload()
+                if reloaded and on_reload is not None:
+                    on_reload(reloaded)
+            except Exception:
+                logger.exception("Failed to reload config tables")
+
+    def _get_path(self, table_name):
+        return os.path.join(self.dat_dir, table_name + DAT_SUFFIX)
+
+    def _load_table(self, table_name):
+        path = self._get_path(table_name)
+        data, version = _map_file(path)
+        table_class, row_class = _load_message_classes(table_name)
+
+        if data[:len(SOA_MAGIC)] == SOA_MAGIC:
+            return SoaTable(table_name, path, data, row_class), version
+
+        pooled_fields = self.string_pool_fields.get(table_name, ())
+        strings = self.strings if pooled_fields else None
+        if data[:len(INDEXED_MAGIC)] == INDEXED_MAGIC:
+            table = IndexedTable(table_name, path, data, row_class, pooled_fields, strings)
+        else:
+            table = MessageTable(table_name, path, data, row_class, table_class, pooled_fields, strings)
+        return table, version
+
+    def _load_strings(self):
+        path = self._get_path(POOL_TABLE_NAME)
+        if not os.path.exists(path):
+            return [""], None
+        with open(path, 'rb') as f:
+            data = f.read()
+            version = _get_stat_version(os.fstat(f.fileno()))
+        values = []
+        position = 0
+        while position < len(data):
+            if data[position] != ROWS_TAG:
+                raise ValueError(f"Invalid string pool: {path}")
+            length, position = _read_varint(data, position + 1)
+            values.append(data[position:position + length].decode("utf-8"))
+            position += length
+        return values, version
+
+
+def _map_file(path):
+    """
+    内存映射 .dat 文件，返回 (数据, 文件状态)；空文件无法映射，返回 b""。
+    构建时 .dat 以替换文件的方式写出，已映射的旧文件内容保持不变。
+    """
+    with open(path, 'rb') as f:
+        version = _get_stat_version(os.fstat(f.fileno()))
+        if version[1] == 0:
+            return b"", version
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), version
+
+
+def _get_file_version(path):
+    try:
+        return _get_stat_version(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+def _get_stat_version(stat):
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+# 表结构变化后构造的消息类：序列化的 FileDescriptorProto -> ({Table} 消息类, {Table}Row 消息类)
+_message_classes = {}
+_message_classes_lock = threading.Lock()
+
+
+def _load_message_classes(table_name):
+    """
+    返回 ({Table} 消息类, {Table}Row 消息类)。
+
+    pb2 文件中的消息定义与已导入的模块一致时直接使用模块中的类；
+    不一致（模块导入后表结构变化并重新构建）时按文件中的定义在独立的 DescriptorPool 中构造，相同的定义只构造一次。
+    """
+    # 本文件作为包的一部分导入时，pb2 模块也从同一个包导入
+    module_name = f"{table_name}_pb2"
+    if __package__:
+        module_name = f"{__package__}.{module_name}"
+    module = importlib.import_module(module_name)
+
+    serialized = _read_serialized_descriptor(module.__file__)
+    if serialized is None or serialized == module.DESCRIPTOR.serialized_pb:
+        return getattr(module, table_name), getattr(module, f"{table_name}Row")
+
+    with _message_classes_lock:
+        classes = _message_classes.get(serialized)
+        if classes is None:
+            file_proto = descriptor_pb2.FileDescriptorProto.FromString(serialized)
+            pool = descriptor_pool.DescriptorPool()
+            for dependency in file_proto.dependency:
+                # 依赖（如 google/protobuf/timestamp.proto）与表结构无关，从默认 DescriptorPool 复制
+                dependency_proto = descriptor_pb2.FileDescriptorProto()
+                descriptor_pool.Default().FindFileByName(dependency).CopyToProto(dependency_proto)
+                pool.Add(dependency_proto)
+            pool.Add(file_proto)
+            classes = (message_factory.GetMessageClass(pool.FindMessageTypeByName(table_name)),
+                       message_factory.GetMessageClass(pool.FindMessageTypeByName(f"{table_name}Row")))
+            _message_classes[serialized] = classes
+    return classes
+
+
+def _read_serialized_descriptor(pb2_path):
+    """
+    从 protoc 生成的 pb2 文件中读出 AddSerializedFile 的参数（序列化的 FileDescriptorProto），不执行文件；
+    文件格式无法识别时返回 None。
+    """
+    try:
+        with open(pb2_path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), pb2_path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                and node.func.attr == "AddSerializedFile" and len(node.args) == 1 \
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, bytes):
+            return node.args[0].value
+    return None
+
+
+def _is_key_field(row_class):
+    field = row_class.DESCRIPTOR.fields_by_name.get(KEY_FIELD_NAME)
+    return field is not None and field.cpp_type in (field.CPPTYPE_INT32, field.CPPTYPE_INT64)
+
+
+def _to_index_key(value):
+    # Timestamp 消息不可哈希，按 UTC 秒数建立索引（表结构变化后构造的消息类中 Timestamp 属于独立的 DescriptorPool）
+    if isinstance(value, Timestamp) or getattr(getattr(value, "DESCRIPTOR", None), "full_name", None) == \
+            Timestamp.DESCRIPTOR.full_name:
+        return value.seconds
+    return value
+
+
+def _read_varint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+if sys.byteorder != "little":
+    raise ImportError("config_database requires a little-endian platform (soa/indexed .dat files are little-endian)")
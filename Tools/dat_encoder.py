@@ -0,0 +1,426 @@
+"""
+按列编码 .dat 文件。
+
+不再逐行逐格构造 Protobuf 对象，而是把每一列一次性转换为 NumPy 数组，直接编码为 Protobuf 线格式，
+再按列拼接出每一行的 {Table}Row 消息以及外层 {Table}.rows 字段。
+输出与 {Table}_pb2 构造消息后 SerializeToString() 的结果逐字节一致：
+字段按编号（即列顺序）输出，proto3 默认值（0、0.0、False、空字符串）不输出，time 字段总是输出。
+"""
+import calendar
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from schema import build_table_schema
+
+
+# Protobuf 线类型
+WIRE_VARINT = 0
+WIRE_FIXED32 = 5
+WIRE_LENGTH_DELIMITED = 2
+
+# {Table}.rows 的字段编号
+ROWS_FIELD_NUMBER = 1
+
+# 空 time 字段写入的默认值：UTC 最小时间
+MIN_TIMESTAMP_SECONDS = calendar.timegm(datetime.min.replace(tzinfo=timezone.utc).utctimetuple())
+
+TIME_FORMAT = "%Y-%m-%d-%H-%M-%S"
+
+INT_RANGES = {
+    "int": (-(1 << 31), (1 << 31) - 1),
+    "long": (-(1 << 63), (1 << 63) - 1),
+}
+
+
+def encode_table(df: pd.DataFrame, schema=None, string_pool=None):
+    """
+    把整张表编码为 {Table} 消息的字节串。
+
+    :param df: 表数据，列名为表头
+    :param schema: 该表的 TableSchema，不传时从表头解析
+    :param string_pool: 指定时 string 字段写为字符串池中的下标
+    :return: bytes
+    """
+    flat, lengths = encode_rows(df, schema, string_pool)
+    tag = _constant_part(_encode_tag(ROWS_FIELD_NUMBER, WIRE_LENGTH_DELIMITED), np.ones(len(lengths), dtype=bool))
+    flat, _ = _interleave([tag, _encode_varints(lengths), (flat, lengths)])
+    return flat.tobytes()
+
+
+def encode_rows(df: pd.DataFrame, schema=None, string_pool=None):
+    """
+    把每一行编码为 {Table}Row 消息。
+
+    :param df: 表数据，列名为表头
+    :param schema: 该表的 TableSchema，不传时从表头解析
+    :param string_pool: 指定时 string 字段写为字符串池中的 int32 下标（见 string_pool.py）
+    :return: (所有行消息首尾相接的 uint8 数组, 每行消息的字节数)
+    """
+    if schema is None:
+        schema = build_table_schema(None, df.columns)
+
+    row_count = len(df)
+    parts = []
+    for field, values in _iter_field_values(df, schema):
+        if string_pool is not None and field.field_type == "string":
+            ids = pd.Series(string_pool.get_ids(to_text(values)), index=values.index)
+            parts.append(encode_column(ids, "int", field.field_number, field.field_name))
+        else:
+            parts.append(encode_column(values, field.field_type, field.field_number, field.field_name))
+
+    if not parts:
+        return np.zeros(0, dtype=np.uint8), np.zeros(row_count, dtype=np.int64)
+    return _interleave(parts)
+
+
+def encode_delimited_rows(df: pd.DataFrame, schema=None, string_pool=None):
+    """
+    把每一行编码为带 varint 长度前缀的 {Table}Row 消息（即 writeDelimitedTo / ParseDelimitedFrom 的格式）。
+
+    :return: (所有记录首尾相接的 uint8 数组, 每条记录的字节数)
+    """
+    flat, lengths = encode_rows(df, schema, string_pool)
+    return _interleave([_encode_varints(lengths), (flat, lengths)])
+
+
+def collect_strings(df: pd.DataFrame, schema=None):
+    """
+    按出现顺序收集一张表所有 string 字段中去重后的字符串（与写入 .dat 的值一致）。
+    """
+    if schema is None:
+        schema = build_table_schema(None, df.columns)
+
+    strings = {}
+    for field, values in _iter_field_values(df, schema):
+        if field.field_type == "string":
+            strings.update(dict.fromkeys(to_text(values)))
+    return list(strings)
+
+
+def encode_repeated_strings(values, field_number=1):
+    """
+    把字符串列表编码为 repeated string 字段（空字符串同样输出，保证下标对应）。
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    flat, _ = _interleave([
+        _constant_part(_encode_tag(field_number, WIRE_LENGTH_DELIMITED), np.ones(len(encoded), dtype=bool)),
+        _encode_varints(lengths),
+        (np.frombuffer(b"".join(encoded), dtype=np.uint8), lengths),
+    ])
+    return flat.tobytes()
+
+
+def iter_column_values(df: pd.DataFrame, schema=None):
+    """
+    按字段顺序返回 (FieldSchema, 写入 .dat 的值, 空值掩码)，供非 Protobuf 的输出格式使用，取值规则与 .dat 一致：
+    int/long 为 int64，float 为 float32，bool 为 bool，time 为 UTC 秒数（空值为 MIN_TIMESTAMP_SECONDS），
+    string 为字符串列表（空值为空字符串）。
+    """
+    if schema is None:
+        schema = build_table_schema(None, df.columns)
+
+    for field, values in _iter_field_values(df, schema):
+        nulls = values.isna().to_numpy()
+        if field.field_type in INT_RANGES:
+            yield field, _to_int64(values, field.field_type, field.field_name), nulls
+        elif field.field_type == "float":
+            yield field, _to_float32(values, field.field_name), nulls
+        elif field.field_type == "bool":
+            yield field, _to_bool(values, field.field_name), nulls
+        elif field.field_type == "time":
+            yield field, _to_timestamp_seconds(values), nulls
+        elif field.field_type == "string":
+            yield field, to_text(values), nulls
+        else:
+            raise ValueError(f"Invalid field_type: {field.field_type}")
+
+
+def encode_int_keys(values: pd.Series, field_type: str, field_name: str):
+    """
+    把 int/long 字段转换为写入 .dat 的 int64 值（空值为 0），用于构建主键索引。
+    """
+    return _to_int64(values, field_type, field_name)
+
+
+def encode_column(values: pd.Series, field_type: str, field_number: int, field_name: str):
+    """
+    把一列编码为该字段在每一行中的线格式片段。
+
+    :return: (片段首尾相接的 uint8 数组, 每行片段的字节数)
+    """
+    if field_type in INT_RANGES:
+        ints = _to_int64(values, field_type, field_name)
+        present = ints != 0
+        return _join_parts(
+            _constant_part(_encode_tag(field_number, WIRE_VARINT), present),
+            _encode_varints(ints[present], present),
+        )
+
+    if field_type == "float":
+        floats = _to_float32(values, field_name)
+        bits = floats.view(np.uint32)
+        present = bits != 0
+        payload = bits[present].astype("<u4").view(np.uint8)
+        return _join_parts(
+            _constant_part(_encode_tag(field_number, WIRE_FIXED32), present),
+            (payload, present.astype(np.int64) * 4),
+        )
+
+    if field_type == "bool":
+        present = _to_bool(values, field_name)
+        return _join_parts(
+            _constant_part(_encode_tag(field_number, WIRE_VARINT), present),
+            _constant_part(b"\x01", present),
+        )
+
+    if field_type == "string":
+        encoded = _to_utf8(values)
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        present = lengths != 0
+        payload = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return _join_parts(
+            _constant_part(_encode_tag(field_number, WIRE_LENGTH_DELIMITED), present),
+            _encode_varints(lengths[present], present),
+            (payload, lengths),
+        )
+
+    if field_type == "time":
+        seconds = _to_timestamp_seconds(values)
+        present = np.ones(len(seconds), dtype=bool)
+        # google.protobuf.Timestamp：seconds 为字段 1；由字符串解析的时间 nanos 恒为 0，不输出
+        has_seconds = seconds != 0
+        message = _join_parts(
+            _constant_part(_encode_tag(1, WIRE_VARINT), has_seconds),
+            _encode_varints(seconds[has_seconds], has_seconds),
+        )
+        return _join_parts(
+            _constant_part(_encode_tag(field_number, WIRE_LENGTH_DELIMITED), present),
+            _encode_varints(message[1]),
+            message,
+        )
+
+    raise ValueError(f"Invalid field_type: {field_type}")
+
+
+def parse_time_seconds(values: pd.Series):
+    """
+    把 'yyyy-MM-dd-HH-mm-ss' 字符串列解析为 UTC 秒数。
+
+    :return: (int64 秒数数组, 解析失败的行的布尔掩码)；空值与非字符串值视为解析失败
+    """
+    strings = values.where(values.map(lambda v: isinstance(v, str)))
+    parsed = pd.to_datetime(strings, format=TIME_FORMAT, errors="coerce").to_numpy()
+    invalid = np.isnat(parsed)
+    seconds = np.zeros(len(values), dtype=np.int64)
+    seconds[~invalid] = parsed[~invalid].astype("datetime64[s]").astype(np.int64)
+
+    # 超出 pandas 纳秒精度范围的年份（如 0001、9999）逐个解析
+    for position in np.flatnonzero(invalid & strings.notna().to_numpy()):
+        parsed_seconds = _parse_time_string(values.iloc[position])
+        if parsed_seconds is not None:
+            seconds[position] = parsed_seconds
+            invalid[position] = False
+
+    return seconds, invalid
+
+
+def _parse_time_string(value):
+    try:
+        components = value.split("-")
+        if len(components) != 6:
+            return None
+        year, month, day, hour, minute, second = map(int, components)
+        dt = datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc)
+        return calendar.timegm(dt.utctimetuple())
+    except ValueError:
+        return None
+
+
+def _iter_field_values(df, schema):
+    """
+    按字段顺序返回 (FieldSchema, 写入 .dat 前的列数据)。
+    """
+    float_rows = _uses_float_rows(df)
+    for field in schema.fields:
+        values = df[field.column]
+        if float_rows:
+            values = values.astype(np.float64)
+        yield field, values
+
+
+def _uses_float_rows(df):
+    """
+    原实现用 df.iterrows() 取值：全部列都是非布尔数值且至少有一列浮点时，每一行都会被转换为 float64，
+    字符串列也会得到 '1.0' 这样的值。这里按相同规则处理以保证输出一致。
+    """
+    dtypes = list(df.dtypes)
+    if not dtypes:
+        return False
+    all_numeric = all(pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in dtypes)
+    return all_numeric and any(pd.api.types.is_float_dtype(t) for t in dtypes)
+
+
+def _to_int64(values, field_type, field_name):
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+        ints = values.to_numpy(dtype=np.int64)
+    elif pd.api.types.is_float_dtype(values):
+        floats = values.to_numpy(dtype=np.float64)
+        floats = np.where(np.isnan(floats), 0.0, floats)
+        if not np.isfinite(floats).all():
+            raise OverflowError(f"cannot convert float infinity to integer in field '{field_name}'")
+        # 超出 int64 的浮点数转换结果未定义，先按浮点数检查范围
+        out_of_range = (floats < -2.0 ** 63) | (floats >= 2.0 ** 63)
+        if out_of_range.any():
+            value = int(floats[np.argmax(out_of_range)])
+            raise TypeError(f"Failed to set field '{field_name}'. Error: Value out of range: {value}")
+        ints = np.trunc(floats).astype(np.int64)
+    else:
+        ints = np.array([0 if _is_null(v) else int(v) for v in values], dtype=np.int64)
+
+    low, high = INT_RANGES[field_type]
+    out_of_range = (ints < low) | (ints > high)
+    if out_of_range.any():
+        value = ints[np.argmax(out_of_range)]
+        raise TypeError(f"Failed to set field '{field_name}'. Error: Value out of range: {value}")
+    return ints
+
+
+def _to_float32(values, field_name):
+    if pd.api.types.is_numeric_dtype(values):
+        floats = values.to_numpy(dtype=np.float64)
+    else:
+        floats = np.array([np.nan if _is_null(v) else float(v) for v in values], dtype=np.float64)
+    floats = np.where(np.isnan(floats), 0.0, floats)
+    with np.errstate(over="ignore"):
+        return floats.astype(np.float32)
+
+
+def _to_bool(values, field_name):
+    if pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=bool)
+
+    if pd.api.types.is_numeric_dtype(values):
+        floats = values.to_numpy(dtype=np.float64)
+        floats = np.where(np.isnan(floats), 0.0, floats)
+        ints = np.trunc(floats)
+        invalid = (ints != 0) & (ints != 1)
+        if invalid.any():
+            raise ValueError(f"Invalid value for bool: {floats[np.argmax(invalid)]}")
+        return ints == 1
+
+    result = np.zeros(len(values), dtype=bool)
+    for position, value in enumerate(values):
+        if _is_null(value):
+            continue
+        if isinstance(value, (bool, np.bool_)):
+            result[position] = bool(value)
+        elif isinstance(value, (int, float, np.number)) and int(value) in [0, 1]:
+            result[position] = bool(int(value))
+        elif isinstance(value, str) and value.lower().strip() in ("true", "false"):
+            result[position] = value.lower().strip() == "true"
+        else:
+            raise ValueError(f"Invalid value for bool: {value}")
+    return result
+
+
+def _to_utf8(values):
+    return [text.encode("utf-8") for text in to_text(values)]
+
+
+def to_text(values):
+    """
+    把 string 字段转换为写入 .dat 的字符串（空值为空字符串）。
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        nulls = values.isna().to_numpy()
+        return ["" if null else str(v) for v, null in zip(values.tolist(), nulls)]
+    return ["" if _is_null(v) else str(v) for v in values]
+
+
+def _to_timestamp_seconds(values):
+    seconds, invalid = parse_time_seconds(values)
+
+    nulls = values.isna().to_numpy()
+    seconds[nulls] = MIN_TIMESTAMP_SECONDS
+
+    invalid &= ~nulls
+    if invalid.any():
+        value = values.iloc[np.argmax(invalid)]
+        if isinstance(value, str):
+            raise ValueError(f"Error processing time value: {value}. Expected format: 'yyyy-MM-dd-HH-mm-ss'")
+        raise ValueError(f"Unsupported time input: {value}, type: {type(value)}")
+    return seconds
+
+
+def _is_null(value):
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+def _encode_tag(field_number, wire_type):
+    flat, _ = _encode_varints(np.array([(field_number << 3) | wire_type], dtype=np.int64))
+    return flat.tobytes()
+
+
+def _encode_varints(values, present=None):
+    """
+    向量化 varint 编码；负数按 64 位补码编码（10 字节），与 int32/int64 字段一致。
+
+    :param values: int64 数组
+    :param present: 可选的布尔掩码；指定时 values 只包含掩码为 True 的行，其余行片段为空
+    :return: (编码后首尾相接的 uint8 数组, 每行的字节数)
+    """
+    unsigned = np.asarray(values, dtype=np.int64).view(np.uint64)
+
+    lengths = np.ones(len(unsigned), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        lengths += (unsigned >> np.uint64(shift)) != 0
+
+    groups = np.empty((len(unsigned), 10), dtype=np.uint8)
+    for index in range(10):
+        groups[:, index] = ((unsigned >> np.uint64(7 * index)) & np.uint64(0x7F)).astype(np.uint8)
+    positions = np.arange(10)
+    groups[positions < (lengths[:, None] - 1)] |= 0x80
+    flat = groups[positions < lengths[:, None]]
+
+    if present is None:
+        return flat, lengths
+    row_lengths = np.zeros(len(present), dtype=np.int64)
+    row_lengths[present] = lengths
+    return flat, row_lengths
+
+
+def _constant_part(data, present):
+    """
+    在 present 为 True 的行放置同一段字节（如字段 tag），其余行为空。
+    """
+    count = int(np.count_nonzero(present))
+    flat = np.tile(np.frombuffer(data, dtype=np.uint8), count)
+    return flat, present.astype(np.int64) * len(data)
+
+
+def _join_parts(*parts):
+    return _interleave(list(parts))
+
+
+def _interleave(parts):
+    """
+    把若干按行切分的片段逐行拼接：第 i 行的结果依次为每个片段的第 i 行。
+
+    :param parts: [(uint8 数组, 每行字节数), ...]，行数相同
+    :return: (拼接后的 uint8 数组, 每行字节数)
+    """
+    lengths = np.vstack([part_lengths for _, part_lengths in parts])
+    row_lengths = lengths.sum(axis=0)
+    row_starts = np.cumsum(row_lengths) - row_lengths
+    out = np.empty(int(row_lengths.sum()), dtype=np.uint8)
+
+    offset_in_row = np.zeros(len(row_lengths), dtype=np.int64)
+    for (flat, part_lengths), part_row_lengths in zip(parts, lengths):
+        if len(flat) > 0:
+            source_starts = np.cumsum(part_row_lengths) - part_row_lengths
+            shifts = np.repeat(row_starts + offset_in_row - source_starts, part_row_lengths)
+            out[np.arange(len(flat)) + shifts] = flat
+        offset_in_row += part_row_lengths
+
+    return out, row_lengths
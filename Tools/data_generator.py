@@ -1,34 +1,31 @@
+import json
 import pandas as pd
 import util
+import dat_encoder
+import indexed_dat
+import message_types
+import soa_dat
+from schema import BACKENDS, PROTO_TYPES, build_table_schema
+from string_pool import get_ref_field_name
 from google.protobuf.timestamp_pb2 import Timestamp
 from datetime import datetime, timezone
 
-PROTO_TYPES = {
-    "int": "int32",
-    "long": "int64",
-    "float": "float",
-    "string": "string",
-    "bool": "bool",
-    "time": "google.protobuf.Timestamp"
-}
-
-def generate_proto_file(df, proto_output_path, table_name):
-    """
-    单独生成 .proto 文件，不涉及 pb2.py 的动态加载
+def generate_proto_file(proto_output_path, table_name, schema, string_pool=False):
     """
+    单独生成 .proto 文件（与 message_types.build_file_descriptor 构造的消息定义一致），只依赖表头，不需要表数据
 
+    :param string_pool: 启用字符串池时 string 字段写为 int32 {name}_ref（字符串池下标）
+    """
     include_time = False
     proto_fields = ""
 
-    for index, col in enumerate(df.columns):
-        components = util.get_field_components(col)
-
-        field_name = components.get("field_name")
-        field_type = components.get("field_type")
-        proto_type = PROTO_TYPES.get(field_type)
-        proto_fields += f"    {proto_type} {field_name} = {index + 1};\n"
+    for field in schema.fields:
+        if string_pool and field.field_type == "string":
+            proto_fields += f"    int32 {get_ref_field_name(field.field_name)} = {field.field_number};\n"
+        else:
+            proto_fields += f"    {field.proto_type} {field.field_name} = {field.field_number};\n"
 
-        if field_type == "time":
+        if field.field_type == "time":
             include_time = True
 
     proto_content = f"""
@@ -52,49 +49,137 @@ message {table_name} {{
     repeated {table_name}Row rows = 1;
 }}
 """
-    with open(proto_output_path, 'w') as proto_file:
-        proto_file.write(proto_content)
+    # 内容未变化时不重写文件，返回值表示 .proto 是否有变化
+    changed = util.write_file_if_changed(proto_output_path, proto_content)
     #print(f"Successfully wrote .proto file to {proto_output_path}")
+    return changed
+
+
+def generate_schema_file(schema_output_path, schema, id_range, backend="protobuf"):
+    """
+    生成 {Table}.schema.json：.dat 格式、加载优先级、字段类型、空标记、Index 约束以及 id 的取值范围，
+    供 generate_config_cs.py 生成二级索引和稠密 id 的数组索引（soa 格式生成列存访问器）以及 ConfigDataManager。
+
+    :param id_range: id 的取值范围（见 get_id_range，分块模式下逐批累计），没有 int/long 类型的 id 字段时为 None
+    """
+    content = {
+        "table": schema.table_name,
+        "backend": backend,
+        "priority": schema.priority,
+        "fields": [
+            {
+                "name": field.field_name,
+                "type": field.field_type,
+                "nullable": field.nullable,
+                "index": field.index_kind,
+            }
+            for field in schema.fields
+        ],
+        "id": id_range,
+    }
+
+    return util.write_file_if_changed(schema_output_path, json.dumps(content, indent=2, ensure_ascii=False))
+
+
+def get_id_range(df, schema, previous=None):
+    """
+    id 字段的取值范围 {"min", "max", "count"}；没有 int/long 类型的 id 字段时返回 None。
+
+    :param previous: 之前各批数据的统计结果，指定时与 df 合并
+    """
+    id_field = schema.get_field("id")
+    if id_field is None or id_field.field_type not in dat_encoder.INT_RANGES:
+        return None
+
+    ids = dat_encoder.encode_int_keys(df[id_field.column], id_field.field_type, id_field.field_name)
+    if not len(ids):
+        return previous or {"min": 0, "max": 0, "count": 0}
+    id_range = {"min": int(ids.min()), "max": int(ids.max()), "count": len(ids)}
+    if previous and previous["count"]:
+        id_range = {
+            "min": min(previous["min"], id_range["min"]),
+            "max": max(previous["max"], id_range["max"]),
+            "count": previous["count"] + id_range["count"],
+        }
+    return id_range
+
 
+# .dat 编码方式：columnar 为按列直接编码线格式；protobuf 为逐行构造 Protobuf 消息（作为对照实现保留）
+DAT_ENCODERS = ("columnar", "protobuf")
 
-def generate_dat_file(df, table_name, dat_output_path):
+# .dat 文件格式：message 为一条 {Table} 消息；indexed 为分块记录 + 主键索引（见 indexed_dat）
+DAT_FORMATS = ("message", "indexed")
+
+
+def generate_dat_file(df, table_name, dat_output_path, encoder="columnar", schema=None, dat_format="message",
+                      chunk_rows=indexed_dat.DEFAULT_CHUNK_ROWS, string_pool=None, backend="protobuf"):
     """
-    依赖 pb2.py，使用动态加载的 Protobuf 模块生成 .dat 文件
+    生成 .dat 文件，两种编码方式输出逐字节一致
+
+    :param string_pool: StringPool，指定时 string 字段写为字符串池下标（仅 columnar 编码方式）
+    :param backend: protobuf 按 encoder/dat_format 输出 Protobuf 数据；soa 输出定长列存格式（见 soa_dat.py）
     """
-    import importlib
+    if string_pool is not None and encoder != "columnar":
+        raise ValueError(f"The string pool requires the columnar encoder, got '{encoder}'")
+
+    if backend == "soa":
+        if string_pool is not None:
+            raise ValueError("The soa backend stores strings in its own heap and cannot use the string pool")
+        data = soa_dat.encode_soa_table(df, schema)
+    elif backend != "protobuf":
+        raise ValueError(f"Unsupported backend: '{backend}' (expected one of {BACKENDS})")
+    elif dat_format == "indexed":
+        if encoder != "columnar":
+            raise ValueError(f"The indexed dat format requires the columnar encoder, got '{encoder}'")
+        data = indexed_dat.encode_indexed_table(df, schema, chunk_rows, string_pool)
+    elif dat_format != "message":
+        raise ValueError(f"Unsupported dat format: '{dat_format}' (expected one of {DAT_FORMATS})")
+    elif encoder == "columnar":
+        data = dat_encoder.encode_table(df, schema, string_pool)
+    elif encoder == "protobuf":
+        data = encode_table_protobuf(df, table_name, schema)
+    else:
+        raise ValueError(f"Unsupported dat encoder: '{encoder}' (expected one of {DAT_ENCODERS})")
+
+    util.write_file_if_changed(dat_output_path, data)
+    #print(f"Successfully wrote .dat file to {dat_output_path}")
+
 
-    try:
-        table_proto_module = importlib.import_module(f"{table_name}_pb2")
-    except ModuleNotFoundError:
-        raise RuntimeError(f"\nGenerated Protobuf module {table_name}_pb2.py not found. Ensure protoc was run correctly.")
+def encode_table_protobuf(df, table_name, schema=None):
+    """
+    逐行构造 Protobuf 消息并序列化；消息类由表头在进程内构造（见 message_types.py），不依赖 protoc 生成的 pb2 模块
+    """
+    if schema is None:
+        schema = build_table_schema(table_name, df.columns)
 
-    proto_data_class = getattr(table_proto_module, table_name)
+    proto_data_class, _ = message_types.get_message_classes(table_name, schema)
     proto_data = proto_data_class()
 
     for _, row in df.iterrows():
         proto_row = proto_data.rows.add()
-        for col in df.columns:
-            parts = col.split('|')
-            field_name, field_type = parts[0], parts[1]
-            value = parse_value(row[col], field_type)
+        for field in schema.fields:
+            field_name = field.field_name
+            value = parse_value(row[field.column], field.field_type)
 
             if pd.isna(value) or value is None:
                 continue
 
-            if isinstance(value, Timestamp): # 在 Protobuf 动态数据结构中，直接赋值 Timestamp 对象不被接受，需要使用 Protobuf 的 CopyFrom 方法。
+            if isinstance(value, Timestamp):
+                # 动态消息类的 Timestamp 与 timestamp_pb2.Timestamp 属于不同的 DescriptorPool，不能直接 CopyFrom
                 try:
-                    getattr(proto_row, field_name).CopyFrom(value)
+                    field_value = getattr(proto_row, field_name)
+                    field_value.SetInParent()
+                    field_value.seconds = value.seconds
+                    field_value.nanos = value.nanos
                 except Exception as e:
-                    raise TypeError(f"Failed to set field '{field_name}' with CopyFrom. Error: {str(e)}")
+                    raise TypeError(f"Failed to set field '{field_name}'. Error: {str(e)}")
             else:
                 try:
                     setattr(proto_row, field_name, value)
                 except Exception as e:
                     raise TypeError(f"Failed to set field '{field_name}'. Error: {str(e)}")
 
-    with open(dat_output_path, 'wb') as dat_file:
-        dat_file.write(proto_data.SerializeToString())
-    #print(f"Successfully wrote .dat file to {dat_output_path}")
+    return proto_data.SerializeToString()
 
 
 def parse_value(value, field_type: str):
@@ -0,0 +1,395 @@
+"""
+热更新用的行级增量补丁（--patch-base）。
+
+把本次构建的 .dat 与上一个发布版本的 .dat（--patch-base 指定的目录）按主键 id 逐行比较，
+为每张有变化的表生成只包含新增、修改、删除行的 {Table}.patch，客户端用生成的 {Table}Config.ApplyPatch
+原地应用，下载量和应用耗时只与变化的行数有关。
+
+两种 .dat 格式（message / indexed）都可作为基准或目标；行按 {Table}Row 的线格式字节比较。
+ApplyPatch 原地替换修改的行、删除的行，新增的行追加在末尾；生成补丁时按同样的规则重建目标版本，
+行的顺序与目标 .dat 不一致（如只调整了行序、在中间插入了行）时补丁无法还原目标版本，改为下载完整的 .dat。
+没有 int/long 主键的表、主键重复的表、soa 格式的表、新增的表以及补丁不比整表小的表
+需要下载完整的 .dat（patches.json 中 mode 为 full）。
+
+补丁文件布局（整数均为小端）：
+
+    header   magic "XPAT" | u32 version | u32 key_field_number | u32 added_count | u32 modified_count
+             | u32 deleted_count | 32 字节基准 .dat 的 SHA-256 | 32 字节目标 .dat 的 SHA-256
+    rows     (added_count + modified_count) × (varint 长度 | {Table}Row 记录)，新增在前
+    deleted  deleted_count × i64 主键
+"""
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+import dat_encoder
+import indexed_dat
+import soa_dat
+import util
+
+MAGIC = b"XPAT"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sIIIII32s32s")
+
+PATCH_SUFFIX = ".patch"
+
+# 补丁目录中的汇总文件：每张有变化的表应下载补丁、完整 .dat，还是删除
+SUMMARY_FILE_NAME = "patches.json"
+
+# C# 端补丁读取器，与 {Table}Config.cs 一起生成
+LOADER_FILE_NAME = "ConfigPatch.cs"
+
+
+def read_records(data):
+    """
+    把 .dat 数据拆分为每行的 {Table}Row 字节。
+
+    :return: (记录列表, indexed 格式记录的主键字段编号；message 格式为 None)
+    """
+    if data[:4] == soa_dat.MAGIC:
+        raise ValueError("the soa backend has no row records")
+
+    min_size = indexed_dat.HEADER.size + indexed_dat.TRAILER.size
+    if len(data) >= min_size and data[:4] == indexed_dat.MAGIC and data[-4:] == indexed_dat.MAGIC:
+        trailer = indexed_dat.TRAILER.unpack_from(data, len(data) - indexed_dat.TRAILER.size)
+        chunk_table_offset, key_field_number = trailer[0], trailer[4]
+        return _split_records(data, indexed_dat.HEADER.size, chunk_table_offset), key_field_number
+
+    records = []
+    rows_tag = (dat_encoder.ROWS_FIELD_NUMBER << 3) | dat_encoder.WIRE_LENGTH_DELIMITED
+    position = 0
+    while position < len(data):
+        tag, position = _read_varint(data, position)
+        if tag != rows_tag:
+            raise ValueError(f"Unexpected tag {tag} in .dat data")
+        length, position = _read_varint(data, position)
+        records.append(data[position:position + length])
+        position += length
+    return records, None
+
+
+def get_record_key(record, key_field_number):
+    """
+    读取一条 {Table}Row 记录中主键字段的值；proto3 不输出默认值，缺省时为 0。
+    """
+    key = 0
+    position = 0
+    while position < len(record):
+        tag, position = _read_varint(record, position)
+        field_number, wire_type = tag >> 3, tag & 7
+        if wire_type == dat_encoder.WIRE_VARINT:
+            value, position = _read_varint(record, position)
+            if field_number == key_field_number:
+                key = value - (1 << 64) if value >= (1 << 63) else value
+        elif wire_type == dat_encoder.WIRE_LENGTH_DELIMITED:
+            length, position = _read_varint(record, position)
+            position += length
+        elif wire_type == dat_encoder.WIRE_FIXED32:
+            position += 4
+        elif wire_type == 1:
+            position += 8
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type} in row record")
+    return key
+
+
+def get_keyed_records(data, key_field_number):
+    """
+    :return: 主键 -> 记录字节（按行顺序）；主键重复时按行无法区分，抛出 ValueError
+    """
+    records, indexed_key_field_number = read_records(data)
+    if indexed_key_field_number not in (None, key_field_number):
+        raise ValueError(f"Key field number mismatch: {indexed_key_field_number} != {key_field_number}")
+    keyed_records = {}
+    for record in records:
+        key = get_record_key(record, key_field_number)
+        if key in keyed_records:
+            raise ValueError(f"duplicate id {key}")
+        keyed_records[key] = record
+    return keyed_records
+
+
+def diff_records(base, target):
+    """
+    :param base: 基准版本的 主键 -> 记录
+    :param target: 目标版本的 主键 -> 记录
+    :return: (新增记录列表, 修改记录列表, 删除的主键列表)，均按目标/基准中的顺序
+    """
+    added = [record for key, record in target.items() if key not in base]
+    modified = [record for key, record in target.items() if key in base and base[key] != record]
+    deleted = [key for key in base if key not in target]
+    return added, modified, deleted
+
+
+def encode_patch(added, modified, deleted, key_field_number, base_hash, target_hash):
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, key_field_number, len(added), len(modified), len(deleted),
+                         base_hash, target_hash)]
+    for record in added + modified:
+        parts.append(_encode_varint(len(record)))
+        parts.append(bytes(record))
+    parts.append(np.asarray(deleted, dtype="<i8").tobytes())
+    return b"".join(parts)
+
+
+def read_patch(data):
+    """
+    :return: {"key_field_number", "added", "modified", "deleted", "base_hash", "target_hash"}
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Invalid patch file")
+    magic, version, key_field_number, added_count, modified_count, deleted_count, base_hash, target_hash = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Invalid patch file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported patch version {version}")
+
+    position = HEADER.size
+    records = []
+    for _ in range(added_count + modified_count):
+        length, position = _read_varint(data, position)
+        records.append(data[position:position + length])
+        position += length
+    deleted = np.frombuffer(data, dtype="<i8", count=deleted_count, offset=position).tolist()
+    return {
+        "key_field_number": key_field_number,
+        "added": records[:added_count],
+        "modified": records[added_count:],
+        "deleted": deleted,
+        "base_hash": base_hash,
+        "target_hash": target_hash,
+    }
+
+
+def apply_patch(base, patch):
+    """
+    在 主键 -> 记录（按行顺序）上应用补丁，返回新的映射，行顺序与 C# ApplyPatch 一致：
+    先删除，修改的行原地替换，其余的行按补丁中的顺序追加在末尾。
+    """
+    deleted = set(patch["deleted"])
+    result = {key: record for key, record in base.items() if key not in deleted}
+    appended = {}
+    for record in patch["added"] + patch["modified"]:
+        key = get_record_key(record, patch["key_field_number"])
+        if key in result:
+            result[key] = record
+        else:
+            appended[key] = record
+    result.update(appended)
+    return result
+
+
+def make_table_patch(base_data, target_data, key_field_number):
+    """
+    :param key_field_number: 主键字段编号，为 None 时表没有可用的主键
+    :return: (补丁字节或 None, 汇总条目)
+    """
+    base_hash = hashlib.sha256(base_data).digest()
+    target_hash = hashlib.sha256(target_data).digest()
+    entry = {"base_hash": base_hash.hex(), "target_hash": target_hash.hex(), "dat_size": len(target_data)}
+
+    if key_field_number is None:
+        entry.update(mode="full", reason="no int/long id field")
+        return None, entry
+    try:
+        base = get_keyed_records(base_data, key_field_number)
+        target = get_keyed_records(target_data, key_field_number)
+    except (IndexError, ValueError) as e:
+        entry.update(mode="full", reason=f"cannot diff rows: {e}")
+        return None, entry
+
+    added, modified, deleted = diff_records(base, target)
+    patched = apply_patch(base, {"key_field_number": key_field_number, "added": added, "modified": modified,
+                                 "deleted": deleted})
+    if list(patched.items()) != list(target.items()):
+        # 应用补丁后的行序与目标版本不同，target_hash 无法对上
+        entry.update(mode="full", reason="row order changed")
+        return None, entry
+
+    patch = encode_patch(added, modified, deleted, key_field_number, base_hash, target_hash)
+    entry.update(added=len(added), modified=len(modified), deleted=len(deleted), size=len(patch))
+    if len(patch) >= len(target_data):
+        entry.update(mode="full", reason="patch is not smaller than the table")
+        return None, entry
+    entry["mode"] = "patch"
+    return patch, entry
+
+
+def get_key_field_number(schema):
+    """
+    主键为名为 id 的 int/long 字段，与 indexed 格式一致；没有时返回 None。
+    """
+    field = schema.get_field(indexed_dat.KEY_FIELD_NAME) if schema is not None else None
+    if field is None or field.field_type not in dat_encoder.INT_RANGES:
+        return None
+    return field.field_number
+
+
+def write_patches(base_dat_dir, dat_dir, patch_dir, schemas):
+    """
+    为 dat_dir 中相对 base_dat_dir 有变化的表生成补丁，并写出 patches.json。
+
+    :param schemas: 表名 -> TableSchema，用于确定主键字段
+    :return: 表名 -> 汇总条目（只包含有变化的表）
+    """
+    base_tables = _list_dat_files(base_dat_dir)
+    target_tables = _list_dat_files(dat_dir)
+    os.makedirs(patch_dir, exist_ok=True)
+
+    summary = {}
+    for table_name in sorted(set(base_tables) | set(target_tables)):
+        patch_path = os.path.join(patch_dir, f"{table_name}{PATCH_SUFFIX}")
+        patch = None
+        if table_name not in target_tables:
+            summary[table_name] = {"mode": "removed"}
+        else:
+            with open(target_tables[table_name], 'rb') as f:
+                target_data = f.read()
+            if table_name not in base_tables:
+                summary[table_name] = {"mode": "full", "reason": "new table",
+                                       "target_hash": hashlib.sha256(target_data).hexdigest(),
+                                       "dat_size": len(target_data)}
+            else:
+                with open(base_tables[table_name], 'rb') as f:
+                    base_data = f.read()
+                if base_data != target_data:
+                    patch, entry = make_table_patch(base_data, target_data,
+                                                    get_key_field_number(schemas.get(table_name)))
+                    if patch is not None:
+                        entry["file"] = os.path.basename(patch_path)
+                    summary[table_name] = entry
+
+        # 只保留本次有效的补丁，避免客户端误用旧补丁
+        if patch is not None:
+            util.write_file_if_changed(patch_path, patch)
+        elif os.path.exists(patch_path):
+            os.remove(patch_path)
+
+    content = json.dumps({"format": FORMAT_VERSION, "tables": summary}, indent=2, ensure_ascii=False, sort_keys=True)
+    util.write_file_if_changed(os.path.join(patch_dir, SUMMARY_FILE_NAME), content)
+    return summary
+
+
+def _list_dat_files(dat_dir):
+    if not os.path.isdir(dat_dir):
+        return {}
+    return {os.path.splitext(file_name)[0]: os.path.join(dat_dir, file_name)
+            for file_name in os.listdir(dat_dir) if file_name.endswith(".dat")}
+
+
+def _split_records(data, start, end):
+    records = []
+    position = start
+    while position < end:
+        length, position = _read_varint(data, position)
+        records.append(data[position:position + length])
+        position += length
+    return records
+
+
+def _read_varint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _encode_varint(value):
+    parts = bytearray()
+    while value >= 0x80:
+        parts.append((value & 0x7F) | 0x80)
+        value >>= 7
+    parts.append(value)
+    return bytes(parts)
+
+
+def generate_loader_cs(output_dir):
+    """
+    生成 C# 端的 ConfigPatch 读取器（{Table}Config.ApplyPatch 的参数）。
+
+    :return: 文件是否有变化
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    return util.write_file_if_changed(os.path.join(output_dir, LOADER_FILE_NAME), LOADER_TEMPLATE)
+
+
+LOADER_TEMPLATE = """
+using System;
+using System.Collections.Generic;
+using System.IO;
+
+// 热更新补丁读取器，文件格式见 Tools/delta_patch.py
+// 用法：var patch = ConfigPatch.Load(path); config.ApplyPatch(patch);
+public sealed class ConfigPatch
+{
+    private const uint Magic = 0x54415058; // "XPAT"
+    private const uint FormatVersion = 1;
+
+    public uint KeyFieldNumber { get; private set; }
+    public byte[] BaseHash { get; private set; }    // 补丁基准 .dat 的 SHA-256，应与客户端当前版本一致
+    public byte[] TargetHash { get; private set; }  // 应用后对应的 .dat 的 SHA-256
+    public List<byte[]> Added { get; } = new List<byte[]>();     // 新增行的 {Table}Row 数据
+    public List<byte[]> Modified { get; } = new List<byte[]>();  // 修改行的 {Table}Row 数据
+    public long[] Deleted { get; private set; } = Array.Empty<long>();
+
+    public static ConfigPatch Load(string path)
+    {
+        if (!File.Exists(path))
+            throw new FileNotFoundException($"Config patch not found: {path}");
+        return FromBytes(File.ReadAllBytes(path));
+    }
+
+    public static ConfigPatch FromBytes(byte[] data)
+    {
+        var patch = new ConfigPatch();
+        using (var reader = new BinaryReader(new MemoryStream(data, false)))
+        {
+            if (reader.ReadUInt32() != Magic)
+                throw new InvalidDataException("Invalid config patch");
+            if (reader.ReadUInt32() != FormatVersion)
+                throw new InvalidDataException("Unsupported config patch version");
+
+            patch.KeyFieldNumber = reader.ReadUInt32();
+            var addedCount = reader.ReadUInt32();
+            var modifiedCount = reader.ReadUInt32();
+            var deletedCount = reader.ReadUInt32();
+            patch.BaseHash = reader.ReadBytes(32);
+            patch.TargetHash = reader.ReadBytes(32);
+
+            for (long i = 0; i < addedCount + modifiedCount; i++)
+            {
+                var record = reader.ReadBytes(ReadVarint(reader));
+                (i < addedCount ? patch.Added : patch.Modified).Add(record);
+            }
+
+            patch.Deleted = new long[deletedCount];
+            for (int i = 0; i < deletedCount; i++)
+            {
+                patch.Deleted[i] = reader.ReadInt64();
+            }
+        }
+        return patch;
+    }
+
+    private static int ReadVarint(BinaryReader reader)
+    {
+        int result = 0;
+        int shift = 0;
+        while (true)
+        {
+            var b = reader.ReadByte();
+            result |= (b & 0x7F) << shift;
+            if (b < 0x80)
+                return result;
+            shift += 7;
+        }
+    }
+}
+"""
@@ -1,6 +1,181 @@
+import numpy as np
 import pandas as pd
+import util
+
+# 读取模式：pandas 为 pd.read_excel 全量解析；stream 为 openpyxl 只读流式解析
+READER_MODES = ("pandas", "stream")
+
+# 流式读取时每批的行数
+DEFAULT_BATCH_SIZE = 10000
+
+# 按内存上限确定批大小时，第一批用于估算每行内存的行数
+PROBE_ROWS = 1000
+
+
+def read_excel(file_path: str, mode: str = "pandas"):
+    if mode == "stream":
+        return read_excel_streaming(file_path)
+    if mode != "pandas":
+        raise ValueError(f"Unsupported reader mode: '{mode}' (expected one of {READER_MODES})")
 
-def read_excel(file_path: str):
     # 读取 Excel 文件
     df = pd.read_excel(file_path, engine='openpyxl')
-    return df
\ No newline at end of file
+    return df
+
+
+def read_excel_streaming(file_path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    以只读流式方式读取整个工作表，遇到第一个整行空白即停止。
+
+    :return: 按表头类型转换后的 DataFrame
+    """
+    header = None
+    batches = []
+    for columns, batch in iter_column_batches(file_path, batch_size):
+        header = columns
+        batches.append(batch)
+
+    if not batches:
+        return pd.DataFrame(columns=header or [])
+    if len(batches) == 1:
+        return batches[0]
+    return pd.concat(batches)
+
+
+def read_header(file_path: str):
+    """
+    只读取表头行。
+    """
+    workbook = _open_workbook(file_path)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        return _parse_header(next(rows, ()))
+    finally:
+        workbook.close()
+
+
+def iter_column_batches(file_path: str, batch_size: int = DEFAULT_BATCH_SIZE, max_batch_bytes=None, usecols=None):
+    """
+    以 openpyxl 只读 + values_only 模式逐批读取工作表，不经过 pd.read_excel。
+
+    第一行为表头；遇到第一个整行空白即停止，之后的行不会被读取。
+    每批按表头声明的类型直接转换为列数组，行索引与首行数据对齐（索引 0 对应 Excel 第 2 行）。
+
+    :param file_path: 工作簿路径
+    :param batch_size: 每批的行数（指定 max_batch_bytes 时为上限）
+    :param max_batch_bytes: 每批 DataFrame 占用内存的上限（字节）；指定时先读取 PROBE_ROWS 行估算每行的内存，
+                            之后每批的行数按估算值确定
+    :param usecols: 只转换这些列（表头名），空白行的判断仍然基于整行
+    :return: 生成器，产出 (表头列表, DataFrame)
+    """
+    workbook = _open_workbook(file_path)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = _parse_header(next(rows, ()))
+        selected = columns if usecols is None else [column for column in columns if column in usecols]
+        positions = [columns.index(column) for column in selected]
+        field_types = [util.get_field_components(column).get("field_type") for column in selected]
+        width = len(columns)
+        limit = min(batch_size, PROBE_ROWS) if max_batch_bytes is not None else batch_size
+
+        start = 0
+        buffer = []
+        for row in rows:
+            row = row[:width]
+            if all(value is None for value in row):
+                break
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            buffer.append(row)
+
+            if len(buffer) >= limit:
+                batch = _build_batch(selected, positions, field_types, buffer, start)
+                if max_batch_bytes is not None:
+                    row_bytes = max(1, batch.memory_usage(index=False, deep=True).sum() / len(batch))
+                    limit = max(1, min(batch_size, int(max_batch_bytes / row_bytes)))
+                yield columns, batch
+                start += len(buffer)
+                buffer = []
+
+        if buffer or start == 0:
+            yield columns, _build_batch(selected, positions, field_types, buffer, start)
+    finally:
+        workbook.close()
+
+
+def _open_workbook(file_path):
+    # 延迟导入，只有真正解析工作簿时才加载 openpyxl
+    import openpyxl
+    return openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+
+
+def _parse_header(header_row):
+    """
+    去掉表头末尾的空列；中间的空表头和重复表头与 pd.read_excel 一样命名为 'Unnamed: n' 和 'name.1'。
+    """
+    header = list(header_row)
+    while header and header[-1] is None:
+        header.pop()
+
+    columns = []
+    seen = {}
+    for index, column in enumerate(header):
+        column = f"Unnamed: {index}" if column is None else str(column)
+        if column in seen:
+            seen[column] += 1
+            column = f"{column}.{seen[column]}"
+        else:
+            seen[column] = 0
+        columns.append(column)
+    return columns
+
+
+def _build_batch(columns, positions, field_types, rows, start):
+    index = pd.RangeIndex(start, start + len(rows))
+    data = {}
+    for column, position, field_type in zip(columns, positions, field_types):
+        values = [row[position] for row in rows]
+        data[column] = _to_column(values, field_type)
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _to_column(values, field_type):
+    """
+    按表头类型把一列原始单元格值转换为数组；无法按声明类型转换时退回与 pandas 相同的类型推断，
+    由校验阶段报告具体错误。
+    """
+    if field_type in ('int', 'long'):
+        ints = _to_int_list(values)
+        if ints is not None:
+            try:
+                return np.array(ints, dtype=np.int64)
+            except OverflowError:
+                pass
+    elif field_type == 'float':
+        try:
+            return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    elif field_type in ('string', 'bool', 'time'):
+        return np.array([np.nan if value is None else value for value in values], dtype=object)
+
+    return pd.Series([np.nan if value is None else value for value in values]).to_numpy()
+
+
+def _to_int_list(values):
+    result = []
+    for value in values:
+        if isinstance(value, bool) or value is None:
+            return None
+        if isinstance(value, int):
+            result.append(value)
+        elif isinstance(value, float) and value.is_integer():
+            result.append(int(value))
+        elif isinstance(value, str):
+            try:
+                result.append(int(value.strip()))
+            except ValueError:
+                return None
+        else:
+            return None
+    return result
@@ -1,23 +1,311 @@
+import argparse
+import json
 import os
-import sys
+import code_generator
+import delta_patch
+import soa_dat
+import util
+from string_pool import POOL_TABLE_NAME
 
-def generate_config_cs_all(proto_path, output_path):
+# Config 加载方式：eager 为整表解析；lazy 为内存映射 indexed 格式的 .dat，按需解析并用 LRU 缓存
+LOADERS = ("eager", "lazy")
+
+# lazy 加载方式默认最多缓存的行数
+DEFAULT_CACHE_CAPACITY = 256
+
+# id 取值范围不超过行数的该倍数时视为稠密，按数组下标索引
+DENSE_ID_MAX_RATIO = 2
+
+# 表头未声明 Priority 的表在 ConfigDataManager 中的加载优先级
+DEFAULT_PRIORITY = 0
+
+# ConfigDataManager 每层默认同时加载的表数，0 表示 Environment.ProcessorCount
+DEFAULT_LOAD_PARALLELISM = 0
+
+MANAGER_FILE_NAME = "ConfigDataManager.cs"
+
+# 表头字段类型 -> C# 类型（用于索引键）
+CS_TYPES = {
+    "int": "int",
+    "long": "long",
+    "string": "string",
+    "bool": "bool",
+    "float": "float",
+}
+
+
+def generate_config_cs_all(proto_path, output_path, loader="eager", cache_capacity=DEFAULT_CACHE_CAPACITY,
+                           default_priority=DEFAULT_PRIORITY, load_parallelism=DEFAULT_LOAD_PARALLELISM):
     """
-    遍历 proto_path 下的所有 .proto 文件，为每个表生成对应的 Config C# 脚本。
+    遍历 proto_path 下的所有 .proto 文件，为每个表生成对应的 Config C# 脚本，以及加载所有表的 ConfigDataManager。
+    字符串池（ConfigStrings）由 ConfigStringPool 加载，不生成 Config 类。
     """
     # 遍历 proto_path 获取表名
     proto_files = [f for f in os.listdir(proto_path) if f.endswith(".proto")]
+    tables = {}
     for proto_file in proto_files:
         table_name = os.path.splitext(proto_file)[0]  # 去掉 .proto 后缀作为表名
-        generate_config_cs(table_name, output_path)
+        if table_name == POOL_TABLE_NAME:
+            continue
+        table_info = load_table_info(proto_path, table_name)
+        generate_config_cs(table_name, output_path, loader, cache_capacity, table_info)
+        tables[table_name] = table_info
         print(f"Generated C# Config for table: {table_name}")
 
+    string_pool = f"{POOL_TABLE_NAME}.proto" in proto_files
+    tiers = generate_config_manager_cs(tables, output_path, default_priority, load_parallelism, string_pool)
+    print(f"Generated {MANAGER_FILE_NAME}: {len(tables)} tables in {len(tiers)} tier(s)")
+
+    # eager 加载方式的 ApplyPatch 使用的补丁读取器
+    if loader == "eager":
+        delta_patch.generate_loader_cs(output_path)
 
-def generate_config_cs(table_name, output_path):
+
+def generate_config_cs(table_name, output_path, loader="eager", cache_capacity=DEFAULT_CACHE_CAPACITY, table_info=None):
     """
     根据表名生成对应的 Config C# 脚本。
+
+    :param table_info: {Table}.schema.json 的内容，用于生成二级索引和稠密 id 的数组索引；lazy 加载方式只按 id 索引。
+                       backend 为 soa 的表总是生成列存访问器，与 loader 无关
+    :return: 文件是否有变化（内容未变化时不重写，避免 Unity 重新编译）
+    """
+    if table_info is not None and table_info.get("backend") == "soa":
+        template = get_soa_template(table_name, table_info)
+    elif loader == "eager":
+        template = get_eager_template(table_name, table_info)
+    elif loader == "lazy":
+        template = get_lazy_template(table_name, cache_capacity, table_info)
+    else:
+        raise ValueError(f"Unsupported loader: '{loader}' (expected one of {LOADERS})")
+
+    # 确保输出目录存在
+    os.makedirs(output_path, exist_ok=True)
+    return util.write_file_if_changed(os.path.join(output_path, f"{table_name}Config.cs"), template)
+
+
+def generate_config_manager_cs(tables, output_path, default_priority=DEFAULT_PRIORITY,
+                               load_parallelism=DEFAULT_LOAD_PARALLELISM, string_pool=False):
+    """
+    生成 ConfigDataManager.cs：静态注册所有表（不使用反射），按 Priority 分层加载。
+
+    :param tables: 表名 -> {Table}.schema.json 的内容（可为 None）
+    :param default_priority: 表头未声明 Priority 的表的优先级
+    :param load_parallelism: 每层默认同时加载的表数，0 表示 Environment.ProcessorCount
+    :param string_pool: 为 True 时在加载第一层之前加载 ConfigStrings.dat
+    :return: 各层的优先级，按加载顺序排列
+    """
+    priorities = {table_name: get_table_priority(table_info, default_priority)
+                  for table_name, table_info in tables.items()}
+    tiers = sorted(set(priorities.values()))
+
+    os.makedirs(output_path, exist_ok=True)
+    template = get_manager_template(priorities, tiers, load_parallelism, string_pool)
+    util.write_file_if_changed(os.path.join(output_path, MANAGER_FILE_NAME), template)
+    return tiers
+
+
+def get_table_priority(table_info, default_priority=DEFAULT_PRIORITY):
     """
-    template = f"""
+    表头中的 Priority 约束优先，否则为默认值。
+    """
+    if table_info is None or table_info.get("priority") is None:
+        return default_priority
+    return table_info["priority"]
+
+
+def load_table_info(proto_path, table_name):
+    """
+    读取构建时生成的 {Table}.schema.json；不存在时返回 None（按无索引、id 为 int 处理）。
+    """
+    schema_file = os.path.join(proto_path, f"{table_name}.schema.json")
+    if not os.path.exists(schema_file):
+        return None
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_id_type(table_info):
+    """
+    id 字段的 C# 类型；没有 schema 或 id 字段时按 int 处理。
+    """
+    fields = table_info["fields"] if table_info is not None else []
+    return next((CS_TYPES.get(field["type"], "int") for field in fields if field["name"] == "id"), "int")
+
+
+def is_dense_ids(table_info):
+    """
+    id 为 int 且取值范围不超过行数的 DENSE_ID_MAX_RATIO 倍时，用数组代替字典按 id 索引。
+    """
+    if table_info is None or table_info.get("id") is None:
+        return False
+    id_field = next((field for field in table_info["fields"] if field["name"] == "id"), None)
+    if id_field is None or id_field["type"] != "int":
+        return False
+    ids = table_info["id"]
+    return ids["count"] > 0 and ids["max"] - ids["min"] + 1 <= ids["count"] * DENSE_ID_MAX_RATIO
+
+
+def get_eager_template(table_name, table_info=None):
+    """
+    整表加载：一次解析全部行，并建立 id -> 行 的索引（id 稠密时为数组，否则为字典），
+    以及表头中 Index(unique|multi) 声明的二级索引。
+    id 为 int/long 时生成 ApplyPatch，原地应用 delta_patch.py 生成的热更新补丁。
+    """
+    row_type = f"{table_name}Row"
+    fields = table_info["fields"] if table_info is not None else []
+    id_type = get_id_type(table_info)
+    dense = is_dense_ids(table_info)  # 仅 int 类型的 id，数组下标与 minId 均按 int 计算
+    indexed_fields = [field for field in fields if field.get("index") is not None]
+
+    members = ""
+    build = ""
+    accessors = ""
+    index_row = ""    # ApplyPatch：把一行加入所有索引
+    unindex_row = ""  # ApplyPatch：把一行从所有索引中移除
+
+    if dense:
+        members += f"""    private {row_type}[] rowsById = Array.Empty<{row_type}>(); // 下标为 id - minId
+    private int minId;
+"""
+        build += f"""                minId = 0;
+                rowsById = Array.Empty<{row_type}>();
+                if (rows.Count > 0)
+                {{
+                    int min = int.MaxValue, max = int.MinValue;
+                    foreach (var row in rows)
+                    {{
+                        min = Math.Min(min, row.Id);
+                        max = Math.Max(max, row.Id);
+                    }}
+                    minId = min;
+                    rowsById = new {row_type}[(long)max - min + 1];
+                    foreach (var row in rows)
+                    {{
+                        rowsById[row.Id - min] = row; // 初始化数组索引
+                    }}
+                }}
+"""
+        accessors += f"""    // 根据 ID 查询行数据
+    public {row_type} GetRowById({id_type} id)
+    {{
+        long index = (long)id - minId;
+        return index >= 0 && index < rowsById.Length ? rowsById[index] : null;
+    }}
+"""
+        index_row += f"""        long index = (long)row.Id - minId;
+        if (index < 0 || index >= rowsById.Length)
+        {{
+            // id 超出当前数组范围时扩展数组
+            long min = rowsById.Length == 0 ? row.Id : Math.Min(minId, row.Id);
+            long max = rowsById.Length == 0 ? row.Id : Math.Max((long)minId + rowsById.Length - 1, row.Id);
+            var newRowsById = new {row_type}[max - min + 1];
+            Array.Copy(rowsById, 0, newRowsById, minId - min, rowsById.Length);
+            rowsById = newRowsById;
+            minId = (int)min;
+            index = row.Id - min;
+        }}
+        rowsById[index] = row;
+"""
+        unindex_row += f"""        if (GetRowById(row.Id) == row)
+        {{
+            rowsById[(long)row.Id - minId] = null;
+        }}
+"""
+    else:
+        members += f"""    private readonly Dictionary<{id_type}, {row_type}> dict = new Dictionary<{id_type}, {row_type}>();
+"""
+        build += f"""                dict.Clear();
+                foreach (var row in rows)
+                {{
+                    dict[row.Id] = row; // 初始化字典索引
+                }}
+"""
+        accessors += f"""    // 根据 ID 查询行数据
+    public {row_type} GetRowById({id_type} id)
+    {{
+        dict.TryGetValue(id, out var row);
+        return row;
+    }}
+"""
+        index_row += f"""        dict[row.Id] = row;
+"""
+        unindex_row += f"""        if (GetRowById(row.Id) == row)
+        {{
+            dict.Remove(row.Id);
+        }}
+"""
+
+    if any(field["index"] == "multi" for field in indexed_fields):
+        members += f"""    private static readonly List<{row_type}> emptyRows = new List<{row_type}>();
+"""
+
+    for field in indexed_fields:
+        property_name = code_generator.to_pascal_case(field["name"])
+        key_type = CS_TYPES[field["type"]]
+        index_name = f"by{property_name}"
+        parameter = field["name"][:1].lower() + property_name[1:]
+
+        if field["index"] == "unique":
+            members += f"""    private readonly Dictionary<{key_type}, {row_type}> {index_name} = new Dictionary<{key_type}, {row_type}>();
+"""
+            build += f"""                {index_name}.Clear();
+                foreach (var row in rows)
+                {{
+                    {index_name}[row.{property_name}] = row;
+                }}
+"""
+            accessors += f"""
+    // 根据 {field["name"]} 查询行数据（唯一索引）
+    public {row_type} GetRowBy{property_name}({key_type} {parameter})
+    {{
+        {index_name}.TryGetValue({parameter}, out var row);
+        return row;
+    }}
+"""
+            index_row += f"""        {index_name}[row.{property_name}] = row;
+"""
+            unindex_row += f"""        if ({index_name}.TryGetValue(row.{property_name}, out var {index_name}Row) && {index_name}Row == row)
+        {{
+            {index_name}.Remove(row.{property_name});
+        }}
+"""
+        else:
+            members += f"""    private readonly Dictionary<{key_type}, List<{row_type}>> {index_name} = new Dictionary<{key_type}, List<{row_type}>>();
+"""
+            build += f"""                {index_name}.Clear();
+                foreach (var row in rows)
+                {{
+                    if (!{index_name}.TryGetValue(row.{property_name}, out var list))
+                    {{
+                        list = new List<{row_type}>();
+                        {index_name}[row.{property_name}] = list;
+                    }}
+                    list.Add(row);
+                }}
+"""
+            accessors += f"""
+    // 根据 {field["name"]} 查询所有行数据（多值索引）
+    public IReadOnlyList<{row_type}> GetRowsBy{property_name}({key_type} {parameter})
+    {{
+        return {index_name}.TryGetValue({parameter}, out var list) ? list : emptyRows;
+    }}
+"""
+            index_row += f"""        if (!{index_name}.TryGetValue(row.{property_name}, out var {index_name}List))
+        {{
+            {index_name}List = new List<{row_type}>();
+            {index_name}[row.{property_name}] = {index_name}List;
+        }}
+        {index_name}List.Add(row);
+"""
+            unindex_row += f"""        if ({index_name}.TryGetValue(row.{property_name}, out var {index_name}List))
+        {{
+            {index_name}List.Remove(row);
+            if ({index_name}List.Count == 0)
+                {index_name}.Remove(row.{property_name});
+        }}
+"""
+
+    return f"""
 using System;
 using System.Collections.Generic;
 using System.IO;
@@ -26,9 +314,8 @@ using Google.Protobuf;
 
 public partial class {table_name}Config : BaseConfig
 {{
-    private readonly List<{table_name}Row> rows = new List<{table_name}Row>();
-    private readonly Dictionary<int, {table_name}Row> dict = new Dictionary<int, {table_name}Row>();
-
+    private readonly List<{row_type}> rows = new List<{row_type}>();
+{members}
     // 异步加载数据
     public override async Task LoadAsync(string path)
     {{
@@ -42,38 +329,738 @@ public partial class {table_name}Config : BaseConfig
                 var data = {table_name}.Parser.ParseFrom(file); // 使用 Protobuf 解析
                 rows.Clear();
                 rows.AddRange(data.Rows);
-                dict.Clear();
-                foreach (var row in rows)
+{build}            }});
+        }}
+    }}
+
+{accessors}
+    // 获取所有行数据
+    public IEnumerable<{row_type}> GetAllRows()
+    {{
+        return rows;
+    }}
+{get_apply_patch_template(row_type, id_type, index_row, unindex_row) if id_type in ("int", "long") else ""}}}
+"""
+
+
+def get_apply_patch_template(row_type, id_type, index_row, unindex_row):
+    """
+    ApplyPatch：只解析补丁中的行并增量更新各索引；有修改或删除时对行列表做一次原地压缩，
+    新增的行追加在 GetAllRows 的末尾。
+    """
+    return f"""
+    // 原地应用热更新补丁（由 Tools/delta_patch.py 生成），补丁的基准版本需与当前加载的数据一致
+    public void ApplyPatch(ConfigPatch patch)
+    {{
+        // id -> 替换后的行，null 表示删除
+        var changes = new Dictionary<{id_type}, {row_type}>();
+        foreach (var key in patch.Deleted)
+        {{
+            var old = GetRowById(({id_type})key);
+            if (old == null)
+                continue;
+            UnindexRow(old);
+            changes[old.Id] = null;
+        }}
+
+        var added = new List<{row_type}>();
+        foreach (var records in new[] {{ patch.Added, patch.Modified }})
+        {{
+            foreach (var data in records)
+            {{
+                var row = {row_type}.Parser.ParseFrom(data);
+                var old = GetRowById(row.Id);
+                if (old != null)
                 {{
-                    dict[row.Id] = row; // 初始化字典索引
+                    UnindexRow(old);
+                    changes[row.Id] = row;
                 }}
-            }});
+                else
+                {{
+                    added.Add(row);
+                }}
+                IndexRow(row);
+            }}
         }}
+
+        if (changes.Count > 0)
+        {{
+            int count = 0;
+            for (int i = 0; i < rows.Count; i++)
+            {{
+                var row = rows[i];
+                if (changes.TryGetValue(row.Id, out var changed))
+                {{
+                    if (changed == null)
+                        continue;
+                    changes[row.Id] = null; // id 重复的行只保留一行
+                    row = changed;
+                }}
+                rows[count++] = row;
+            }}
+            rows.RemoveRange(count, rows.Count - count);
+        }}
+        rows.AddRange(added);
     }}
 
-    // 根据 ID 查询行数据
-    public {table_name}Row GetRowById(int id)
+    private void IndexRow({row_type} row)
     {{
-        dict.TryGetValue(id, out var row);
+{index_row}    }}
+
+    private void UnindexRow({row_type} row)
+    {{
+{unindex_row}    }}
+"""
+
+
+def get_lazy_template(table_name, cache_capacity, table_info=None):
+    """
+    按需加载：内存映射 indexed 格式的 .dat（见 indexed_dat.py），加载时只读取主键索引，
+    行在首次访问时解析，并用容量有限的 LRU 缓存。
+    主键索引只收录 int/long 类型的 id（按 i64 存储），GetRowById 的参数类型与 id 字段一致。
+    """
+    id_type = get_id_type(table_info)
+    if id_type not in ("int", "long"):
+        id_type = "int"
+    return f"""
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.IO.MemoryMappedFiles;
+using System.Threading.Tasks;
+using Google.Protobuf;
+
+public partial class {table_name}Config : BaseConfig, IDisposable
+{{
+    // indexed .dat 文件布局，与 Tools/indexed_dat.py 保持一致
+    private const uint Magic = 0x54414458; // "XDAT"
+    private const uint FormatVersion = 1;
+    private const int HeaderSize = 16;
+    private const int TrailerSize = 32;
+    private const int ChunkEntrySize = 16;
+    private const int KeyEntrySize = 16;
+
+    // 最多缓存的已解析行数
+    public int CacheCapacity = {cache_capacity};
+
+    private MemoryMappedFile file;
+    private MemoryMappedViewAccessor accessor;
+    private long dataEnd;
+    private int rowCount;                            // 文件头中的总行数（包括没有 id 或 id 重复的行）
+    private long[] keys = Array.Empty<long>();       // 升序主键
+    private long[] offsets = Array.Empty<long>();    // 主键对应记录在文件中的偏移
+
+    private readonly object cacheLock = new object();
+    private readonly Dictionary<long, LinkedListNode<KeyValuePair<long, {table_name}Row>>> cache =
+        new Dictionary<long, LinkedListNode<KeyValuePair<long, {table_name}Row>>>();
+    private readonly LinkedList<KeyValuePair<long, {table_name}Row>> lru = new LinkedList<KeyValuePair<long, {table_name}Row>>();
+
+    // 异步加载：只映射文件并读取主键索引，不解析任何行
+    // 注意：内存映射需要真实的文件路径（如 persistentDataPath），不能直接映射 APK 内的 StreamingAssets
+    public override async Task LoadAsync(string path)
+    {{
+        if (!File.Exists(path))
+            throw new FileNotFoundException($"Config file not found: {{path}}");
+
+        await Task.Run(() => Open(path));
+    }}
+
+    private void Open(string path)
+    {{
+        Dispose();
+
+        var length = new FileInfo(path).Length;
+        if (length < HeaderSize + TrailerSize)
+            throw new InvalidDataException($"Invalid indexed config file: {{path}}");
+
+        file = MemoryMappedFile.CreateFromFile(path, FileMode.Open, null, 0, MemoryMappedFileAccess.Read);
+        accessor = file.CreateViewAccessor(0, 0, MemoryMappedFileAccess.Read);
+
+        var trailer = length - TrailerSize;
+        if (accessor.ReadUInt32(0) != Magic || accessor.ReadUInt32(trailer + 28) != Magic)
+            throw new InvalidDataException($"Invalid indexed config file: {{path}}");
+        if (accessor.ReadUInt32(4) != FormatVersion)
+            throw new InvalidDataException($"Unsupported indexed config version in: {{path}}");
+
+        var chunkTableOffset = (long)accessor.ReadUInt64(trailer);
+        var keyTableOffset = (long)accessor.ReadUInt64(trailer + 12);
+        var keyCount = (int)accessor.ReadUInt32(trailer + 20);
+        dataEnd = chunkTableOffset;
+        rowCount = (int)accessor.ReadUInt32(8);
+
+        var newKeys = new long[keyCount];
+        var newOffsets = new long[keyCount];
+        for (int i = 0; i < keyCount; i++)
+        {{
+            var entry = keyTableOffset + (long)i * KeyEntrySize;
+            var chunk = accessor.ReadUInt32(entry + 8);
+            var chunkOffset = (long)accessor.ReadUInt64(chunkTableOffset + (long)chunk * ChunkEntrySize);
+            newKeys[i] = accessor.ReadInt64(entry);
+            newOffsets[i] = chunkOffset + accessor.ReadUInt32(entry + 12);
+        }}
+        keys = newKeys;
+        offsets = newOffsets;
+    }}
+
+    // 根据 ID 查询行数据，首次访问时解析
+    public {table_name}Row GetRowById({id_type} id)
+    {{
+        lock (cacheLock)
+        {{
+            if (cache.TryGetValue(id, out var node))
+            {{
+                lru.Remove(node);
+                lru.AddFirst(node);
+                return node.Value.Value;
+            }}
+        }}
+
+        var index = Array.BinarySearch(keys, (long)id);
+        if (index < 0)
+            return null;
+
+        var row = ReadRow(offsets[index], out _);
+        lock (cacheLock)
+        {{
+            if (!cache.ContainsKey(id) && CacheCapacity > 0)
+            {{
+                cache[id] = lru.AddFirst(new KeyValuePair<long, {table_name}Row>(id, row));
+                if (cache.Count > CacheCapacity)
+                {{
+                    cache.Remove(lru.Last.Value.Key);
+                    lru.RemoveLast();
+                }}
+            }}
+        }}
         return row;
     }}
 
-    // 获取所有行数据
+    // 获取所有行数据：顺序解析，不进入缓存
     public IEnumerable<{table_name}Row> GetAllRows()
     {{
-        return rows;
+        long offset = HeaderSize;
+        while (offset < dataEnd)
+        {{
+            yield return ReadRow(offset, out offset);
+        }}
+    }}
+
+    // 行数
+    public int Count => rowCount;
+
+    private {table_name}Row ReadRow(long offset, out long next)
+    {{
+        int length = 0;
+        int shift = 0;
+        while (true)
+        {{
+            var b = accessor.ReadByte(offset++);
+            length |= (b & 0x7F) << shift;
+            if (b < 0x80)
+                break;
+            shift += 7;
+        }}
+
+        var buffer = new byte[length];
+        accessor.ReadArray(offset, buffer, 0, length);
+        next = offset + length;
+        return {table_name}Row.Parser.ParseFrom(buffer);
+    }}
+
+    public void Dispose()
+    {{
+        lock (cacheLock)
+        {{
+            cache.Clear();
+            lru.Clear();
+        }}
+        accessor?.Dispose();
+        file?.Dispose();
+        accessor = null;
+        file = null;
+        keys = Array.Empty<long>();
+        offsets = Array.Empty<long>();
+        dataEnd = 0;
+        rowCount = 0;
     }}
 }}
 """
-    # 确保输出目录存在
-    os.makedirs(output_path, exist_ok=True)
-    output_file = os.path.join(output_path, f"{table_name}Config.cs")
-    with open(output_file, "w") as cs_file:
-        cs_file.write(template)
+
+
+# 列存访问器中各字段类型的读取方法
+SOA_READERS = {
+    "int": ("int", "ReadInt32"),
+    "long": ("long", "ReadInt64"),
+    "float": ("float", "ReadSingle"),
+    "bool": ("bool", "ReadBoolean"),
+    "time": ("DateTime", "ReadTime"),
+    "string": ("string", "ReadString"),
+}
+
+
+def get_soa_template(table_name, table_info):
+    """
+    列存格式（见 soa_dat.py）：内存映射 .dat，{Table}RowView 只保存行号，字段按 (列, 行) 直接从映射内存读取，
+    加载时不解析任何行，也不为每一行分配对象；string 字段首次访问时解码并缓存。
+    """
+    view_type = f"{table_name}RowView"
+    fields = table_info["fields"]
+    id_type = next((field["type"] for field in fields if field["name"] == "id"), None)
+
+    properties = ""
+    for column, field in enumerate(fields):
+        property_name = code_generator.to_pascal_case(field["name"])
+        cs_type, reader = SOA_READERS[field["type"]]
+        properties += f"""    public {cs_type} {property_name} => table.{reader}({column}, row);
+"""
+        if field["nullable"]:
+            properties += f"""    public bool Has{property_name} => !table.IsNull({column}, row);
+"""
+
+    field_numbers = ", ".join(str(column + 1) for column in range(len(fields)))
+    column_types = ", ".join(str(soa_dat.COLUMN_TYPES[field["type"]][0]) for field in fields)
+    string_column = soa_dat.COLUMN_TYPES["string"][0]
+
+    id_accessor = ""
+    if id_type in ("int", "long"):
+        id_accessor = f"""
+    // 根据 ID 查询行数据
+    public {view_type}? GetRowById({id_type} id)
+    {{
+        return TryGetRowById(id, out var row) ? row : ({view_type}?)null;
+    }}
+
+    public bool TryGetRowById(long id, out {view_type} row)
+    {{
+        int index = -1;
+        if (denseKeys)
+        {{
+            long position = id - minKey;
+            if (position >= 0 && position < keyCount)
+                index = (int)position;
+        }}
+        else
+        {{
+            int low = 0, high = keyCount - 1;
+            while (low <= high)
+            {{
+                int mid = (low + high) >> 1;
+                long key = accessor.ReadInt64(keyOffset + mid * 8L);
+                if (key == id)
+                {{
+                    index = mid;
+                    break;
+                }}
+                if (key < id)
+                    low = mid + 1;
+                else
+                    high = mid - 1;
+            }}
+        }}
+
+        if (index < 0)
+        {{
+            row = default;
+            return false;
+        }}
+        row = new {view_type}(this, (int)accessor.ReadUInt32(keyRowsOffset + index * 4L));
+        return true;
+    }}
+"""
+
+    return f"""
+using System;
+using System.Collections.Generic;
+using System.IO;
+using System.IO.MemoryMappedFiles;
+using System.Text;
+using System.Threading.Tasks;
+
+// {table_name} 的一行：只保存行号，字段直接从内存映射的 .dat 中读取
+public readonly struct {view_type}
+{{
+    private readonly {table_name}Config table;
+    private readonly int row;
+
+    internal {view_type}({table_name}Config table, int row)
+    {{
+        this.table = table;
+        this.row = row;
+    }}
+
+    public int RowIndex => row;
+
+{properties}}}
+
+public partial class {table_name}Config : BaseConfig, IDisposable
+{{
+    // 列存 .dat 文件布局，与 Tools/soa_dat.py 保持一致
+    private const uint Magic = 0x414F5358; // "XSOA"
+    private const uint FormatVersion = {soa_dat.FORMAT_VERSION};
+    private const int HeaderSize = {soa_dat.HEADER.size};
+    private const int ColumnEntrySize = {soa_dat.COLUMN_ENTRY.size};
+    private const byte StringColumn = {string_column};
+    private static readonly uint[] FieldNumbers = {{ {field_numbers} }};
+    private static readonly byte[] ColumnTypes = {{ {column_types} }};
+
+    private MemoryMappedFile file;
+    private MemoryMappedViewAccessor accessor;
+    private int rowCount;
+    private long[] columnOffsets = Array.Empty<long>();
+    private long[] nullOffsets = Array.Empty<long>();   // 0 表示该列不可空
+    private string[][] strings = Array.Empty<string[]>(); // string 列已解码的字符串
+    private int keyCount;
+    private long keyOffset;
+    private long keyRowsOffset;
+    private long heapOffset;
+    private long minKey;
+    private bool denseKeys;                             // 主键连续时按 id - minKey 直接定位
+
+    // 异步加载：只映射文件并读取列表，不解析任何行
+    // 注意：内存映射需要真实的文件路径（如 persistentDataPath），不能直接映射 APK 内的 StreamingAssets
+    public override async Task LoadAsync(string path)
+    {{
+        if (!File.Exists(path))
+            throw new FileNotFoundException($"Config file not found: {{path}}");
+
+        await Task.Run(() => Open(path));
+    }}
+
+    private void Open(string path)
+    {{
+        Dispose();
+
+        if (new FileInfo(path).Length < HeaderSize)
+            throw new InvalidDataException($"Invalid soa config file: {{path}}");
+
+        file = MemoryMappedFile.CreateFromFile(path, FileMode.Open, null, 0, MemoryMappedFileAccess.Read);
+        accessor = file.CreateViewAccessor(0, 0, MemoryMappedFileAccess.Read);
+
+        if (accessor.ReadUInt32(0) != Magic)
+            throw new InvalidDataException($"Invalid soa config file: {{path}}");
+        if (accessor.ReadUInt32(4) != FormatVersion)
+            throw new InvalidDataException($"Unsupported soa config version in: {{path}}");
+
+        rowCount = (int)accessor.ReadUInt32(8);
+        var columnCount = (int)accessor.ReadUInt32(12);
+        if (columnCount != FieldNumbers.Length)
+            throw new InvalidDataException($"Column count mismatch in {{path}}, regenerate {table_name}Config.cs");
+
+        columnOffsets = new long[columnCount];
+        nullOffsets = new long[columnCount];
+        strings = new string[columnCount][];
+        for (int i = 0; i < columnCount; i++)
+        {{
+            var entry = HeaderSize + (long)i * ColumnEntrySize;
+            if (accessor.ReadUInt32(entry) != FieldNumbers[i] || accessor.ReadByte(entry + 4) != ColumnTypes[i])
+                throw new InvalidDataException($"Column {{i}} mismatch in {{path}}, regenerate {table_name}Config.cs");
+            columnOffsets[i] = (long)accessor.ReadUInt64(entry + 8);
+            nullOffsets[i] = (long)accessor.ReadUInt64(entry + 16);
+            if (ColumnTypes[i] == StringColumn)
+                strings[i] = new string[rowCount];
+        }}
+
+        keyCount = (int)accessor.ReadUInt32(20);
+        keyOffset = (long)accessor.ReadUInt64(24);
+        keyRowsOffset = keyOffset + keyCount * 8L;
+        heapOffset = (long)accessor.ReadUInt64(32);
+        if (keyCount > 0)
+        {{
+            minKey = accessor.ReadInt64(keyOffset);
+            denseKeys = accessor.ReadInt64(keyOffset + (keyCount - 1) * 8L) - minKey == keyCount - 1;
+        }}
+    }}
+
+    // 行数
+    public int Count => rowCount;
+
+    // 按行号读取
+    public {view_type} GetRow(int row)
+    {{
+        if ((uint)row >= (uint)rowCount)
+            throw new ArgumentOutOfRangeException(nameof(row));
+        return new {view_type}(this, row);
+    }}
+{id_accessor}
+    // 获取所有行数据
+    public IEnumerable<{view_type}> GetAllRows()
+    {{
+        for (int i = 0; i < rowCount; i++)
+        {{
+            yield return new {view_type}(this, i);
+        }}
+    }}
+
+    internal int ReadInt32(int column, int row) => accessor.ReadInt32(columnOffsets[column] + row * 4L);
+
+    internal long ReadInt64(int column, int row) => accessor.ReadInt64(columnOffsets[column] + row * 8L);
+
+    internal float ReadSingle(int column, int row) => accessor.ReadSingle(columnOffsets[column] + row * 4L);
+
+    internal bool ReadBoolean(int column, int row) => accessor.ReadByte(columnOffsets[column] + row) != 0;
+
+    internal DateTime ReadTime(int column, int row)
+    {{
+        return DateTimeOffset.FromUnixTimeSeconds(ReadInt64(column, row)).UtcDateTime;
+    }}
+
+    internal string ReadString(int column, int row)
+    {{
+        var cache = strings[column];
+        var value = cache[row];
+        if (value == null)
+        {{
+            var entry = columnOffsets[column] + row * 8L;
+            var offset = accessor.ReadUInt32(entry);
+            var buffer = new byte[accessor.ReadUInt32(entry + 4)];
+            accessor.ReadArray(heapOffset + offset, buffer, 0, buffer.Length);
+            value = Encoding.UTF8.GetString(buffer);
+            cache[row] = value;
+        }}
+        return value;
+    }}
+
+    internal bool IsNull(int column, int row)
+    {{
+        var offset = nullOffsets[column];
+        return offset != 0 && (accessor.ReadByte(offset + (row >> 3)) & (1 << (row & 7))) == 0;
+    }}
+
+    public void Dispose()
+    {{
+        accessor?.Dispose();
+        file?.Dispose();
+        accessor = null;
+        file = null;
+        rowCount = 0;
+        keyCount = 0;
+        denseKeys = false;
+        columnOffsets = Array.Empty<long>();
+        nullOffsets = Array.Empty<long>();
+        strings = Array.Empty<string[]>();
+    }}
+}}
+"""
+
+
+def get_manager_template(priorities, tiers, load_parallelism=DEFAULT_LOAD_PARALLELISM, string_pool=False):
+    """
+    ConfigDataManager：每张表一个强类型属性和一条静态注册项（创建 Config 实例的委托），加载时不使用反射。
+    各层按优先级从小到大依次加载，同一层的表并发加载（并发数由 MaxDegreeOfParallelism 限制），
+    并记录每张表和每层的加载耗时。
+
+    :param priorities: 表名 -> 优先级
+    :param tiers: 各层的优先级，按加载顺序排列
+    """
+    table_names = sorted(priorities)
+    properties = "".join(f"""    public {table_name}Config {table_name} {{ get; private set; }}
+""" for table_name in table_names)
+    entries = "".join(f"""        new TableEntry("{table_name}", {priorities[table_name]}, async (manager, path) =>
+        {{
+            var config = new {table_name}Config();
+            await config.LoadAsync(path);
+            manager.{table_name} = config;
+        }}),
+""" for table_name in sorted(table_names, key=lambda table_name: (priorities[table_name], table_name)))
+    disposals = "".join(f"""        ({table_name} as IDisposable)?.Dispose();
+        {table_name} = null;
+""" for table_name in table_names)
+    parallelism = str(load_parallelism) if load_parallelism > 0 else "Environment.ProcessorCount"
+
+    string_pool_loader = ""
+    load_string_pool = ""
+    if string_pool:
+        load_string_pool = """        await EnsureStringPoolAsync(dataDirectory);
+"""
+        string_pool_loader = f"""
+    private Task stringPoolTask;
+
+    // string 字段存为字符串池下标，使用任何表之前先加载 {POOL_TABLE_NAME}.dat（只加载一次）
+    private Task EnsureStringPoolAsync(string dataDirectory)
+    {{
+        lock (timingsLock)
+        {{
+            if (stringPoolTask == null)
+                stringPoolTask = LoadStringPoolAsync(Path.Combine(dataDirectory, "{POOL_TABLE_NAME}.dat"));
+            return stringPoolTask;
+        }}
+    }}
+
+    private async Task LoadStringPoolAsync(string path)
+    {{
+        var start = Elapsed;
+        await Task.Run(() => ConfigStringPool.Load(path));
+        RecordTiming("{POOL_TABLE_NAME}", -1, start, Elapsed - start);
+    }}
+"""
+
+    return f"""
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+using System.IO;
+using System.Threading;
+using System.Threading.Tasks;
+
+// 由 Tools/generate_config_cs.py 生成：静态注册所有配置表，不使用反射
+// 按表头 Priority 分层加载：数值小的层先加载，同一层的表并发加载，上一层全部完成后才开始下一层
+public sealed partial class ConfigDataManager : IDisposable
+{{
+    // 各层的优先级，按加载顺序排列
+    public static readonly int[] Tiers = {{ {", ".join(str(tier) for tier in tiers)} }};
+
+    // 一层中同时加载的表数上限
+    public int MaxDegreeOfParallelism = {parallelism};
+
+    // 一张表加载完成时回调（表名, 耗时），可能在线程池线程上调用
+    public event Action<string, TimeSpan> TableLoaded;
+
+{properties}
+    // 一次加载的耗时：Start 为相对第一次加载开始的时间，Duration 为 LoadAsync 本身的耗时（不含排队）
+    public struct LoadTiming
+    {{
+        public string Table;
+        public int Priority;
+        public TimeSpan Start;
+        public TimeSpan Duration;
+    }}
+
+    private sealed class TableEntry
+    {{
+        public readonly string Name;
+        public readonly int Priority;
+        public readonly Func<ConfigDataManager, string, Task> Load; // (manager, .dat 路径)
+
+        public TableEntry(string name, int priority, Func<ConfigDataManager, string, Task> load)
+        {{
+            Name = name;
+            Priority = priority;
+            Load = load;
+        }}
+    }}
+
+    // 按 (优先级, 表名) 排列
+    private static readonly TableEntry[] Tables =
+    {{
+{entries}    }};
+
+    private readonly object timingsLock = new object();
+    private readonly List<LoadTiming> tableTimings = new List<LoadTiming>();
+    private readonly Dictionary<int, TimeSpan> tierTimings = new Dictionary<int, TimeSpan>();
+    private Stopwatch clock;
+
+    private TimeSpan Elapsed
+    {{
+        get
+        {{
+            lock (timingsLock)
+            {{
+                if (clock == null)
+                    clock = Stopwatch.StartNew();
+                return clock.Elapsed;
+            }}
+        }}
+    }}
+
+    // 依次加载所有层
+    public async Task LoadAllAsync(string dataDirectory)
+    {{
+        foreach (var tier in Tiers)
+        {{
+            await LoadTierAsync(tier, dataDirectory);
+        }}
+    }}
+
+    // 加载一层中的所有表；例如先等待第一层完成再进入首帧，其余层在后台继续加载
+    public async Task LoadTierAsync(int priority, string dataDirectory)
+    {{
+        var start = Elapsed;
+{load_string_pool}        using (var throttle = new SemaphoreSlim(Math.Max(1, MaxDegreeOfParallelism)))
+        {{
+            var tasks = new List<Task>();
+            foreach (var entry in Tables)
+            {{
+                if (entry.Priority == priority)
+                    tasks.Add(LoadTableAsync(entry, dataDirectory, throttle));
+            }}
+            await Task.WhenAll(tasks);
+        }}
+
+        lock (timingsLock)
+        {{
+            tierTimings[priority] = Elapsed - start;
+        }}
+    }}
+
+    private async Task LoadTableAsync(TableEntry entry, string dataDirectory, SemaphoreSlim throttle)
+    {{
+        await throttle.WaitAsync();
+        try
+        {{
+            var start = Elapsed;
+            await entry.Load(this, Path.Combine(dataDirectory, entry.Name + ".dat"));
+            var duration = Elapsed - start;
+            RecordTiming(entry.Name, entry.Priority, start, duration);
+            TableLoaded?.Invoke(entry.Name, duration);
+        }}
+        finally
+        {{
+            throttle.Release();
+        }}
+    }}
+{string_pool_loader}
+    private void RecordTiming(string table, int priority, TimeSpan start, TimeSpan duration)
+    {{
+        lock (timingsLock)
+        {{
+            tableTimings.Add(new LoadTiming {{ Table = table, Priority = priority, Start = start, Duration = duration }});
+        }}
+    }}
+
+    // 每张表的加载耗时，按完成顺序排列
+    public List<LoadTiming> GetTableTimings()
+    {{
+        lock (timingsLock)
+        {{
+            return new List<LoadTiming>(tableTimings);
+        }}
+    }}
+
+    // 每层从开始到所有表加载完成的耗时
+    public Dictionary<int, TimeSpan> GetTierTimings()
+    {{
+        lock (timingsLock)
+        {{
+            return new Dictionary<int, TimeSpan>(tierTimings);
+        }}
+    }}
+
+    public void Dispose()
+    {{
+{disposals}    }}
+}}
+"""
 
 
 if __name__ == "__main__":
-    
-    proto_path = os.path.abspath(sys.argv[1])  # .proto 文件存放的目录
-    output_path = os.path.abspath(sys.argv[2])  # 生成 C# 文件的目标目录
-    generate_config_cs_all(proto_path, output_path)
+
+    parser = argparse.ArgumentParser(description="Generate C# Config classes for every .proto table.")
+    parser.add_argument("proto_path", help=".proto 文件存放的目录")
+    parser.add_argument("output_path", help="生成 C# 文件的目标目录")
+    parser.add_argument("--loader", choices=LOADERS, default="eager",
+                        help="加载方式：eager 为整表解析；lazy 为内存映射 indexed 格式的 .dat，按需解析（需 --dat-format indexed）")
+    parser.add_argument("--cache-capacity", type=int, default=DEFAULT_CACHE_CAPACITY, help="lazy 加载方式最多缓存的行数")
+    parser.add_argument("--default-priority", type=int, default=DEFAULT_PRIORITY,
+                        help="表头未声明 Priority 的表在 ConfigDataManager 中的加载优先级（数值小的层先加载）")
+    parser.add_argument("--load-parallelism", type=int, default=DEFAULT_LOAD_PARALLELISM,
+                        help="ConfigDataManager 每层默认同时加载的表数（0 表示 CPU 核数，运行时可修改）")
+    args = parser.parse_args()
+    if args.default_priority < 0:
+        parser.error("--default-priority must not be negative")
+    if args.load_parallelism < 0:
+        parser.error("--load-parallelism must not be negative")
+
+    proto_path = os.path.abspath(args.proto_path)  # .proto 文件存放的目录
+    output_path = os.path.abspath(args.output_path)  # 生成 C# 文件的目标目录
+    generate_config_cs_all(proto_path, output_path, args.loader, args.cache_capacity, args.default_priority,
+                           args.load_parallelism)
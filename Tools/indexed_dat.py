@@ -0,0 +1,281 @@
+"""
+分块索引 .dat 格式（--dat-format indexed）。
+
+普通 .dat 是一条 {Table} 消息，运行时必须解析完所有行才能查询。分块格式把每一行写成带 varint 长度前缀的
+{Table}Row 记录，每 chunk_rows 行为一块，文件末尾附带块表和主键索引，运行时可以只读取一行或一块。
+
+文件布局（整数均为小端）：
+
+    header       magic "XDAT" | u32 version | u32 row_count | u32 chunk_rows
+    chunks       每块为若干条 varint 长度 + {Table}Row 记录
+    chunk table  chunk_count × (u64 offset, u32 length, u32 first_row)
+    key table    key_count × (i64 key, u32 chunk, u32 offset_in_chunk)，按 key 升序
+    trailer      u64 chunk_table_offset | u32 chunk_count | u64 key_table_offset | u32 key_count
+                 | u32 key_field_number | magic "XDAT"
+
+主键为名为 id 的 int/long 字段；没有该字段时 key_count 为 0，只能按块或按行号读取。
+id 重复时索引指向最后一行，与 Config 脚本中字典覆盖的行为一致。
+"""
+import mmap
+import struct
+import numpy as np
+import pandas as pd
+import dat_encoder
+from schema import build_table_schema
+
+MAGIC = b"XDAT"
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_ROWS = 1024
+
+# 主键字段名
+KEY_FIELD_NAME = "id"
+
+HEADER = struct.Struct("<4sIII")
+TRAILER = struct.Struct("<QIQII4s")
+CHUNK_ENTRY = np.dtype([("offset", "<u8"), ("length", "<u4"), ("first_row", "<u4")])
+KEY_ENTRY = np.dtype([("key", "<i8"), ("chunk", "<u4"), ("offset", "<u4")])
+
+
+def encode_indexed_table(df: pd.DataFrame, schema=None, chunk_rows=DEFAULT_CHUNK_ROWS, string_pool=None):
+    """
+    把整张表编码为分块索引格式。
+
+    :param df: 表数据，列名为表头
+    :param schema: 该表的 TableSchema，不传时从表头解析
+    :param chunk_rows: 每块的行数
+    :param string_pool: 指定时 string 字段写为字符串池下标
+    :return: bytes
+    """
+    if chunk_rows <= 0:
+        raise ValueError(f"Invalid chunk_rows: {chunk_rows}")
+    if schema is None:
+        schema = build_table_schema(None, df.columns)
+
+    flat, record_lengths = dat_encoder.encode_delimited_rows(df, schema, string_pool)
+    key_field = _get_key_field(schema)
+    key_values = _encode_keys(df, key_field)
+    return b"".join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, len(record_lengths), chunk_rows),
+        flat.tobytes(),
+        _encode_index(record_lengths, key_values, key_field, chunk_rows),
+    ])
+
+
+class IndexedTableWriter:
+    """
+    分块写出分块索引格式（分块模式，见 chunked_table.py）：记录逐批追加到文件，块表和主键表在 close 时写出。
+    内存中只保留每行的记录长度和主键，输出与 encode_indexed_table 对整张表编码的结果一致。
+    """
+
+    def __init__(self, file, schema, chunk_rows=DEFAULT_CHUNK_ROWS, string_pool=None):
+        """
+        :param file: 以二进制写模式打开、可 seek 的文件对象，从当前位置开始写
+        """
+        if chunk_rows <= 0:
+            raise ValueError(f"Invalid chunk_rows: {chunk_rows}")
+        self.file = file
+        self.schema = schema
+        self.chunk_rows = chunk_rows
+        self.string_pool = string_pool
+        self.key_field = _get_key_field(schema)
+        self._start = file.tell()
+        self._record_lengths = []
+        self._key_values = []
+        # row_count 在 close 时回填
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, chunk_rows))
+
+    def write_rows(self, df: pd.DataFrame):
+        flat, record_lengths = dat_encoder.encode_delimited_rows(df, self.schema, self.string_pool)
+        self.file.write(flat.tobytes())
+        self._record_lengths.append(record_lengths)
+        if self.key_field is not None:
+            self._key_values.append(_encode_keys(df, self.key_field))
+
+    def close(self):
+        record_lengths = np.concatenate(self._record_lengths) if self._record_lengths else np.zeros(0, dtype=np.int64)
+        key_values = np.concatenate(self._key_values) if self._key_values else np.zeros(0, dtype=np.int64)
+        self.file.write(_encode_index(record_lengths, key_values, self.key_field, self.chunk_rows))
+
+        end = self.file.tell()
+        self.file.seek(self._start)
+        self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(record_lengths), self.chunk_rows))
+        self.file.seek(end)
+
+
+def _get_key_field(schema):
+    field = schema.get_field(KEY_FIELD_NAME)
+    if field is None or field.field_type not in dat_encoder.INT_RANGES:
+        return None
+    return field
+
+
+def _encode_keys(df, key_field):
+    if key_field is None:
+        return None
+    return dat_encoder.encode_int_keys(df[key_field.column], key_field.field_type, key_field.field_name)
+
+
+def _encode_index(record_lengths, key_values, key_field, chunk_rows):
+    """
+    块表、主键表和 trailer。
+
+    :param record_lengths: 每条记录的字节数，数据区紧跟在 header 之后
+    :param key_values: 每行的主键，没有主键字段时为 None
+    """
+    row_count = len(record_lengths)
+
+    # 每条记录在文件中的偏移
+    record_starts = np.cumsum(record_lengths) - record_lengths + HEADER.size
+    first_rows = np.arange(0, row_count, chunk_rows, dtype=np.int64)
+
+    chunks = np.zeros(len(first_rows), dtype=CHUNK_ENTRY)
+    chunks["offset"] = record_starts[first_rows]
+    chunks["length"] = np.add.reduceat(record_lengths, first_rows) if row_count else []
+    chunks["first_row"] = first_rows
+
+    if key_field is None:
+        keys, key_field_number = np.zeros(0, dtype=KEY_ENTRY), 0
+    else:
+        keys, key_field_number = _build_key_table(key_values, record_starts, chunks, chunk_rows), key_field.field_number
+
+    chunk_table_offset = HEADER.size + int(record_lengths.sum())
+    key_table_offset = chunk_table_offset + chunks.nbytes
+    return b"".join([
+        chunks.tobytes(),
+        keys.tobytes(),
+        TRAILER.pack(chunk_table_offset, len(chunks), key_table_offset, len(keys), key_field_number, MAGIC),
+    ])
+
+
+def _build_key_table(values, record_starts, chunks, chunk_rows):
+    rows = np.arange(len(values))
+
+    # 稳定排序后每组相同 key 只保留最后一行
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    last = np.append(sorted_values[1:] != sorted_values[:-1], True) if len(order) else np.zeros(0, dtype=bool)
+    order = order[last]
+
+    chunk_indexes = rows[order] // chunk_rows
+    keys = np.zeros(len(order), dtype=KEY_ENTRY)
+    keys["key"] = values[order]
+    keys["chunk"] = chunk_indexes
+    keys["offset"] = record_starts[order] - chunks["offset"][chunk_indexes]
+    return keys
+
+
+class IndexedDatReader:
+    """
+    分块索引 .dat 的读取器：内存映射文件，按主键、行号或块读取原始 {Table}Row 字节。
+
+    传入 row_parser（如 SampleRow.FromString）时返回解析后的消息。
+    """
+
+    def __init__(self, path, row_parser=None):
+        self.path = path
+        self.row_parser = row_parser
+        self._file = open(path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"Invalid indexed .dat file: {path}")
+
+        try:
+            self._read_index()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_index(self):
+        data = self._data
+        if len(data) < HEADER.size + TRAILER.size:
+            raise ValueError(f"Invalid indexed .dat file: {self.path}")
+
+        magic, version, self.row_count, self.chunk_rows = HEADER.unpack_from(data, 0)
+        trailer = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+        chunk_table_offset, chunk_count, key_table_offset, key_count, self.key_field_number, end_magic = trailer
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError(f"Invalid indexed .dat file: {self.path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported indexed .dat version {version} in {self.path}")
+
+        self.chunks = np.frombuffer(data, dtype=CHUNK_ENTRY, count=chunk_count, offset=chunk_table_offset)
+        self.keys = np.frombuffer(data, dtype=KEY_ENTRY, count=key_count, offset=key_table_offset)
+
+    def close(self):
+        # frombuffer 得到的数组引用着映射内存，需先释放
+        self.chunks = None
+        self.keys = None
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.row_count
+
+    @property
+    def chunk_count(self):
+        return len(self.chunks)
+
+    def get(self, key):
+        """
+        按主键读取一行；不存在时返回 None。
+        """
+        position = np.searchsorted(self.keys["key"], key)
+        if position >= len(self.keys) or self.keys["key"][position] != key:
+            return None
+        entry = self.keys[position]
+        record, _ = self._read_record(int(self.chunks["offset"][entry["chunk"]]) + int(entry["offset"]))
+        return self._parse(record)
+
+    def get_row(self, row):
+        """
+        按行号读取一行：定位到所在块后顺序跳过前面的记录。
+        """
+        if not 0 <= row < self.row_count:
+            raise IndexError(f"Row {row} out of range")
+        chunk = row // self.chunk_rows
+        offset = int(self.chunks["offset"][chunk])
+        for _ in range(row - int(self.chunks["first_row"][chunk])):
+            _, offset = self._read_record(offset)
+        record, _ = self._read_record(offset)
+        return self._parse(record)
+
+    def get_chunk(self, chunk):
+        """
+        读取一整块的所有行。
+        """
+        offset = int(self.chunks["offset"][chunk])
+        end = offset + int(self.chunks["length"][chunk])
+        rows = []
+        while offset < end:
+            record, offset = self._read_record(offset)
+            rows.append(self._parse(record))
+        return rows
+
+    def __iter__(self):
+        for chunk in range(self.chunk_count):
+            yield from self.get_chunk(chunk)
+
+    def _read_record(self, offset):
+        data = self._data
+        length = 0
+        shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            length |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        return data[offset:offset + length], offset + length
+
+    def _parse(self, record):
+        return self.row_parser(record) if self.row_parser is not None else record
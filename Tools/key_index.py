@@ -0,0 +1,156 @@
+import threading
+import numpy as np
+import pandas as pd
+import excel_reader
+
+# 每条未命中记录最多保留的示例值个数
+MAX_MISS_SAMPLES = 10
+
+
+class KeyIndex:
+    """
+    跨表外键索引。
+
+    每个被引用的 (表, 字段) 在一次构建中只构建一次去重后的哈希索引（pd.Index），
+    所有引用它的列、所有外键检查都复用同一份索引，并记录每次检查中未命中的值。
+    线程池下多个线程共享同一个实例；进程池下由父进程用 subset 预先构建所需的索引再传给子进程。
+    分块模式的表（见 chunked_table.py）不在内存中，被引用字段的键从工作簿中逐批流式读取，只保留去重后的键。
+    """
+
+    def __init__(self, tables=None, schemas=None, chunked_files=None):
+        """
+        :param tables: 表名 -> DataFrame，用于按需构建索引
+        :param schemas: 表名 -> TableSchema，用于找到被引用字段对应的列
+        :param chunked_files: 分块模式的表名 -> 工作簿路径（TableRegistry.chunked_files）
+        """
+        self.tables = tables if tables is not None else {}
+        self.schemas = schemas if schemas is not None else {}
+        self.chunked_files = chunked_files if chunked_files is not None else {}
+        self.misses = {}  # "表.字段 -> 目标表.目标字段" -> {"count": 未命中值个数, "values": 示例值}
+        self._keys = {}   # (表名, 字段名) -> pd.Index
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def has_table(self, table_name):
+        return table_name in self.schemas
+
+    def get_keys(self, table_name, field_name):
+        """
+        返回 (表, 字段) 的去重键索引，首次访问时构建。
+        """
+        key = (table_name, field_name)
+        keys = self._keys.get(key)
+        if keys is not None:
+            return keys
+
+        with self._lock:
+            keys = self._keys.get(key)
+            if keys is None:
+                keys = self._build_keys(table_name, field_name)
+                self._keys[key] = keys
+        return keys
+
+    def find_missing(self, values, table_name, field_name, referrer=None):
+        """
+        找出不在 (表, 字段) 中的值（空值不参与检查）。
+
+        :param values: 待检查的 Series
+        :param referrer: 引用方描述，如 "Sample.level"；指定时记录未命中
+        :return: 与 values 等长的布尔数组，True 表示未命中
+        """
+        keys = self.get_keys(table_name, field_name)
+        notnull = values.notna().to_numpy()
+        missing = (keys.get_indexer(values) == -1) & notnull
+
+        if referrer is not None and missing.any():
+            missing_values = pd.unique(values[missing])
+            self.misses[f"{referrer} -> {table_name}.{field_name}"] = {
+                "count": len(missing_values),
+                "values": [_to_builtin(v) for v in missing_values[:MAX_MISS_SAMPLES]],
+            }
+        return missing
+
+    def subset(self, references):
+        """
+        只包含指定 (表, 字段) 预先构建好的索引和对应表 schema 的新实例，用于传给子进程。
+
+        :param references: [(表名, 字段名), ...]
+        """
+        index = KeyIndex()
+        for table_name, field_name in references:
+            if table_name not in self.schemas:
+                continue
+            index.schemas[table_name] = self.schemas[table_name]
+            if self.schemas[table_name].get_field(field_name) is not None:
+                index._keys[(table_name, field_name)] = self.get_keys(table_name, field_name)
+        return index
+
+    def invalidate(self, table_name, schema=None):
+        """
+        表数据或表头变化后丢弃该表已构建的索引；schema 为 None 表示该表已不可用。
+        """
+        with self._lock:
+            for key in [key for key in self._keys if key[0] == table_name]:
+                del self._keys[key]
+            if schema is None:
+                self.schemas.pop(table_name, None)
+            else:
+                self.schemas[table_name] = schema
+            for key in [key for key in self.misses if key.startswith(f"{table_name}.")]:
+                del self.misses[key]
+
+    def get_misses(self, table_name):
+        """
+        返回某张表作为引用方时记录的未命中。
+        """
+        prefix = f"{table_name}."
+        return {key: value for key, value in self.misses.items() if key.startswith(prefix)}
+
+    def _build_keys(self, table_name, field_name):
+        schema = self.schemas.get(table_name)
+        field = schema.get_field(field_name) if schema is not None else None
+        if field is None:
+            raise ValueError(f"Field '{field_name}' not found in table '{table_name}'.")
+
+        if table_name in self.chunked_files:
+            keys = pd.Index(_read_unique_values(self.chunked_files[table_name], field.column))
+        else:
+            df = self.tables.get(table_name)
+            if df is None:
+                raise ValueError(f"Table '{table_name}' is not loaded.")
+            keys = pd.Index(df[field.column].dropna().unique())
+        # pd.Index 的哈希表在首次查询时才构建，且不是线程安全的：在锁内预先构建，
+        # 否则多个线程同时首次 get_indexer 可能误报 "Reindexing only valid with uniquely valued Index objects"
+        keys.is_unique
+        return keys
+
+
+def get_foreign_references(schema):
+    """
+    一张表的外键引用的全部 (表, 字段)。
+    """
+    return sorted({(fk.table_name, fk.field_name) for field in schema.fields for fk in field.foreign_keys})
+
+
+def _read_unique_values(file_path, column):
+    """
+    逐批读取工作簿的一列，返回去重后的非空值。
+    """
+    unique = []
+    for _, batch in excel_reader.iter_column_batches(file_path, usecols=[column]):
+        unique.append(pd.unique(batch[column].dropna()))
+        if len(unique) > 1:
+            unique = [pd.unique(pd.Series(np.concatenate(unique)))]
+    return unique[0] if unique else []
+
+
+def _to_builtin(value):
+    return value.item() if hasattr(value, "item") else value
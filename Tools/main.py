@@ -1,102 +1,700 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
 import os
 import shutil
-import sys
+import time
+from contextlib import nullcontext
 import excel_reader
 import data_generator
+import indexed_dat
 import validator
 import code_generator
+import bundle
+import chunked_table
+import delta_patch
+import output_cache as output_cache_module
+import profiler
+import string_pool as string_pool_module
+import util
+import watcher
+from build_manifest import BuildManifest
+from dat_encoder import collect_strings
+from key_index import KeyIndex, get_foreign_references
+from output_cache import OutputCache
+from scheduler import PipelineScheduler, format_critical_path
+from schema import BACKENDS, build_table_schema
+from string_pool import POOL_TABLE_NAME, StringPool
+from table_registry import TableRegistry, get_table_name, list_excel_files
 
-def get_all_excel_data(input_dir):
-    data_dict = {}
-    excel_files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.xlsx')]
-    for file_path in excel_files:
-        table_name = os.path.splitext(os.path.basename(file_path))[0]
-        try:
-            df = excel_reader.read_excel(file_path)
-            data_dict[table_name] = df
-        except Exception as e:
-            print(f"Error reading {file_path}: {e}")
-    return data_dict
+# 执行引擎：thread 为线程池（受 GIL 限制）；process 为进程池，可真正利用多核
+ENGINES = ("thread", "process")
+
+
+def create_executor(engine, workers=None):
+    """
+    根据执行引擎创建 Executor。
+
+    :param engine: "thread" 或 "process"
+    :param workers: 工作线程/进程数，默认为 CPU 核数
+    """
+    if engine == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if engine == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    raise ValueError(f"Unsupported engine: '{engine}' (expected one of {ENGINES})")
 
 
-def process_single_excel(file_path, proto_dir, dat_dir, python_out_dir, csharp_out_dir, all_excel_data):
+class BuildSession:
     """
-    处理单个 Excel 文件：读取、验证、生成 .proto/.dat/.py/.cs 文件。
+    可跨多次构建保留的状态：已加载的表和表头、外键索引、构建清单以及执行器。
+    监视模式下常驻内存，只重新读取变化的工作簿。
     """
+
+    def __init__(self, registry, key_index=None, manifest=None, executor=None):
+        self.registry = registry
+        self.key_index = key_index
+        self.manifest = manifest
+        self.executor = executor
+
+    def refresh(self, changed_files, removed_files):
+        """
+        重新读取变化的工作簿、移除已删除的工作簿，并使对应的表头和外键索引失效。
+        """
+        registry = self.registry
+        for file_path in removed_files:
+            table_name = get_table_name(file_path)
+            registry.remove(table_name)
+            if self.key_index is not None:
+                self.key_index.invalidate(table_name)
+
+        for file_path in changed_files:
+            table_name = get_table_name(file_path)
+            try:
+                registry.load(file_path)
+            except Exception as e:
+                registry.remove(table_name)
+                registry.errors[table_name] = e
+                print(f"Error reading {file_path}: {e}")
+
+            if self.key_index is not None:
+                schemas = registry.get_schemas([table_name])
+                self.key_index.invalidate(table_name, schemas.get(table_name))
+
+
+def get_table_inputs(table_name, registry, key_index, engine):
+    """
+    一张表处理时需要的数据：自身的 DataFrame、TableSchema 以及外键索引。
+
+    线程池共享同一个 key_index；进程池只把该表外键引用到的 (表, 字段) 键索引预先构建好传给子进程，
+    而不是整个 all_excel_data。
+
+    :return: (DataFrame, TableSchema, KeyIndex)
+    """
+    df = registry.get(table_name)
     try:
-        table_name = os.path.splitext(os.path.basename(file_path))[0]
-        #print(f"[Start processing table: {table_name}]")
+        schema = registry.get_schema(table_name) if df is not None else None
+    except ValueError:
+        # 表头格式错误，交给 process_single_excel 报告
+        schema = None
 
-        # 读取 Excel 文件
-        df = excel_reader.read_excel(file_path)
+    if engine != "process":
+        return df, schema, key_index
+    if schema is None:
+        return df, schema, KeyIndex()
+    return df, schema, key_index.subset(get_foreign_references(schema))
 
-        # 验证数据
-        validator.validate_excel(df, all_excel_data)
 
-        # 生成 .proto 文件
-        proto_file = os.path.join(proto_dir, f"{table_name}.proto")
-        data_generator.generate_proto_file(df, proto_file, table_name)
+def get_table_backend(schema, default="protobuf"):
+    """
+    表的 .dat 格式：表头中的 Backend 约束优先，否则为命令行指定的默认值。
+    """
+    return schema.backend if schema is not None and schema.backend is not None else default
 
-        # 生成 Python 和 C# 文件
-        code_generator.generate_python_code(proto_file, python_out_dir)
-        code_generator.generate_csharp_code(proto_file, csharp_out_dir)
 
-        # 生成 .dat 文件
-        dat_file = os.path.join(dat_dir, f"{table_name}.dat")
-        data_generator.generate_dat_file(df, table_name, dat_file)
+def get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir):
+    """
+    一张表对应的全部输出文件：输出类型 -> 文件路径
+    """
+    proto_file = os.path.join(proto_dir, f"{table_name}.proto")
+    return {
+        "proto": proto_file,
+        "schema": os.path.join(proto_dir, f"{table_name}.schema.json"),
+        "dat": os.path.join(dat_dir, f"{table_name}.dat"),
+        "python": os.path.join(python_out_dir, code_generator.get_python_file_name(proto_file)),
+        "csharp": os.path.join(csharp_out_dir, code_generator.get_csharp_file_name(proto_file)),
+    }
 
-        print(f"[Finished processing table: {table_name}]")
-        return True
+
+def process_single_excel(file_path, proto_dir, dat_dir, python_out_dir, csharp_out_dir, df=None, schema=None, key_index=None,
+                         reader="pandas", dat_encoder="columnar", dat_format="message",
+                         chunk_rows=indexed_dat.DEFAULT_CHUNK_ROWS, string_pool=None, backend="protobuf",
+                         submit_time=None, profile=False, cprofile_path=None, chunked_memory=None,
+                         output_cache=None, cache_key=None):
+    """
+    处理单个 Excel 文件：读取、验证、生成 .proto/.dat 文件。
+
+    .py/.cs 文件由 process_excel_directory 在所有表处理完后统一调用 protoc 生成；
+    .dat 的编码不依赖生成的代码（protobuf 编码方式在进程内构造消息类，见 message_types.py）。
+
+    :param df: 已加载的表数据，为 None 时读取工作簿
+    :param schema: 已解析的 TableSchema，为 None 时从表头解析
+    :param key_index: 外键索引 KeyIndex
+    :param string_pool: 已登记本表字符串的 StringPool，指定时 string 字段写为字符串池下标（soa 格式的表不使用）
+    :param backend: 表头未指定 Backend 时的 .dat 格式
+    :param submit_time: 提交到执行器的时间（time.time()），用于计算排队时间
+    :param profile: 为 True 时在结果中附带各阶段耗时（见 profiler.py）
+    :param cprofile_path: 指定时用 cProfile 记录本表的处理过程并写出到该路径
+    :param chunked_memory: 指定时按分块模式处理（df 不使用），为一批数据处理时的内存上限（字节），见 chunked_table.py
+    :param output_cache: output_cache.OutputCache，与 cache_key 同时指定时先从缓存恢复输出，命中时不再校验和生成
+    :return: 结果字典 {"table_name", "ok", "proto_changed", "cached", "error", "key_misses", "profile", "timing"}，
+             cached 为是否从输出缓存恢复，timing 为处理的开始、结束时间（time.time()），用于计算关键路径
+    """
+    table_name = get_table_name(file_path)
+    result = {"table_name": table_name, "ok": False, "proto_changed": False, "cached": False, "error": None,
+              "key_misses": {}, "profile": None, "timing": {"start": time.time()}}
+    key_index = key_index if key_index is not None else KeyIndex()
+    if profile:
+        profiler.start_memory_tracking()
+    table_profiler = profiler.TableProfiler(submit_time)
+    try:
+        #print(f"[Start processing table: {table_name}]")
+
+        with profiler.capture_cprofile(cprofile_path):
+            if cache_key is not None:
+                # 输出缓存命中时 .proto/.dat/.py/.cs 等全部恢复，protoc 也不需要再运行
+                with table_profiler.stage("restore"):
+                    output_files = get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+                    result["cached"] = output_cache.restore(cache_key, output_files)
+
+            if not result["cached"]:
+                if chunked_memory is not None:
+                    # 分块模式：逐批读取、校验并追加写出 .dat
+                    if schema is None:
+                        schema = build_table_schema(table_name, excel_reader.read_header(file_path))
+                    output_files = get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+                    table_backend = get_table_backend(schema, backend)
+                    table_pool = string_pool if table_backend == "protobuf" else None
+                    result["proto_changed"] = chunked_table.build_chunked_table(
+                        file_path, schema, key_index, output_files, chunked_memory, table_profiler, dat_format,
+                        chunk_rows, table_pool, table_backend)
+                else:
+                    result["proto_changed"] = process_table_data(
+                        file_path, proto_dir, dat_dir, python_out_dir, csharp_out_dir, df, schema, key_index, reader,
+                        dat_encoder, dat_format, chunk_rows, string_pool, backend, table_profiler)
+
+        result["ok"] = True
 
     except Exception as e:
         print(f"Error processing file {file_path}: {e}")
-        return False
+        result["error"] = str(e)
+
+    result["key_misses"] = key_index.get_misses(table_name)
+    result["timing"]["end"] = time.time()
+    if profile:
+        result["profile"] = table_profiler.to_dict()
+    return result
+
+
+def process_table_data(file_path, proto_dir, dat_dir, python_out_dir, csharp_out_dir, df, schema, key_index, reader,
+                       dat_encoder, dat_format, chunk_rows, string_pool, backend, table_profiler):
+    """
+    普通模式下一张表的读取、验证以及 .proto/.dat 生成，参数见 process_single_excel。
+
+    :return: .proto 是否有变化
+    """
+    table_name = get_table_name(file_path)
+
+    # 优先复用已加载的表数据，避免重复解析工作簿
+    if df is None:
+        with table_profiler.stage("read"):
+            df = excel_reader.read_excel(file_path, reader)
+
+    # 解析表头（已解析过的直接复用）并验证数据（截断到第一个空白行之前）
+    with table_profiler.stage("validate"):
+        if schema is None:
+            schema = build_table_schema(table_name, df.columns)
+        df = validator.validate_excel(df, schema, key_index)
+
+    output_files = get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+    table_backend = get_table_backend(schema, backend)
+    table_pool = string_pool if table_backend == "protobuf" else None
+
+    # 生成 .proto 文件及 .schema.json 表结构说明
+    with table_profiler.stage("proto"):
+        proto_changed = data_generator.generate_proto_file(output_files["proto"], table_name, schema,
+                                                           table_pool is not None)
+        data_generator.generate_schema_file(output_files["schema"], schema, data_generator.get_id_range(df, schema),
+                                            table_backend)
+
+    # 生成 .dat 文件
+    with table_profiler.stage("dat"):
+        data_generator.generate_dat_file(df, table_name, output_files["dat"], dat_encoder, schema,
+                                         dat_format, chunk_rows, table_pool, table_backend)
+    return proto_changed
+
+
+def generate_code_for_tables(table_names, proto_dir, dat_dir, python_out_dir, csharp_out_dir, results):
+    """
+    对 .proto 有变化或生成文件缺失的表统一调用 protoc，失败的表在 results 中标记为失败。
+    """
+    proto_files = []
+    for table_name in table_names:
+        output_files = get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+        if results[table_name]["proto_changed"] or not os.path.exists(output_files["python"]) \
+                or not os.path.exists(output_files["csharp"]):
+            proto_files.append(output_files["proto"])
 
+    errors = code_generator.generate_code(proto_files, python_out_dir, csharp_out_dir)
+    for proto_file, error in errors.items():
+        table_name = get_table_name(proto_file)
+        print(f"Error generating code for table {table_name}: {error}")
+        results[table_name]["ok"] = False
+        results[table_name]["error"] = error
 
-def process_excel_directory(input_dir, proto_dir, dat_dir, python_out_dir, csharp_out_dir):
+
+def process_excel_directory(input_dir, proto_dir, dat_dir, python_out_dir, csharp_out_dir, cache_dir=None, full_rebuild=False,
+                            reader="pandas", dat_encoder="columnar", engine="thread", workers=None, session=None,
+                            dat_format="message", chunk_rows=indexed_dat.DEFAULT_CHUNK_ROWS, bundle_path=None,
+                            bundle_compression="zlib", string_pool=False, build_profiler=None, patch_base=None,
+                            patch_dir=None, backend="protobuf", chunked_threshold=None,
+                            chunked_memory=chunked_table.DEFAULT_MEMORY_LIMIT_MB << 20, output_cache=None):
     """
     并行化处理整个 Excel 目录。
+
+    指定 cache_dir 时按构建清单增量构建：只处理有变化的表及引用了它们的表。
+    工作簿按文件大小从大到小并行读取，每张表在自身及其外键引用的表读取完成后立即开始处理，
+    不等待其余工作簿（见 scheduler.py）；构建结束时打印关键路径。
+    传入 session 时复用其中已加载的表、外键索引、构建清单和执行器。
+    指定 bundle_path 时在最后把所有 .dat 打包为单个文件，并在 C# 输出目录生成 ConfigBundle 读取器。
+    string_pool 为 True 时所有表的 string 字段写为共享字符串池的下标（见 string_pool.py）。
+    backend 为表头未指定 Backend 的表使用的 .dat 格式，soa 格式的表不使用字符串池（见 soa_dat.py）。
+    指定 patch_base（上一个发布版本的 .dat 目录）时在 patch_dir 生成各表的行级热更新补丁（见 delta_patch.py）。
+    传入 build_profiler 时记录每张表各阶段及整批阶段的耗时，构建结束后写出报告（见 profiler.py）。
+    指定 chunked_threshold（字节）时，不小于该大小的工作簿按分块模式逐批处理，chunked_memory 为这些表合计的内存上限，
+    按工作线程/进程数平分（见 chunked_table.py）。
+    指定 output_cache 时需要处理的表先从共享输出缓存恢复，未命中的表构建成功后写入缓存（见 output_cache.py）；
+    传入 session 时工作簿解析结果的共享缓存由其中的 TableRegistry 决定。
     """
+    stage = build_profiler.stage if build_profiler is not None else (lambda name: nullcontext())
+
     # 获取所有 Excel 文件
-    excel_files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.xlsx')]
+    excel_files = list_excel_files(input_dir)
+    file_paths = {get_table_name(file): file for file in excel_files}
+    if string_pool and POOL_TABLE_NAME in file_paths:
+        raise ValueError(f"Table name '{POOL_TABLE_NAME}' is reserved for the string pool.")
+
+    # 工作簿由调度器在流水线中读取（见 scheduler.py）；各阶段共享同一份解析结果
+    if session is None:
+        session = BuildSession(TableRegistry(input_dir, cache_dir, reader, build_profiler, chunked_threshold,
+                                             output_cache))
+    registry = session.registry
+    all_excel_data = registry.tables
+
+    # 计算需要重建的表
+    output_dirs = {"proto": proto_dir, "schema": proto_dir, "dat": dat_dir, "python": python_out_dir, "csharp": csharp_out_dir}
+    if session.manifest is None:
+        session.manifest = BuildManifest.load(os.path.join(cache_dir, "manifest.json") if cache_dir else None)
+        if full_rebuild:
+            session.manifest.tables = {}
+    manifest = session.manifest
+
+    # 清理已删除工作簿的输出
+    removed_tables = set()
+    for table_name in list(manifest.tables.keys()):
+        if table_name not in file_paths:
+            manifest.remove_table(table_name, output_dirs)
+            removed_tables.add(table_name)
+            print(f"[Removed outputs of deleted table: {table_name}]")
+
+    # 字符串池只追加，已有下标不变；池文件丢失时已生成的 .dat 下标失效，需要全量重建
+    pool_files = {
+        "proto": os.path.join(proto_dir, f"{POOL_TABLE_NAME}.proto"),
+        "dat": os.path.join(dat_dir, f"{POOL_TABLE_NAME}.dat"),
+    }
+    pool = None
+    if string_pool:
+        pool = StringPool.load(pool_files["dat"])
+        if pool is None:
+            pool = StringPool()
+            manifest.tables = {}
 
-    # 收集所有表数据，用于跨表验证
-    all_excel_data = get_all_excel_data(input_dir)
+    # 影响输出内容的选项变化时需要重建
+    options = {"dat_format": dat_format}
+    if dat_format == "indexed":
+        options["chunk_rows"] = chunk_rows
+    if string_pool:
+        options["string_pool"] = True
+    if backend != "protobuf":
+        options["backend"] = backend
+
+    # 外键索引：每个被引用的 (表, 字段) 只构建一次；流水线中新读取的表读完后加入
+    if session.key_index is None:
+        session.key_index = KeyIndex(all_excel_data, registry.get_schemas(registry.tables.keys()), registry.chunked_files)
+    key_index = session.key_index
+
+    changed_tables = {}  # 表名 -> 自身是否有变化（输出文件摘要只计算一次）
+    # 分块模式的表可能同时处理，每张表一批数据的内存上限
+    table_memory = chunked_memory // (workers or os.cpu_count() or 1)
+
+    def is_changed(table_name):
+        if table_name not in changed_tables:
+            if table_name in removed_tables or table_name in registry.errors:
+                # 读取失败或被删除的表视为变化，引用它的表需要重新校验
+                changed_tables[table_name] = True
+            else:
+                changed_tables[table_name] = table_name in registry.tables and \
+                    manifest.is_table_changed(table_name, registry, output_dirs, options)
+        return changed_tables[table_name]
+
+    def on_loaded(table_name):
+        key_index.invalidate(table_name, registry.get_schemas([table_name]).get(table_name))
+
+    def on_ready(table_name):
+        # 只处理有变化的表，以及外键引用了变化表（含已删除的表）的表
+        try:
+            all_references = util.get_referenced_tables(all_excel_data[table_name].columns)
+        except ValueError:
+            # 表头约束格式错误，交给 process_single_excel 报告
+            all_references = set()
+        if not is_changed(table_name) and not any(is_changed(reference) for reference in all_references):
+            return None
 
-    # 并行处理每个文件
-    with ThreadPoolExecutor() as executor:
-        futures = {
-            executor.submit(process_single_excel, file, proto_dir, dat_dir, python_out_dir, csharp_out_dir, all_excel_data): file
-            for file in excel_files
-        }
+        df, schema, table_key_index = get_table_inputs(table_name, registry, key_index, engine)
+        chunked = table_name in registry.chunked_files
+        if chunked:
+            df = None
 
-        for future in as_completed(futures):
-            file = futures[future]
+        # 启用字符串池时调度器按表名顺序就绪，字符串下标与读取、执行顺序无关
+        table_pool = pool
+        if pool is not None:
+            strings = []
+            if schema is not None and get_table_backend(schema, backend) == "protobuf":
+                if chunked:
+                    strings = chunked_table.collect_strings(file_paths[table_name], schema, table_memory)
+                else:
+                    strings = collect_strings(df, schema)
+                pool.add_all(strings)
+            if engine == "process":
+                table_pool = pool.subset(strings)
+
+        # 输出缓存键：工作簿及其引用的表的内容、构建选项以及本表字符串的池下标
+        cache_options = {}
+        if output_cache is not None and schema is not None:
+            references = {reference: registry.content_hashes.get(reference) for reference in sorted(all_references)}
+            string_ids = pool.get_ids(strings).tolist() if pool is not None else None
+            cache_keys[table_name] = output_cache.get_key(table_name, registry.content_hashes[table_name], references,
+                                                          options, string_ids)
+            cache_options = dict(output_cache=output_cache, cache_key=cache_keys[table_name])
+
+        profile_options = {}
+        if build_profiler is not None:
+            profile_options = dict(submit_time=time.time(), profile=True,
+                                   cprofile_path=build_profiler.get_cprofile_path(table_name))
+        return executor.submit(process_single_excel, file_paths[table_name], proto_dir, dat_dir, python_out_dir,
+                               csharp_out_dir, df, schema, table_key_index, reader, dat_encoder, dat_format,
+                               chunk_rows, table_pool, backend, chunked_memory=table_memory if chunked else None,
+                               **cache_options, **profile_options)
+
+    def on_result(table_name, future):
+        try:
+            results[table_name] = future.result()
+        except Exception as e:
+            print(f"Exception occurred while processing {file_paths[table_name]}: {e}")
+            results[table_name] = {"table_name": table_name, "ok": False, "proto_changed": False, "cached": False,
+                                   "error": str(e), "key_misses": {}, "profile": None, "timing": None}
+        if build_profiler is not None:
+            build_profiler.add_table_result(table_name, results[table_name]["profile"])
+
+    # 流水线：并行读取工作簿，每张表及其引用的表读取完成后立即校验并生成 .proto/.dat
+    results = {}
+    cache_keys = {}  # 表名 -> 输出缓存键
+    scheduler = PipelineScheduler(registry, excel_files, workers, ordered=pool is not None)
+    executor = session.executor or create_executor(engine, workers)
+    cache_hits = registry.cache_hits
+    try:
+        scheduler.run(on_loaded, on_ready, on_result)
+    finally:
+        if session.executor is None:
+            executor.shutdown()
+
+    if registry.cache_hits > cache_hits:
+        print(f"Loaded {registry.cache_hits - cache_hits}/{scheduler.read_count} tables from cache")
+
+    skipped = len(registry.tables) - len(results)
+    if skipped > 0:
+        print(f"Skipped {skipped} unchanged tables")
+    critical_path = scheduler.get_critical_path()
+    if build_profiler is not None:
+        build_profiler.critical_path = critical_path
+
+    # 统一生成 Python 和 C# 文件
+    succeeded = sorted(table_name for table_name, result in results.items() if result["ok"])
+    with stage("codegen"):
+        generate_code_for_tables(succeeded, proto_dir, dat_dir, python_out_dir, csharp_out_dir, results)
+
+    # 新构建成功的表写入输出缓存，超出大小上限时清理最久未使用的条目
+    if output_cache is not None and cache_keys:
+        with stage("output_cache"):
+            restored = sum(result["cached"] for result in results.values())
+            stored = 0
             try:
-                result = future.result()
+                for table_name, result in sorted(results.items()):
+                    if result["ok"] and not result["cached"] and table_name in cache_keys:
+                        output_files = get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+                        stored += output_cache.store(cache_keys[table_name], output_files)
+                removed, freed = output_cache.trim()
+                print(f"\nOutput cache: restored {restored}/{len(cache_keys)} tables, stored {stored}"
+                      + (f", evicted {removed} entries ({freed} bytes)" if removed else ""))
+            except OSError as e:
+                print(f"\nError updating output cache {output_cache.root}: {e}")
+
+    for table_name, result in results.items():
+        # 只记录成功的表，失败的表下次构建会重试
+        if result["ok"]:
+            print(f"[Finished processing table: {table_name}]")
+            output_files = get_output_files(table_name, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+            manifest.record_table(table_name, registry, output_files, options)
+        else:
+            manifest.remove_table(table_name)
+
+    manifest.save()
+
+    # 写出字符串池及其 C# 访问器；关闭时清理旧输出
+    if pool is not None:
+        with stage("string_pool"):
+            try:
+                proto_changed = pool.save(pool_files["proto"], pool_files["dat"])
+                pool_outputs = get_output_files(POOL_TABLE_NAME, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+                if proto_changed or not os.path.exists(pool_outputs["python"]) \
+                        or not os.path.exists(pool_outputs["csharp"]):
+                    errors = code_generator.generate_code([pool_files["proto"]], python_out_dir, csharp_out_dir)
+                    for error in errors.values():
+                        print(f"Error generating code for the string pool: {error}")
+                schemas = registry.get_schemas(manifest.tables.keys())
+                schemas = {table_name: schema for table_name, schema in schemas.items()
+                           if get_table_backend(schema, backend) == "protobuf"}
+                string_pool_module.generate_accessor_cs(csharp_out_dir, schemas)
+                print(f"\nString pool: {len(pool)} strings")
+            except Exception as e:
+                print(f"\nError writing string pool: {e}")
+    else:
+        string_pool_module.remove_outputs(proto_dir, dat_dir, python_out_dir, csharp_out_dir)
+
+    # 生成 Python 运行时 ConfigDatabase，记录哪些表的 string 字段写为字符串池下标
+    string_pool_fields = {}
+    if pool is not None:
+        for table_name, schema in registry.get_schemas(manifest.tables.keys()).items():
+            if get_table_backend(schema, backend) == "protobuf":
+                string_pool_fields[table_name] = [field.field_name for field in schema.fields
+                                                  if field.field_type == "string"]
+    try:
+        code_generator.generate_python_runtime(python_out_dir, string_pool_fields)
+    except Exception as e:
+        print(f"\nError writing the Python runtime: {e}")
+
+    # 生成相对上一个发布版本的热更新补丁
+    if patch_base is not None:
+        with stage("patch"):
+            try:
+                summary = delta_patch.write_patches(patch_base, dat_dir, patch_dir,
+                                                    registry.get_schemas(registry.tables.keys()))
+                modes = [entry["mode"] for entry in summary.values()]
+                print(f"\nPatches written to {patch_dir}: {modes.count('patch')} patched, {modes.count('full')} full, "
+                      f"{modes.count('removed')} removed")
+                for table_name, entry in sorted(summary.items()):
+                    if entry["mode"] == "full":
+                        print(f"  [FULL] {table_name}: {entry['reason']}")
+            except Exception as e:
+                print(f"\nError writing patches to {patch_dir}: {e}")
+
+    # 打包所有 .dat
+    if bundle_path is not None:
+        with stage("bundle"):
+            try:
+                changed, entries = bundle.write_bundle(dat_dir, bundle_path, bundle_compression)
+                bundle.generate_loader_cs(csharp_out_dir)
+                raw_size = sum(entry["raw_length"] for entry in entries)
+                stored_size = sum(entry["stored_length"] for entry in entries)
+                state = "updated" if changed else "unchanged"
+                print(f"\nBundle {state}: {bundle_path} ({len(entries)} tables, {raw_size} -> {stored_size} bytes)")
             except Exception as e:
-                print(f"Exception occurred while processing {file}: {e}")
+                print(f"\nError writing bundle {bundle_path}: {e}")
+
+    failed = sorted(table_name for table_name, result in results.items() if not result["ok"])
+    print(f"\nBuild finished: {len(results) - len(failed)} succeeded, {len(failed)} failed, {skipped} skipped")
+    for table_name in failed:
+        print(f"  [FAILED] {table_name}: {results[table_name]['error']}")
+    print(format_critical_path(critical_path))
+
+    # 外键未命中汇总
+    key_misses = {}
+    for result in results.values():
+        key_misses.update(result["key_misses"])
+    if key_misses:
+        print("\nForeign key misses:")
+        for reference, miss in sorted(key_misses.items()):
+            print(f"  {reference}: {miss['count']} missing value(s), e.g. {miss['values']}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Excel config tables to .proto/.dat/.py/.cs files.")
+    parser.add_argument("input_dir", help="Excel 文件所在目录")
+    parser.add_argument("proto_dir", help="输出的 .proto 文件目录")
+    parser.add_argument("dat_dir", help="输出的 .dat 文件目录")
+    parser.add_argument("python_out_dir", help="输出的 .py 文件目录")
+    parser.add_argument("csharp_out_dir", help="输出的 .cs 文件目录")
+    parser.add_argument("--cache-dir", default=None,
+                        help="已解析工作簿的缓存目录（默认：dat 目录同级的 .cache）")
+    parser.add_argument("--no-cache", action="store_true", help="不读写工作簿解析缓存和构建清单（每次全量构建）")
+    parser.add_argument("--output-cache", default=None, metavar="DIR",
+                        help="共享输出缓存目录（可位于多台机器共同挂载的目录）：按工作簿、被引用表、工具和 protoc 版本"
+                             "的摘要缓存每张表的全部输出，命中时直接恢复")
+    parser.add_argument("--output-cache-size", type=int, default=output_cache_module.DEFAULT_MAX_SIZE_MB, metavar="MB",
+                        help="输出缓存的大小上限（MB），超出时删除最久未使用的条目")
+    parser.add_argument("--reader", choices=excel_reader.READER_MODES, default="pandas",
+                        help="工作簿读取方式：pandas 为 pd.read_excel；stream 为 openpyxl 只读流式读取，遇空行即停止")
+    parser.add_argument("--dat-encoder", choices=data_generator.DAT_ENCODERS, default="columnar",
+                        help=".dat 编码方式：columnar 为按列编码；protobuf 为逐行构造 Protobuf 消息（输出一致）")
+    parser.add_argument("--dat-format", choices=data_generator.DAT_FORMATS, default="message",
+                        help=".dat 文件格式：message 为整表一条消息；indexed 为分块记录 + 主键索引，可按行/按块读取")
+    parser.add_argument("--chunk-rows", type=int, default=indexed_dat.DEFAULT_CHUNK_ROWS,
+                        help="indexed 格式每块的行数")
+    parser.add_argument("--backend", choices=BACKENDS, default="protobuf",
+                        help="表头未指定 Backend 的表的 .dat 格式：protobuf 为 Protobuf 消息；"
+                             "soa 为定长列存，运行时内存映射后直接读取，无需解析")
+    parser.add_argument("--string-pool", action="store_true",
+                        help="所有表的 string 字段写为共享字符串池（ConfigStrings）的下标，去重并减小 .dat 体积")
+    parser.add_argument("--bundle", default=None,
+                        help="把所有 .dat 打包为单个文件（如 Output/config.bundle），并生成 C# ConfigBundle 读取器")
+    parser.add_argument("--bundle-compression", choices=bundle.COMPRESSIONS, default="zlib",
+                        help="bundle 条目压缩方式")
+    parser.add_argument("--patch-base", default=None, metavar="DAT_DIR",
+                        help="上一个发布版本的 .dat 目录；指定时为有变化的表生成行级热更新补丁")
+    parser.add_argument("--patch-dir", default=None,
+                        help="热更新补丁的输出目录（默认：dat 目录同级的 patch）")
+    parser.add_argument("--chunked-threshold", type=float, default=None, metavar="MB",
+                        help="不小于该大小（MB）的工作簿按分块模式处理：逐批读取、校验并追加写出 .dat，"
+                             "内存占用与表的行数无关（0 表示所有工作簿）")
+    parser.add_argument("--chunked-memory", type=int, default=chunked_table.DEFAULT_MEMORY_LIMIT_MB, metavar="MB",
+                        help="分块模式下同时处理的各表合计的内存上限（MB），决定每批读取的行数")
+    parser.add_argument("--engine", choices=ENGINES, default="thread",
+                        help="执行引擎：thread 为线程池；process 为进程池（CPU 密集时可利用多核）")
+    parser.add_argument("--workers", type=int, default=None, help="工作线程/进程数（默认：CPU 核数）")
+    parser.add_argument("--watch", action="store_true",
+                        help="构建后持续监视 Excel 目录，保存时只重建变化的表及引用它的表")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="监视模式的轮询间隔（秒）")
+    parser.add_argument("--clean", action="store_true", help="清空输出目录后全量构建")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="REPORT",
+                        help="记录每张表各阶段的耗时、CPU 时间和内存峰值，写出 JSON 报告并打印最慢的表和阶段"
+                             "（默认报告路径：dat 目录同级的 profile.json）")
+    parser.add_argument("--profile-table", default=None, metavar="TABLE",
+                        help="用 cProfile 记录指定表的处理过程（需同时指定 --profile），写出到报告同级的 .prof 文件")
+    args = parser.parse_args(argv)
+    if args.dat_format == "indexed" and args.dat_encoder != "columnar":
+        parser.error("--dat-format indexed requires --dat-encoder columnar")
+    if args.string_pool and args.dat_encoder != "columnar":
+        parser.error("--string-pool requires --dat-encoder columnar")
+    if args.chunk_rows <= 0:
+        parser.error("--chunk-rows must be positive")
+    if args.profile_table and args.profile is None:
+        parser.error("--profile-table requires --profile")
+    if args.patch_dir and not args.patch_base:
+        parser.error("--patch-dir requires --patch-base")
+    if args.chunked_threshold is not None:
+        if args.chunked_threshold < 0:
+            parser.error("--chunked-threshold must not be negative")
+        if args.dat_encoder != "columnar":
+            parser.error("--chunked-threshold requires --dat-encoder columnar")
+        if args.backend == "soa":
+            parser.error("--chunked-threshold does not support --backend soa")
+    if args.chunked_memory <= 0:
+        parser.error("--chunked-memory must be positive")
+    if args.output_cache_size <= 0:
+        parser.error("--output-cache-size must be positive")
+    return args
 
 
 if __name__ == "__main__":    
 
-    input_dir = os.path.abspath(sys.argv[1])  # Excel 文件所在目录
-    proto_dir = os.path.abspath(sys.argv[2])  # 输出的 .proto 文件目录
-    dat_dir = os.path.abspath(sys.argv[3])  # 输出的 .dat 文件目录
-    python_out_dir = os.path.abspath(sys.argv[4])  # 输出的 .py 文件目录
-    csharp_out_dir = os.path.abspath(sys.argv[5])  # 输出的 .cs 文件目录
+    args = parse_args()
+    input_dir = os.path.abspath(args.input_dir)  # Excel 文件所在目录
+    proto_dir = os.path.abspath(args.proto_dir)  # 输出的 .proto 文件目录
+    dat_dir = os.path.abspath(args.dat_dir)  # 输出的 .dat 文件目录
+    python_out_dir = os.path.abspath(args.python_out_dir)  # 输出的 .py 文件目录
+    csharp_out_dir = os.path.abspath(args.csharp_out_dir)  # 输出的 .cs 文件目录
+
+    # 工作簿解析缓存目录
+    if args.no_cache:
+        cache_dir = None
+    else:
+        cache_dir = os.path.abspath(args.cache_dir or os.path.join(os.path.dirname(dat_dir), ".cache"))
+
+    # 共享输出缓存
+    output_cache = None
+    if args.output_cache:
+        output_cache = OutputCache(os.path.abspath(args.output_cache), args.output_cache_size << 20,
+                                   code_generator.get_protoc_version())
 
-    # 确保输出目录存在
+    # 确保输出目录存在；只有 --clean 时才删除旧输出，默认增量构建
     for dir in [proto_dir, dat_dir, python_out_dir, csharp_out_dir]:
-        if os.path.exists(dir):
+        if args.clean and os.path.exists(dir):
             shutil.rmtree(dir)  # 删除整个目录
-        os.makedirs(dir)  # 重新创建目录
+        os.makedirs(dir, exist_ok=True)
 
-    # 动态添加新模块路径到 sys.path
-    if python_out_dir not in sys.path:
-        sys.path.append(python_out_dir)
-        print(f"\nAdded {python_out_dir} to sys.path")
+    build_options = dict(cache_dir=cache_dir, reader=args.reader, dat_encoder=args.dat_encoder,
+                         engine=args.engine, workers=args.workers, dat_format=args.dat_format,
+                         chunk_rows=args.chunk_rows, bundle_compression=args.bundle_compression,
+                         bundle_path=os.path.abspath(args.bundle) if args.bundle else None,
+                         string_pool=args.string_pool, backend=args.backend,
+                         chunked_threshold=int(args.chunked_threshold * (1 << 20))
+                         if args.chunked_threshold is not None else None,
+                         chunked_memory=args.chunked_memory << 20, output_cache=output_cache,
+                         patch_base=os.path.abspath(args.patch_base) if args.patch_base else None,
+                         patch_dir=os.path.abspath(args.patch_dir or os.path.join(os.path.dirname(dat_dir), "patch")))
 
-    # 处理 Excel 目录
-    process_excel_directory(input_dir, proto_dir, dat_dir, python_out_dir, csharp_out_dir)
\ No newline at end of file
+    # 性能分析报告路径
+    profile_path = None
+    if args.profile is not None:
+        profile_path = os.path.abspath(args.profile or os.path.join(os.path.dirname(dat_dir), "profile.json"))
+
+    if not args.watch:
+        # 处理 Excel 目录
+        build_profiler = profiler.BuildProfiler(profile_path, args.profile_table) if profile_path else None
+        process_excel_directory(input_dir, proto_dir, dat_dir, python_out_dir, csharp_out_dir,
+                                full_rebuild=args.clean, build_profiler=build_profiler, **build_options)
+        if build_profiler is not None:
+            build_profiler.write_report()
+    else:
+        # 监视模式：表数据、表头、外键索引和执行器常驻内存
+        build_profiler = profiler.BuildProfiler(profile_path, args.profile_table) if profile_path else None
+        session = BuildSession(TableRegistry(input_dir, cache_dir, args.reader, build_profiler,
+                                             build_options["chunked_threshold"], output_cache),
+                               executor=create_executor(args.engine, args.workers))
+        process_excel_directory(input_dir, proto_dir, dat_dir, python_out_dir, csharp_out_dir,
+                                full_rebuild=args.clean, session=session, build_profiler=build_profiler,
+                                **build_options)
+        if build_profiler is not None:
+            build_profiler.write_report()
+
+        def rebuild(changed_files, removed_files):
+            start = time.perf_counter()
+            # 监视模式下每次重建覆盖写出一份报告
+            build_profiler = profiler.BuildProfiler(profile_path, args.profile_table) if profile_path else None
+            session.registry.profiler = build_profiler
+            try:
+                session.refresh(changed_files, removed_files)
+                process_excel_directory(input_dir, proto_dir, dat_dir, python_out_dir, csharp_out_dir,
+                                        session=session, build_profiler=build_profiler, **build_options)
+                if build_profiler is not None:
+                    build_profiler.write_report()
+            except Exception as e:
+                # 整次构建失败（如保留表名、清单写入失败）时只报告错误，继续监视，修正后下次变化重新构建
+                print(f"\nRebuild failed: {e}")
+                return
+            print(f"[Rebuilt in {time.perf_counter() - start:.2f}s]")
+
+        try:
+            watcher.watch(input_dir, rebuild, args.poll_interval)
+        finally:
+            session.executor.shutdown()
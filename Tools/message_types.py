@@ -0,0 +1,73 @@
+"""
+在进程内由表头 schema 构造 {Table} / {Table}Row 消息类（DescriptorPool + message_factory）。
+
+protobuf 编码方式用它代替 protoc 生成的 {Table}_pb2 模块：表验证完成后即可编码 .dat，
+不需要等 protoc 结束，也不需要把 Python 输出目录加入 sys.path 再导入模块。
+消息定义与 data_generator.generate_proto_file 写出的 .proto 一致（字段名、类型、编号相同），因此线格式相同。
+
+每次调用使用独立的 DescriptorPool：同名表在增量构建或 --watch 下可以多次以不同结构构造，多线程并发构造也互不影响。
+"""
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory, timestamp_pb2
+from string_pool import get_ref_field_name
+
+FieldDescriptorProto = descriptor_pb2.FieldDescriptorProto
+
+# 字段类型 -> (descriptor 类型, 消息类型名)
+DESCRIPTOR_TYPES = {
+    "int": (FieldDescriptorProto.TYPE_INT32, None),
+    "long": (FieldDescriptorProto.TYPE_INT64, None),
+    "float": (FieldDescriptorProto.TYPE_FLOAT, None),
+    "bool": (FieldDescriptorProto.TYPE_BOOL, None),
+    "string": (FieldDescriptorProto.TYPE_STRING, None),
+    "time": (FieldDescriptorProto.TYPE_MESSAGE, ".google.protobuf.Timestamp"),
+}
+
+TIMESTAMP_FILE_NAME = timestamp_pb2.DESCRIPTOR.name
+
+
+def build_file_descriptor(table_name, schema, string_pool=False):
+    """
+    构造与 {Table}.proto 等价的 FileDescriptorProto。
+
+    :param string_pool: 启用字符串池时 string 字段为 int32 {name}_ref
+    """
+    file_proto = descriptor_pb2.FileDescriptorProto(name=f"{table_name}.proto", syntax="proto3")
+    if any(field.field_type == "time" for field in schema.fields):
+        file_proto.dependency.append(TIMESTAMP_FILE_NAME)
+
+    row_proto = file_proto.message_type.add(name=f"{table_name}Row")
+    for field in schema.fields:
+        if string_pool and field.field_type == "string":
+            row_proto.field.add(name=get_ref_field_name(field.field_name), number=field.field_number,
+                                type=FieldDescriptorProto.TYPE_INT32, label=FieldDescriptorProto.LABEL_OPTIONAL)
+            continue
+        if field.field_type not in DESCRIPTOR_TYPES:
+            raise ValueError(f"Invalid field_type: {field.field_type}")
+        field_type, type_name = DESCRIPTOR_TYPES[field.field_type]
+        field_proto = row_proto.field.add(name=field.field_name, number=field.field_number, type=field_type,
+                                          label=FieldDescriptorProto.LABEL_OPTIONAL)
+        if type_name is not None:
+            field_proto.type_name = type_name
+
+    table_proto = file_proto.message_type.add(name=table_name)
+    table_proto.field.add(name="rows", number=1, type=FieldDescriptorProto.TYPE_MESSAGE,
+                          type_name=f".{table_name}Row", label=FieldDescriptorProto.LABEL_REPEATED)
+    return file_proto
+
+
+def get_message_classes(table_name, schema, string_pool=False):
+    """
+    :param schema: 该表的 TableSchema
+    :return: ({Table} 消息类, {Table}Row 消息类)
+    """
+    pool = descriptor_pool.DescriptorPool()
+    file_proto = build_file_descriptor(table_name, schema, string_pool)
+    if TIMESTAMP_FILE_NAME in file_proto.dependency:
+        timestamp_proto = descriptor_pb2.FileDescriptorProto()
+        timestamp_pb2.DESCRIPTOR.CopyToProto(timestamp_proto)
+        pool.Add(timestamp_proto)
+    pool.Add(file_proto)
+
+    table_class = message_factory.GetMessageClass(pool.FindMessageTypeByName(table_name))
+    row_class = message_factory.GetMessageClass(pool.FindMessageTypeByName(f"{table_name}Row"))
+    return table_class, row_class
@@ -0,0 +1,477 @@
+"""
+跨机器、跨分支共享的输出缓存（--output-cache）。
+
+相同的工作簿在每台开发机和 CI 上生成的 .proto/.schema.json/.dat/_pb2.py/.cs 完全相同。
+每张表的输出按以下内容的摘要作为键存入缓存目录，处理一张表之前先查缓存，命中时直接恢复全部输出，不再校验和编码：
+
+- 工作簿内容摘要，以及外键引用的各表的工作簿内容摘要（被引用表变化时校验结果可能不同）；
+- 工具版本号及工具源码摘要（不同分支的工具代码可能不同）、protoc 版本、pandas 版本；
+- 影响输出内容的构建选项（与构建清单相同），启用字符串池时还有本表字符串的池下标。
+
+工作簿的解析结果也存入同一目录（见 table_registry.py），键为工作簿内容摘要和读取方式：
+切换分支或在新的 CI 机器上构建时，未变化的工作簿不需要重新解析。
+共享目录可能被其他机器写入，解析结果按列存为 JSON（见 encode_table），读取时不执行任何代码；
+不使用 pickle（只有本机的解析缓存使用 pickle）。
+
+目录结构：
+- objects/ab/abcdef...：输出文件内容，以内容的 SHA-256 命名，不同条目中相同的文件只存一份；
+- entries/12/1234...json：条目，记录每种输出对应的对象，文件修改时间即最近使用时间（命中时更新）。
+
+缓存目录可以放在多台机器共享挂载的目录上：对象和条目都先写入带主机名、进程号的临时文件再原子替换，
+读者只会看到完整的文件；对象以内容命名，并发写入同一对象的结果相同。
+恢复时校验对象摘要，对象缺失或损坏视为未命中（照常构建），不会写出不完整的输出。
+
+总大小超过上限时按最近使用时间从旧到新删除条目，再删除不再被任何条目引用的对象。
+新写入或被复用的对象在 OBJECT_GRACE_SECONDS 内不会被删除，避免删掉另一台机器正在写入的条目引用的对象。
+"""
+import functools
+import hashlib
+import json
+import base64
+import datetime
+import os
+import socket
+import threading
+import time
+import numpy as np
+import pandas as pd
+import util
+
+# 缓存格式版本：目录结构或条目内容变化时修改
+CACHE_FORMAT = 2
+
+# 解析结果中按原始字节存储的 numpy 列类型（bool、整数、浮点、日期时间）
+RAW_DTYPE_KINDS = "biufmM"
+
+# 默认的缓存大小上限（MB）
+DEFAULT_MAX_SIZE_MB = 2048
+
+# 对象写入或被复用后至少保留的时长（秒）；同时容忍各机器之间的时钟偏差
+OBJECT_GRACE_SECONDS = 3600
+
+# 崩溃的写入者遗留的临时文件超过该时长（秒）后清理
+STALE_TEMP_SECONDS = 24 * 3600
+
+
+class OutputCache:
+    """
+    按内容寻址的表输出缓存，可在进程池子进程中使用（只保存路径和配置）。
+    """
+
+    def __init__(self, root, max_size=DEFAULT_MAX_SIZE_MB << 20, protoc_version=None):
+        """
+        :param root: 缓存目录
+        :param max_size: 缓存大小上限（字节）
+        :param protoc_version: protoc 的版本（见 code_generator.get_protoc_version），作为键的一部分
+        """
+        self.root = root
+        self.max_size = max_size
+        self.protoc_version = protoc_version
+
+    def get_key(self, table_name, content_hash, references, options, string_ids=None):
+        """
+        一张表输出的缓存键。
+
+        :param content_hash: 工作簿内容摘要
+        :param references: 外键引用的表名 -> 工作簿内容摘要（表不存在或读取失败时为 None）
+        :param options: 影响输出内容的构建选项
+        :param string_ids: 启用字符串池时本表字符串（按出现顺序）的池下标
+        """
+        content = {
+            "format": CACHE_FORMAT,
+            "tool_version": util.TOOL_VERSION,
+            "tool_hash": get_tool_hash(),
+            "protoc_version": self.protoc_version,
+            "pandas_version": pd.__version__,
+            "table": table_name,
+            "input_hash": content_hash,
+            "references": references,
+            "options": options,
+            "string_ids": string_ids,
+        }
+        return util.get_bytes_hash(json.dumps(content, sort_keys=True).encode('utf-8'))
+
+    def restore(self, key, output_files):
+        """
+        命中时把缓存的输出写到 output_files（内容未变化的文件保持不变）。
+        所有对象都读取并校验完成后才替换输出文件，未命中或缓存不可用时不改动任何输出。
+
+        :param output_files: 输出类型 -> 文件路径
+        :return: 是否命中
+        """
+        outputs = self._read_entry(key)
+        if outputs is None or set(outputs) != set(output_files):
+            return False
+
+        tmp_paths = {}
+        try:
+            for kind, file_path in output_files.items():
+                tmp_path = util.get_temp_path(file_path)
+                tmp_paths[kind] = tmp_path
+                if not self._copy_object(outputs[kind]["hash"], tmp_path):
+                    return False
+
+            for kind, file_path in output_files.items():
+                util.replace_file_if_changed(tmp_paths.pop(kind), file_path)
+            _touch(self._get_entry_path(key))
+            return True
+        except OSError:
+            return False
+        finally:
+            for tmp_path in tmp_paths.values():
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def store(self, key, output_files):
+        """
+        把一张表的输出写入缓存；有输出文件缺失时不写入。
+
+        :return: 是否写入了条目
+        """
+        outputs = {}
+        for kind, file_path in output_files.items():
+            if not os.path.exists(file_path):
+                return False
+            file_hash = util.get_file_hash(file_path)
+            self._put_object(file_path, file_hash)
+            outputs[kind] = {"hash": file_hash, "size": os.path.getsize(file_path)}
+
+        self._write_entry(key, outputs)
+        return True
+
+    def load_table(self, key):
+        """
+        读取共享的工作簿解析结果，未命中或缓存不可用时返回 None。
+
+        :param key: 见 get_table_key
+        """
+        outputs = self._read_entry(key)
+        if outputs is None or "table" not in outputs:
+            return None
+        try:
+            data = self._read_object(outputs["table"]["hash"])
+            df = decode_table(data) if data is not None else None
+        except (ValueError, KeyError, TypeError):
+            return None
+        if df is not None:
+            _touch(self._get_entry_path(key))
+        return df
+
+    def save_table(self, key, df):
+        """
+        写入工作簿解析结果；缓存不可用或包含无法编码的值时忽略（只影响下次构建的速度）。
+        """
+        try:
+            data = encode_table(df)
+        except TypeError:
+            return
+        file_hash = util.get_bytes_hash(data)
+        try:
+            object_path = self._get_object_path(file_hash)
+            if os.path.exists(object_path):
+                _touch(object_path)
+            else:
+                self._write_atomic(object_path, data)
+            self._write_entry(key, {"table": {"hash": file_hash, "size": len(data)}})
+        except OSError:
+            pass
+
+    def get_table_key(self, cache_key):
+        """
+        工作簿解析结果的键。
+
+        :param cache_key: 本地解析缓存的键（包含工作簿内容摘要、读取方式和 pandas 版本）
+        """
+        return util.get_bytes_hash(f"table:{CACHE_FORMAT}:{get_tool_hash()}:{cache_key}".encode('utf-8'))
+
+    def trim(self):
+        """
+        总大小超过上限时删除最久未使用的条目及不再被引用的对象；顺带清理遗留的临时文件。
+        其他机器可能同时清理，已被删除的文件直接跳过。
+
+        :return: (删除的条目数, 释放的字节数)
+        """
+        now = time.time()
+        entries = []  # (最近使用时间, 条目路径, 引用的对象摘要)
+        for file_path, stat in self._scan("entries"):
+            if file_path.endswith(".tmp"):
+                continue
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    hashes = [output["hash"] for output in json.load(f)["outputs"].values()]
+            except (OSError, ValueError, KeyError, TypeError):
+                # 损坏的条目视为最久未使用
+                hashes = []
+            entries.append((stat.st_mtime, file_path, hashes))
+
+        objects = {}  # 摘要 -> (路径, 大小, 修改时间)
+        for file_path, stat in self._scan("objects"):
+            if not file_path.endswith(".tmp"):
+                objects[os.path.basename(file_path)] = (file_path, stat.st_size, stat.st_mtime)
+
+        references = {}
+        for _, _, hashes in entries:
+            for file_hash in hashes:
+                references[file_hash] = references.get(file_hash, 0) + 1
+
+        freed = 0
+        total = 0
+        for file_hash, (file_path, size, mtime) in objects.items():
+            if file_hash not in references and now - mtime > OBJECT_GRACE_SECONDS:
+                freed += _remove(file_path, size)
+            else:
+                total += size
+
+        removed = 0
+        entries.sort(key=lambda entry: entry[0])
+        for _, entry_path, hashes in entries:
+            if total <= self.max_size:
+                break
+            _remove(entry_path)
+            removed += 1
+            for file_hash in hashes:
+                references[file_hash] -= 1
+                if references[file_hash] > 0 or file_hash not in objects:
+                    continue
+                file_path, size, mtime = objects.pop(file_hash)
+                if now - mtime > OBJECT_GRACE_SECONDS:
+                    freed += _remove(file_path, size)
+                    total -= size
+        return removed, freed
+
+    def _read_entry(self, key):
+        """
+        :return: 条目中的 输出类型 -> {"hash", "size"}，条目不存在或损坏时返回 None
+        """
+        try:
+            with open(self._get_entry_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)["outputs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_entry(self, key, outputs):
+        entry = {"format": CACHE_FORMAT, "outputs": outputs}
+        self._write_atomic(self._get_entry_path(key), json.dumps(entry, indent=2, sort_keys=True).encode('utf-8'))
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.root, "entries", key[:2], f"{key}.json")
+
+    def _get_object_path(self, file_hash):
+        return os.path.join(self.root, "objects", file_hash[:2], file_hash)
+
+    def _put_object(self, file_path, file_hash):
+        object_path = self._get_object_path(file_hash)
+        if os.path.exists(object_path):
+            # 已有相同内容：更新修改时间，避免在条目写入之前被其他机器清理
+            _touch(object_path)
+            return
+
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = _get_shared_temp_path(object_path)
+        try:
+            with open(file_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(1 << 20), b''):
+                    dst.write(chunk)
+            os.replace(tmp_path, object_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _read_object(self, file_hash):
+        """
+        读取对象并校验摘要；对象缺失或损坏时返回 None（损坏的对象被删除）。
+        """
+        object_path = self._get_object_path(file_hash)
+        try:
+            with open(object_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if util.get_bytes_hash(data) != file_hash:
+            _remove(object_path)
+            return None
+        return data
+
+    def _copy_object(self, file_hash, tmp_path):
+        """
+        把对象复制到 tmp_path 并校验摘要；对象缺失或损坏时返回 False（损坏的对象被删除）。
+        """
+        object_path = self._get_object_path(file_hash)
+        try:
+            src = open(object_path, 'rb')
+        except OSError:
+            return False
+
+        with src, open(tmp_path, 'wb') as dst:
+            hasher = hashlib.sha256()
+            for chunk in iter(lambda: src.read(1 << 20), b''):
+                hasher.update(chunk)
+                dst.write(chunk)
+        if hasher.hexdigest() != file_hash:
+            _remove(object_path)
+            return False
+        return True
+
+    def _write_atomic(self, file_path, data):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = _get_shared_temp_path(file_path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _scan(self, kind):
+        """
+        列出 objects/ 或 entries/ 下的文件：生成 (路径, os.stat_result)；超时的临时文件直接删除。
+        """
+        now = time.time()
+        base_dir = os.path.join(self.root, kind)
+        if not os.path.isdir(base_dir):
+            return
+        for shard in os.scandir(base_dir):
+            if not shard.is_dir():
+                continue
+            try:
+                files = list(os.scandir(shard.path))
+            except FileNotFoundError:
+                continue
+            for file in files:
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                if file.name.endswith(".tmp") and now - stat.st_mtime > STALE_TEMP_SECONDS:
+                    _remove(file.path)
+                    continue
+                yield file.path, stat
+
+
+@functools.lru_cache(maxsize=None)
+def get_tool_hash():
+    """
+    工具自身源码（本目录下所有 .py 文件）的摘要：切换分支后工具代码不同时不共享缓存。
+    """
+    tool_dir = os.path.dirname(os.path.abspath(__file__))
+    hasher = hashlib.sha256()
+    for file_name in sorted(os.listdir(tool_dir)):
+        if file_name.endswith(".py"):
+            hasher.update(file_name.encode('utf-8'))
+            hasher.update(util.get_file_hash(os.path.join(tool_dir, file_name)).encode('ascii'))
+    return hasher.hexdigest()
+
+
+def encode_table(df):
+    """
+    把解析得到的 DataFrame 编码为 JSON：bool/数值/日期时间列存原始字节，object 列逐个存值。
+    object 列中的值只能是 None、bool、int、float、str 以及日期时间，其他类型抛出 TypeError。
+    """
+    content = {
+        "columns": list(df.columns),
+        "index": _encode_index(df.index),
+        "data": [_encode_column(df.iloc[:, position].to_numpy()) for position in range(df.shape[1])],
+    }
+    return json.dumps(content, ensure_ascii=False, default=_encode_value).encode('utf-8')
+
+
+def decode_table(data):
+    """
+    encode_table 的逆操作；内容格式错误时抛出 ValueError/KeyError/TypeError。
+    """
+    content = json.loads(data.decode('utf-8'))
+    columns = [_decode_column(column) for column in content["data"]]
+    df = pd.DataFrame(dict(enumerate(columns)), index=_decode_index(content["index"]))
+    df.columns = content["columns"]
+    return df
+
+
+def _encode_index(index):
+    if isinstance(index, pd.RangeIndex):
+        return {"range": [index.start, index.stop, index.step]}
+    return {"values": _encode_column(index.to_numpy())}
+
+
+def _decode_index(index):
+    if "range" in index:
+        return pd.RangeIndex(*index["range"])
+    return pd.Index(_decode_column(index["values"]))
+
+
+def _encode_column(values):
+    if values.dtype.kind in RAW_DTYPE_KINDS:
+        return {"dtype": values.dtype.str, "raw": base64.b64encode(np.ascontiguousarray(values).tobytes()).decode('ascii')}
+    if values.dtype.kind != "O":
+        raise TypeError(f"Unsupported column dtype: {values.dtype}")
+    return {"dtype": "object", "values": values.tolist()}
+
+
+def _decode_column(column):
+    if column["dtype"] != "object":
+        dtype = np.dtype(column["dtype"])
+        if dtype.kind not in RAW_DTYPE_KINDS:
+            raise ValueError(f"Unsupported column dtype: {dtype}")
+        return np.frombuffer(base64.b64decode(column["raw"]), dtype=dtype).copy()
+    values = np.empty(len(column["values"]), dtype=object)
+    values[:] = [_decode_value(value) for value in column["values"]]
+    return values
+
+
+def _encode_value(value):
+    """
+    json.dumps 不能直接编码的值；单元格中不会出现 dict，用 dict 标记类型。
+    """
+    if isinstance(value, pd.Timestamp):
+        return {"timestamp": value.isoformat()}
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"time": value.isoformat()}
+    if isinstance(value, np.integer):
+        return {"int64": int(value)}
+    raise TypeError(f"Unsupported value type: {type(value).__name__}")
+
+
+def _decode_value(value):
+    if not isinstance(value, dict):
+        return value
+    (kind, text), = value.items()
+    if kind == "timestamp":
+        return pd.Timestamp(text)
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(text)
+    if kind == "date":
+        return datetime.date.fromisoformat(text)
+    if kind == "time":
+        return datetime.time.fromisoformat(text)
+    if kind == "int64":
+        return np.int64(text)
+    raise ValueError(f"Unknown value type: {kind}")
+
+
+def _get_shared_temp_path(file_path):
+    # 共享目录上多台机器的进程号可能相同，临时文件名中加入主机名
+    return f"{file_path}.{socket.gethostname()}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _touch(file_path):
+    try:
+        os.utime(file_path)
+    except OSError:
+        pass
+
+
+def _remove(file_path, size=0):
+    """
+    删除文件，已被删除时忽略。
+
+    :return: 实际删除时返回 size，否则返回 0
+    """
+    try:
+        os.remove(file_path)
+        return size
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,234 @@
+"""
+构建性能分析（--profile）。
+
+按表、按阶段记录墙钟时间、CPU 时间（当前线程）和内存峰值（tracemalloc），以及任务在执行器中的排队时间；
+protoc、打包等整批执行的阶段按构建记录。结果写为 JSON 报告，并打印最慢的表和阶段。
+
+线程池下 tracemalloc 的峰值是全进程的，多张表并发时会互相叠加；需要精确的单表内存峰值时使用
+--engine process 或 --workers 1。
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+REPORT_FORMAT = 1
+
+# 表级阶段，按流水线顺序
+TABLE_STAGES = ("read", "validate", "proto", "dat")
+
+# 打印摘要时列出的最慢的表数
+DEFAULT_TOP = 10
+
+
+class TableProfiler:
+    """
+    一张表在工作线程/进程中的各阶段耗时。
+    """
+
+    def __init__(self, submit_time=None):
+        self.stages = {}
+        self.queue_wait = max(0.0, time.time() - submit_time) if submit_time is not None else None
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base_memory = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            record = {
+                "wall": time.perf_counter() - wall_start,
+                "cpu": time.thread_time() - cpu_start,
+            }
+            if tracing:
+                record["peak_memory"] = max(0, tracemalloc.get_traced_memory()[1] - base_memory)
+            previous = self.stages.get(name)
+            if previous is not None:
+                # 分块模式下同一阶段按批多次记录：耗时累加，内存峰值取最大
+                record["wall"] += previous["wall"]
+                record["cpu"] += previous["cpu"]
+                if "peak_memory" in previous:
+                    record["peak_memory"] = max(record.get("peak_memory", 0), previous["peak_memory"])
+            self.stages[name] = record
+
+    def to_dict(self):
+        return {"stages": self.stages, "queue_wait": self.queue_wait}
+
+
+class BuildProfiler:
+    """
+    汇总一次构建中所有表和整批阶段的分析结果。
+    """
+
+    def __init__(self, report_path, profile_table=None):
+        """
+        :param report_path: JSON 报告路径
+        :param profile_table: 需要记录 cProfile 的表名
+        """
+        self.report_path = report_path
+        self.profile_table = profile_table
+        self.tables = {}        # 表名 -> {"stages": {...}, "queue_wait": 秒}
+        self.build_stages = {}  # 阶段名 -> {"wall", "cpu"}
+        self.critical_path = []  # scheduler.PipelineScheduler.get_critical_path() 的结果
+        self.start_time = time.perf_counter()
+        start_memory_tracking()
+
+    def get_table(self, table_name):
+        return self.tables.setdefault(table_name, {"stages": {}, "queue_wait": None})
+
+    @contextmanager
+    def table_stage(self, table_name, name):
+        """
+        在主线程中记录一张表的阶段（如读取工作簿）。
+        """
+        table_profiler = TableProfiler()
+        with table_profiler.stage(name):
+            yield
+        self.get_table(table_name)["stages"].update(table_profiler.stages)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        记录整批执行的阶段（如 protoc、打包）。
+        """
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            record = self.build_stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            record["wall"] += time.perf_counter() - wall_start
+            record["cpu"] += time.process_time() - cpu_start
+
+    def add_table_result(self, table_name, profile):
+        """
+        合并工作线程/进程返回的 TableProfiler.to_dict()。
+        """
+        if not profile:
+            return
+        table = self.get_table(table_name)
+        table["stages"].update(profile["stages"])
+        table["queue_wait"] = profile["queue_wait"]
+
+    def get_cprofile_path(self, table_name):
+        """
+        需要记录 cProfile 的表返回 .prof 文件路径，其余表返回 None。
+        """
+        if table_name != self.profile_table:
+            return None
+        return f"{os.path.splitext(self.report_path)[0]}.{table_name}.prof"
+
+    def build_report(self):
+        tables = {}
+        for table_name, table in self.tables.items():
+            tables[table_name] = {
+                "stages": table["stages"],
+                "queue_wait": table["queue_wait"],
+                "wall": sum(stage["wall"] for stage in table["stages"].values()),
+                "cpu": sum(stage["cpu"] for stage in table["stages"].values()),
+                "peak_memory": max((stage.get("peak_memory", 0) for stage in table["stages"].values()), default=0),
+            }
+
+        stage_totals = {}
+        for table in tables.values():
+            for name, stage in table["stages"].items():
+                total = stage_totals.setdefault(name, {"wall": 0.0, "cpu": 0.0, "peak_memory": 0})
+                total["wall"] += stage["wall"]
+                total["cpu"] += stage["cpu"]
+                total["peak_memory"] = max(total["peak_memory"], stage.get("peak_memory", 0))
+
+        return {
+            "format": REPORT_FORMAT,
+            "build_wall": time.perf_counter() - self.start_time,
+            "tables": tables,
+            "table_stage_totals": stage_totals,
+            "build_stages": self.build_stages,
+            "critical_path": self.critical_path,
+            "cprofile": self.get_cprofile_path(self.profile_table) if self.profile_table else None,
+        }
+
+    def write_report(self, top=DEFAULT_TOP):
+        """
+        写出 JSON 报告并打印摘要。
+        """
+        report = self.build_report()
+        os.makedirs(os.path.dirname(os.path.abspath(self.report_path)), exist_ok=True)
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print_summary(report, top)
+        print(f"\nProfile report written to {self.report_path}")
+
+        cprofile_path = report["cprofile"]
+        if cprofile_path and os.path.exists(cprofile_path):
+            print(f"\ncProfile for table {self.profile_table} ({cprofile_path}):")
+            print(format_cprofile(cprofile_path))
+        elif self.profile_table:
+            print(f"\nTable {self.profile_table} was not processed in this build; no cProfile output.")
+        return report
+
+
+def start_memory_tracking():
+    """
+    开启 tracemalloc（进程池的子进程中各自开启一次）。
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+@contextmanager
+def capture_cprofile(path):
+    """
+    path 不为 None 时用 cProfile 记录代码块，并写出 .prof 文件。
+    """
+    if path is None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+
+def format_cprofile(path, limit=25):
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+def print_summary(report, top=DEFAULT_TOP):
+    print(f"\nProfile (build wall time {report['build_wall']:.2f}s)")
+
+    print(f"\nSlowest tables:")
+    header = f"  {'table':<32}{'wall':>10}{'cpu':>10}{'queue':>10}{'peak MB':>10}"
+    for stage in TABLE_STAGES:
+        header += f"{stage:>10}"
+    print(header)
+    tables = sorted(report["tables"].items(), key=lambda item: item[1]["wall"], reverse=True)
+    for table_name, table in tables[:top]:
+        queue_wait = table["queue_wait"]
+        line = f"  {table_name:<32}{table['wall']:>9.3f}s{table['cpu']:>9.3f}s" \
+               f"{(f'{queue_wait:.3f}s' if queue_wait is not None else '-'):>10}" \
+               f"{table['peak_memory'] / (1 << 20):>10.1f}"
+        for stage in TABLE_STAGES:
+            wall = table["stages"].get(stage, {}).get("wall")
+            line += f"{(f'{wall:.3f}s' if wall is not None else '-'):>10}"
+        print(line)
+
+    print(f"\nStages:")
+    stages = [(name, total, "all tables") for name, total in report["table_stage_totals"].items()]
+    stages += [(name, total, "build") for name, total in report["build_stages"].items()]
+    for name, total, scope in sorted(stages, key=lambda item: item[1]["wall"], reverse=True):
+        print(f"  {name:<16}{total['wall']:>9.3f}s wall {total['cpu']:>9.3f}s cpu  ({scope})")
@@ -0,0 +1,219 @@
+"""
+按外键依赖图调度的构建流水线。
+
+原先的流程先读取全部工作簿，再开始任何校验和生成：读取（磁盘 I/O 与 openpyxl 解析）和校验、编码不会重叠，
+一个很慢的工作簿会拖住所有表。这里工作簿按大小从大到小在读取线程池中并行读取，每张表读取完成后
+从表头的外键约束得到它引用的表，这些表也都读取完成时立即提交 validate → proto → dat，其余工作簿继续读取。
+
+一张表就绪（可以开始处理）的条件：
+- 自身已读取（读取失败的表不处理，由 TableRegistry.errors 报告；表头约束格式错误的表照常处理，由处理任务报告失败）；
+- 外键引用的表都已读取（引用不存在的表不等待，由校验报告错误）；
+- ordered 为 True（启用字符串池）时，表名排在它之前的表都已就绪：字符串按表名顺序登记，下标与读取、完成顺序无关。
+
+同时就绪的表按工作簿大小从大到小提交处理（ordered 模式下按表名顺序），增量构建或全部命中解析缓存、
+不需要读取时同样由大表先开始。
+
+构建结束后从最后完成的表向前追溯关键路径：处理前的排队、决定其就绪时间的那次读取（自身或最晚读完的被引用表），
+ordered 模式下也可能是排在前面的表。
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import util
+from table_registry import get_table_name
+
+# 关键路径中短于此时长（秒）的片段不打印
+MIN_SEGMENT_SECONDS = 0.0005
+
+
+class PipelineScheduler:
+    """
+    一次构建的表级调度：读取、依赖跟踪、提交处理任务以及各表的时间线。
+    """
+
+    def __init__(self, registry, excel_files, read_workers=None, ordered=False):
+        """
+        :param registry: 本次构建的 TableRegistry，已加载（或已记录读取失败）的表不再读取
+        :param excel_files: 本次构建的全部工作簿
+        :param read_workers: 读取线程数，默认为 CPU 核数
+        :param ordered: 为 True 时按表名顺序就绪
+        """
+        self.registry = registry
+        self.excel_files = excel_files
+        self.read_workers = read_workers or os.cpu_count()
+        self.ordered = ordered
+        self.table_names = sorted(get_table_name(file) for file in excel_files)
+        self.file_sizes = {get_table_name(file): _get_file_size(file) for file in excel_files}
+        self.references = {}  # 表名 -> 需要等待的被引用表
+        self.timings = {}     # 表名 -> {"read_start", "read_end", "ready", "submit", "start", "end"}（time.time()）
+        self.ready_causes = {}  # 表名 -> ("read", 表名) 或 ("order", 前一张表)
+        self.start_time = None
+        self.read_count = 0  # 本次构建读取的工作簿数
+        self._lock = threading.Lock()
+
+    def run(self, on_loaded, on_ready, on_result):
+        """
+        执行到所有表处理完成。回调都在调用 run 的线程中执行。
+
+        :param on_loaded: on_loaded(table_name)，一张表读取成功后调用
+        :param on_ready: on_ready(table_name)，表就绪时调用，返回处理任务的 Future，不需要处理时返回 None
+        :param on_result: on_result(table_name, future)，处理任务完成后调用
+        """
+        self.start_time = time.time()
+        registry = self.registry
+        loaded = {table_name for table_name in self.table_names
+                  if table_name in registry.tables or table_name in registry.errors}
+        for table_name in loaded:
+            self._add_references(table_name)
+
+        read_files = [file for file in self.excel_files if get_table_name(file) not in loaded]
+        read_files.sort(key=lambda file: self.file_sizes[get_table_name(file)], reverse=True)
+        self.read_count = len(read_files)
+
+        futures = {}  # Future -> ("read" | "process", 表名)
+        resolved = set()
+        read_executor = ThreadPoolExecutor(max_workers=self.read_workers) if read_files else None
+        try:
+            for file in read_files:
+                futures[read_executor.submit(self._read, file)] = ("read", get_table_name(file))
+
+            futures.update(self._resolve(loaded, resolved, on_ready))
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, table_name = futures.pop(future)
+                    if kind == "read":
+                        loaded.add(table_name)
+                        self._add_references(table_name)
+                        if table_name in registry.tables:
+                            on_loaded(table_name)
+                    else:
+                        self._record_process_end(table_name, future)
+                        on_result(table_name, future)
+                futures.update(self._resolve(loaded, resolved, on_ready))
+        finally:
+            if read_executor is not None:
+                read_executor.shutdown()
+
+    def _read(self, file_path):
+        table_name = get_table_name(file_path)
+        timing = self._get_timing(table_name)
+        timing["read_start"] = time.time()
+        try:
+            self.registry.try_load(file_path)
+        finally:
+            timing["read_end"] = time.time()
+
+    def _add_references(self, table_name):
+        df = self.registry.tables.get(table_name)
+        try:
+            references = util.get_referenced_tables(df.columns) if df is not None else set()
+        except ValueError as e:
+            # 表头约束格式错误：不等待任何表，由处理任务解析表头时报告失败，其余表照常构建
+            self.registry.errors[table_name] = e
+            references = set()
+        self.references[table_name] = sorted(references & set(self.table_names) - {table_name})
+
+    def _resolve(self, loaded, resolved, on_ready):
+        """
+        对新就绪的表调用 on_ready，返回提交的处理任务。
+        """
+        ready = []
+        previous = None
+        for table_name in self.table_names:
+            if table_name in resolved:
+                previous = table_name
+                continue
+            waiting = table_name not in loaded or any(reference not in loaded
+                                                      for reference in self.references[table_name])
+            if waiting:
+                if self.ordered:
+                    break
+                continue
+
+            resolved.add(table_name)
+            timing = self._get_timing(table_name)
+            timing["ready"] = time.time()
+            self.ready_causes[table_name] = self._get_ready_cause(table_name, previous)
+            previous = table_name
+            ready.append(table_name)
+
+        if not self.ordered:
+            ready.sort(key=lambda table_name: self.file_sizes[table_name], reverse=True)
+
+        futures = {}
+        for table_name in ready:
+            # 读取失败的表不处理
+            if table_name not in self.registry.tables:
+                continue
+            future = on_ready(table_name)
+            if future is not None:
+                self._get_timing(table_name)["submit"] = time.time()
+                futures[future] = ("process", table_name)
+        return futures
+
+    def _get_ready_cause(self, table_name, previous):
+        # 就绪时间由最晚完成的前驱决定：自身或被引用表的读取，ordered 模式下还有前一张表
+        candidates = [(self.timings.get(name, {}).get("read_end", self.start_time), ("read", name))
+                      for name in [table_name] + self.references[table_name]]
+        if self.ordered and previous is not None:
+            candidates.append((self.timings[previous]["ready"], ("order", previous)))
+        return max(candidates, key=lambda candidate: candidate[0])[1]
+
+    def _record_process_end(self, table_name, future):
+        timing = self._get_timing(table_name)
+        timing["end"] = time.time()
+        try:
+            result_timing = future.result().get("timing") or {}
+        except Exception:
+            result_timing = {}
+        timing["start"] = result_timing.get("start", timing["submit"])
+        timing["end"] = result_timing.get("end", timing["end"])
+
+    def _get_timing(self, table_name):
+        with self._lock:
+            return self.timings.setdefault(table_name, {})
+
+    def get_critical_path(self):
+        """
+        从最后完成的表向前追溯的关键路径。
+
+        :return: [{"kind": "read" | "queue" | "process", "table", "start", "end"}, ...]，时间为相对构建开始的秒数
+        """
+        processed = [table_name for table_name, timing in self.timings.items() if "end" in timing]
+        if not processed:
+            return []
+        last = max(processed, key=lambda table_name: self.timings[table_name]["end"])
+        timing = self.timings[last]
+        segments = [
+            self._segment("process", last, timing["start"], timing["end"]),
+            self._segment("queue", last, timing["ready"], timing["start"]),
+        ]
+
+        cause = self.ready_causes[last]
+        while cause[0] == "order":
+            cause = self.ready_causes[cause[1]]
+        read_timing = self.timings.get(cause[1], {})
+        if "read_start" in read_timing:
+            segments.append(self._segment("read", cause[1], read_timing["read_start"], read_timing["read_end"]))
+            segments.append(self._segment("queue", cause[1], self.start_time, read_timing["read_start"]))
+        return [segment for segment in reversed(segments) if segment["end"] - segment["start"] >= MIN_SEGMENT_SECONDS]
+
+    def _segment(self, kind, table_name, start, end):
+        return {"kind": kind, "table": table_name, "start": start - self.start_time, "end": end - self.start_time}
+
+
+def _get_file_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def format_critical_path(segments):
+    if not segments:
+        return "Critical path: no tables processed"
+    steps = " -> ".join(f"{segment['kind']} {segment['table']} {segment['end'] - segment['start']:.2f}s"
+                        for segment in segments)
+    return f"Critical path {segments[-1]['end']:.2f}s: {steps}"
@@ -0,0 +1,259 @@
+import util
+
+# 表头字段类型 -> Protobuf 类型
+PROTO_TYPES = {
+    "int": "int32",
+    "long": "int64",
+    "float": "float",
+    "string": "string",
+    "bool": "bool",
+    "time": "google.protobuf.Timestamp"
+}
+
+SUPPORTED_TYPES = set(PROTO_TYPES.keys())
+NUMERIC_TYPES = {"int", "long", "float"}
+
+# Index(unique|multi)：unique 为一对一索引（值不可重复），multi 为一对多索引
+INDEX_KINDS = ("unique", "multi")
+INDEXABLE_TYPES = {"int", "long", "string", "bool"}
+
+# Backend(protobuf|soa)：表的 .dat 输出格式，protobuf 为 Protobuf 消息；soa 为定长列存（见 soa_dat.py）
+BACKENDS = ("protobuf", "soa")
+
+
+class ForeignKey:
+    """
+    外键约束：字段值必须出现在 table_name 表的 field_name 字段中。
+    column 为目标字段的完整表头，resolve 之后才有值。
+    """
+    __slots__ = ("table_name", "field_name", "column")
+
+    def __init__(self, table_name, field_name):
+        self.table_name = table_name
+        self.field_name = field_name
+        self.column = None
+
+    def __repr__(self):
+        return f"ForeignKey({self.field_name}({self.table_name}))"
+
+
+class FieldSchema:
+    """
+    单个字段（列）的解析结果，由表头 name|type^Constraint(...)|null 解析而来。
+    """
+    __slots__ = ("column", "index", "field_name", "field_type", "proto_type", "nullable",
+                 "range_min", "range_max", "foreign_keys", "constraints", "index_kind")
+
+    def __init__(self, column, index, field_name, field_type, nullable, constraints):
+        self.column = column
+        self.index = index
+        self.field_name = field_name
+        self.field_type = field_type
+        self.proto_type = PROTO_TYPES.get(field_type)
+        self.nullable = nullable
+        self.constraints = constraints or {}
+        self.range_min = None
+        self.range_max = None  # None 表示无上限（'!'）
+        self.foreign_keys = []
+        self.index_kind = None  # Index 约束：None、"unique" 或 "multi"
+
+    @property
+    def field_number(self):
+        return self.index + 1
+
+    @property
+    def has_range(self):
+        return self.range_min is not None
+
+    def __repr__(self):
+        return f"FieldSchema({self.column!r})"
+
+
+class TableSchema:
+    """
+    一张表的表头解析结果：每张表只解析一次，供校验、.proto、.dat 各阶段共用。
+    """
+    __slots__ = ("table_name", "columns", "fields", "field_by_name", "backend", "priority")
+
+    def __init__(self, table_name, fields, backend=None, priority=None):
+        self.table_name = table_name
+        self.fields = fields
+        self.columns = [field.column for field in fields]
+        self.field_by_name = {field.field_name: field for field in fields}
+        self.backend = backend  # 表头中的 Backend 约束，None 表示使用命令行指定的默认值
+        self.priority = priority  # 表头中的 Priority 约束，None 表示使用 generate_config_cs.py 指定的默认值
+
+    @property
+    def references(self):
+        """
+        外键引用的表名集合。
+        """
+        return {fk.table_name for field in self.fields for fk in field.foreign_keys}
+
+    @property
+    def indexed_fields(self):
+        """
+        声明了 Index 约束的字段。
+        """
+        return [field for field in self.fields if field.index_kind is not None]
+
+    @property
+    def has_time(self):
+        return any(field.field_type == "time" for field in self.fields)
+
+    def get_field(self, field_name):
+        return self.field_by_name.get(field_name)
+
+    def resolve_foreign_keys(self, schemas):
+        """
+        根据目标表的 schema 解析外键的目标列。
+
+        :param schemas: 表名 -> TableSchema
+        """
+        for field in self.fields:
+            for fk in field.foreign_keys:
+                target = schemas.get(fk.table_name)
+                if target is None:
+                    raise ValueError(f"Invalid constraint defined in: {field.column}. Table '{fk.table_name}' is not found.")
+                target_field = target.get_field(fk.field_name)
+                if target_field is None:
+                    raise ValueError(f"Invalid constraint defined in: {field.column}. {fk.field_name} not found in {fk.table_name}")
+                fk.column = target_field.column
+
+    def __repr__(self):
+        return f"TableSchema({self.table_name!r}, {self.columns!r})"
+
+
+def build_table_schema(table_name, columns):
+    """
+    解析并检查整张表的表头，支持以下形式：
+    name|type^optional_field_ref(table)|optional_null
+
+    约束可以有多个，以 ^ 分隔：field(Table) 外键、Range(min,max) 数值范围、Index(unique|multi) 二级索引、
+    Backend(protobuf|soa) 整张表的 .dat 格式、Priority(n) 整张表在客户端的加载优先级（写在任意一列上，每张表最多一个）。
+
+    外键目标是否存在需要其他表的 schema，由 TableSchema.resolve_foreign_keys 检查。
+
+    :param table_name: 表名
+    :param columns: 表头列表
+    :return: TableSchema
+    """
+    fields = []
+    seen_fields = set()  # 用于检查字段重复
+    backend = None
+    priority = None
+
+    for index, column in enumerate(columns):
+        column = str(column)
+        components = util.get_field_components(column)
+
+        field_name = components.get("field_name")
+        field_type = components.get("field_type")
+        constraints = components.get("constraints")
+        nullable_flag = components.get("nullable_flag")
+
+        # 检查字段名+类型
+        if field_name == None or field_type == None:
+            raise ValueError(f"Invalid header format in column {index}: '{column}' (expected format: name|type^optional_field_ref(table)|optional_null)")
+
+        # 检查字段类型是否合法
+        if field_type not in SUPPORTED_TYPES:
+            raise ValueError(f"Unsupported type in column {index}: '{field_type}'")
+
+        # 检查字段名是否重复
+        if field_name in seen_fields:
+            raise ValueError(f"Duplicate field name '{field_name}' in column {index}")
+
+        # 检查空标记
+        if nullable_flag != None and nullable_flag.lower() != "null":
+            raise ValueError(f"Invalid null flag in column {index}: '{nullable_flag}' (expected 'null' or 'NULL')")
+
+        field = FieldSchema(column, index, field_name, field_type, nullable_flag != None, constraints)
+
+        for field_ref, table_name_ref in field.constraints.items():
+            if field_ref == "Range": # 数值范围
+                field.range_min, field.range_max = _parse_range(column, field_type, table_name_ref)
+            elif field_ref == "Index": # 二级索引
+                field.index_kind = _parse_index(column, field_type, table_name_ref)
+            elif field_ref == "Backend": # 表的输出格式
+                if backend is not None:
+                    raise ValueError(f"Invalid constraint defined in: {column}. 'Backend' can only be defined once per table.")
+                backend = _parse_backend(column, table_name_ref)
+            elif field_ref == "Priority": # 表的加载优先级
+                if priority is not None:
+                    raise ValueError(f"Invalid constraint defined in: {column}. 'Priority' can only be defined once per table.")
+                priority = _parse_priority(column, table_name_ref)
+            else: # 字段链接
+                field.foreign_keys.append(ForeignKey(table_name_ref, field_ref))
+
+        fields.append(field)
+        seen_fields.add(field_name)
+
+    return TableSchema(table_name, fields, backend, priority)
+
+
+def _parse_backend(column, definition):
+    """
+    解析 Backend(protobuf) / Backend(soa)。
+    """
+    if definition not in BACKENDS:
+        raise ValueError(f"Invalid 'Backend' definition in: {column}. (expected one of {BACKENDS})")
+    return definition
+
+
+def _parse_priority(column, definition):
+    """
+    解析 Priority(n)，n 为非负整数。
+    """
+    try:
+        priority = int(definition)
+    except ValueError:
+        priority = -1
+    if priority < 0:
+        raise ValueError(f"Invalid 'Priority' definition in: {column}. (expected a non-negative integer)")
+    return priority
+
+
+def _parse_index(column, field_type, definition):
+    """
+    解析 Index(unique) / Index(multi)。
+    """
+    if definition not in INDEX_KINDS:
+        raise ValueError(f"Invalid 'Index' definition in: {column}. (expected 'Index(unique)' or 'Index(multi)')")
+    if field_type not in INDEXABLE_TYPES:
+        raise ValueError(f"Invalid constraint defined in: {column}. 'Index' cannot be applied to '{field_type}'.")
+    return definition
+
+
+def _parse_range(column, field_type, definition):
+    """
+    解析 Range(min,max)：整数字段按 int 解析，浮点字段按 float 解析；max 为 '!' 表示无上限。
+    """
+    if field_type not in NUMERIC_TYPES:
+        raise ValueError(f"Invalid constraint defined in: {column}. 'Range' can only be applied to numbers.")
+
+    range_components = definition.split(',')
+    if len(range_components) != 2:
+        raise ValueError(f"Invalid 'Range' definition in: {column}.")
+
+    range_min = range_components[0].strip()
+    range_max = range_components[1].strip()
+    parse = float if field_type == "float" else int
+
+    try:
+        range_min = parse(range_min)
+    except Exception as e:
+        raise ValueError(f"Invalid 'Range' min definition in: {column}. Exception: {e}")
+
+    if range_max == "!":
+        return range_min, None
+
+    try:
+        range_max = parse(range_max)
+    except Exception as e:
+        raise ValueError(f"Invalid 'Range' max definition in: {column}. Exception: {e}")
+
+    if range_min >= range_max:
+        raise ValueError(f"Invalid 'Range' definition in: {column}.")
+
+    return range_min, range_max
@@ -0,0 +1,255 @@
+"""
+定长列存 .dat 格式（Backend(soa) / --backend soa）。
+
+Protobuf 格式在加载时需要逐行解码 varint 并为每一行创建对象；列存格式把每个字段写成一段定长数组，
+运行时内存映射文件后按 (列, 行) 直接读取，不需要解析，也不会为每一行分配对象，适合以数值为主、只读的表。
+
+文件布局（整数均为小端，各段按 8 字节对齐）：
+
+    header       magic "XSOA" | u32 version | u32 row_count | u32 column_count | u32 key_field_number
+                 | u32 key_count | u64 key_table_offset | u64 string_heap_offset | u64 string_heap_size
+    column table column_count × (u32 field_number | u8 type | u8 flags | u16 保留 | u64 data_offset | u64 null_offset)
+    columns      int: i32[row_count]  long: i64  float: f32  bool: u8  time: i64（UTC 秒）
+                 string: row_count × (u32 offset, u32 length)，指向字符串堆
+    null bitmaps 可空字段的 ceil(row_count / 8) 字节位图，第 i 位为 1 表示第 i 行有值；不可空字段 null_offset 为 0
+    key table    i64 keys[key_count]（升序）| u32 rows[key_count]
+    string heap  UTF-8 字符串，相同的字符串只存一份
+
+取值规则与 Protobuf .dat 一致（空值为 0、空字符串，time 为 MIN_TIMESTAMP_SECONDS），另外用位图区分空值。
+主键为名为 id 的 int/long 字段；id 重复时索引指向最后一行。
+"""
+import mmap
+import struct
+import numpy as np
+import pandas as pd
+import dat_encoder
+import indexed_dat
+from schema import build_table_schema
+
+MAGIC = b"XSOA"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sIIIIIQQQ")
+COLUMN_ENTRY = struct.Struct("<IBBHQQ")
+
+# 字段类型 -> (类型编号, 每行字节数, NumPy 类型)
+COLUMN_TYPES = {
+    "int": (1, 4, "<i4"),
+    "long": (2, 8, "<i8"),
+    "float": (3, 4, "<f4"),
+    "bool": (4, 1, "u1"),
+    "time": (5, 8, "<i8"),
+    "string": (6, 8, "<u4"),
+}
+
+FLAG_NULLABLE = 1
+
+ALIGNMENT = 8
+
+
+def encode_soa_table(df: pd.DataFrame, schema=None):
+    """
+    把整张表编码为列存格式。
+
+    :param df: 表数据，列名为表头
+    :param schema: 该表的 TableSchema，不传时从表头解析
+    :return: bytes
+    """
+    if schema is None:
+        schema = build_table_schema(None, df.columns)
+
+    row_count = len(df)
+    heap = _StringHeap()
+    columns = []  # (FieldSchema, 列数据字节, 位图字节或 None)
+    key_values = None
+    for field, values, nulls in dat_encoder.iter_column_values(df, schema):
+        if field.field_type == "string":
+            data = heap.add_all(values)
+        else:
+            data = np.ascontiguousarray(values, dtype=COLUMN_TYPES[field.field_type][2])
+        bitmap = np.packbits(~nulls, bitorder="little").tobytes() if field.nullable else None
+        columns.append((field, data.tobytes(), bitmap))
+
+        if field.field_name == indexed_dat.KEY_FIELD_NAME and field.field_type in dat_encoder.INT_RANGES:
+            key_values = values
+
+    key_field = schema.get_field(indexed_dat.KEY_FIELD_NAME) if key_values is not None else None
+    keys, rows = _build_key_table(key_values)
+
+    # 依次排列 header、列表、各列数据、位图、主键表，最后是字符串堆
+    sections = []
+    offset = _align(HEADER.size + COLUMN_ENTRY.size * len(columns))
+
+    def place(data):
+        nonlocal offset
+        position = offset
+        sections.append((position, data))
+        offset = _align(position + len(data))
+        return position
+
+    entries = []
+    for field, data, bitmap in columns:
+        data_offset = place(data)
+        null_offset = place(bitmap) if bitmap is not None else 0
+        type_code = COLUMN_TYPES[field.field_type][0]
+        flags = FLAG_NULLABLE if field.nullable else 0
+        entries.append(COLUMN_ENTRY.pack(field.field_number, type_code, flags, 0, data_offset, null_offset))
+
+    key_table_offset = place(keys.tobytes() + rows.tobytes())
+    heap_data = heap.tobytes()
+    heap_offset = place(heap_data)
+
+    buffer = bytearray(offset)
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, row_count, len(columns),
+                     key_field.field_number if key_field is not None else 0, len(keys),
+                     key_table_offset, heap_offset, len(heap_data))
+    buffer[HEADER.size:HEADER.size + len(entries) * COLUMN_ENTRY.size] = b"".join(entries)
+    for position, data in sections:
+        buffer[position:position + len(data)] = data
+    return bytes(buffer)
+
+
+def _build_key_table(values):
+    if values is None:
+        return np.zeros(0, dtype="<i8"), np.zeros(0, dtype="<u4")
+
+    # 稳定排序后每组相同 key 只保留最后一行，与 indexed 格式一致
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    last = np.append(sorted_values[1:] != sorted_values[:-1], True) if len(order) else np.zeros(0, dtype=bool)
+    order = order[last]
+    return values[order].astype("<i8"), order.astype("<u4")
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _StringHeap:
+    """
+    去重的 UTF-8 字符串堆。
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.offsets = {}  # 字符串 -> (偏移, 字节数)
+
+    def add_all(self, texts):
+        """
+        :return: 每行 (u32 偏移, u32 字节数) 组成的数组
+        """
+        spans = np.zeros((len(texts), 2), dtype="<u4")
+        for position, text in enumerate(texts):
+            span = self.offsets.get(text)
+            if span is None:
+                encoded = text.encode("utf-8")
+                span = (self.size, len(encoded))
+                self.offsets[text] = span
+                self.parts.append(encoded)
+                self.size += len(encoded)
+            spans[position] = span
+        if self.size >= 1 << 32:
+            raise ValueError("String heap exceeds 4 GB")
+        return spans
+
+    def tobytes(self):
+        return b"".join(self.parts)
+
+
+class SoaDatReader:
+    """
+    列存 .dat 的读取器：内存映射文件，各列以 NumPy 数组的形式直接引用映射内存（不复制）。
+
+    列按字段编号（表头中的列序号 + 1）访问。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"Invalid soa .dat file: {path}")
+
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        data = self._data
+        if len(data) < HEADER.size:
+            raise ValueError(f"Invalid soa .dat file: {self.path}")
+        magic, version, self.row_count, column_count, self.key_field_number, key_count, key_table_offset, \
+            heap_offset, heap_size = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Invalid soa .dat file: {self.path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported soa .dat version {version} in {self.path}")
+
+        type_names = {type_code: name for name, (type_code, _, _) in COLUMN_TYPES.items()}
+        self.columns = {}  # 字段编号 -> (类型名, 列数组, 位图数组或 None)
+        for index in range(column_count):
+            field_number, type_code, flags, _, data_offset, null_offset = \
+                COLUMN_ENTRY.unpack_from(data, HEADER.size + index * COLUMN_ENTRY.size)
+            type_name = type_names[type_code]
+            dtype = COLUMN_TYPES[type_name][2]
+            count = self.row_count * 2 if type_name == "string" else self.row_count
+            values = np.frombuffer(data, dtype=dtype, count=count, offset=data_offset)
+            if type_name == "string":
+                values = values.reshape(self.row_count, 2)
+            nulls = None
+            if flags & FLAG_NULLABLE:
+                nulls = np.frombuffer(data, dtype=np.uint8, count=(self.row_count + 7) // 8, offset=null_offset)
+            self.columns[field_number] = (type_name, values, nulls)
+
+        self.keys = np.frombuffer(data, dtype="<i8", count=key_count, offset=key_table_offset)
+        self.key_rows = np.frombuffer(data, dtype="<u4", count=key_count, offset=key_table_offset + 8 * key_count)
+        self._heap_offset = heap_offset
+
+    def close(self):
+        # frombuffer 得到的数组引用着映射内存，需先释放
+        self.columns = None
+        self.keys = None
+        self.key_rows = None
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.row_count
+
+    def column(self, field_number):
+        """
+        返回一列的数组（不复制）；string 列为每行 (偏移, 字节数)，用 get_string 读取。
+        """
+        return self.columns[field_number][1]
+
+    def get_string(self, field_number, row):
+        offset, length = self.columns[field_number][1][row]
+        start = self._heap_offset + int(offset)
+        return self._data[start:start + int(length)].decode("utf-8")
+
+    def is_null(self, field_number, row):
+        nulls = self.columns[field_number][2]
+        if nulls is None:
+            return False
+        return not (nulls[row >> 3] >> (row & 7)) & 1
+
+    def find_row(self, key):
+        """
+        按主键返回行号；不存在时返回 -1。
+        """
+        position = np.searchsorted(self.keys, key)
+        if position >= len(self.keys) or self.keys[position] != key:
+            return -1
+        return int(self.key_rows[position])
@@ -0,0 +1,220 @@
+"""
+跨表字符串池（--string-pool）。
+
+所有表 string 字段中的字符串去重后存入一张共享的 ConfigStrings 表，行数据中只写 int32 下标，
+相同的本地化 key、资源路径、标签在 .dat 中只存一份，C# 端加载后每个字符串也只有一个实例。
+
+字符串池只追加：已有字符串的下标在之后的增量构建中保持不变，未变化的表无需重新生成；
+下标 0 固定为空字符串（空值）。删除的字符串不会从池中移除，--clean 全量构建时重新生成。
+"""
+import os
+import numpy as np
+import dat_encoder
+import util
+from code_generator import to_pascal_case
+
+# 字符串池的表名：ConfigStrings.proto / ConfigStrings.dat，C# 访问器为 ConfigStringPool.cs
+POOL_TABLE_NAME = "ConfigStrings"
+ACCESSOR_FILE_NAME = "ConfigStringPool.cs"
+
+# 启用字符串池时 string 字段在 .proto 中的字段名后缀（字段类型为 int32）
+REF_SUFFIX = "_ref"
+
+VALUES_FIELD_NUMBER = 1
+
+
+class StringPool:
+    """
+    字符串 -> 下标的只追加映射。
+    """
+
+    def __init__(self, values=None):
+        self.values = [""]
+        self.ids = {"": 0}
+        for value in values or []:
+            self.add(value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.values)
+            self.ids[value] = string_id
+            self.values.append(value)
+        return string_id
+
+    def add_all(self, values):
+        for value in values:
+            self.add(value)
+
+    def get_ids(self, texts):
+        """
+        :param texts: 字符串列表
+        :return: int64 下标数组
+        """
+        try:
+            return np.fromiter((self.ids[text] for text in texts), dtype=np.int64, count=len(texts))
+        except KeyError as e:
+            raise ValueError(f"String not found in string pool: {e}")
+
+    def subset(self, values):
+        """
+        只包含指定字符串（下标不变）的只读副本，用于传给子进程。
+        """
+        pool = StringPool()
+        pool.ids = {value: self.ids[value] for value in values}
+        pool.ids[""] = 0
+        pool.values = None
+        return pool
+
+    @classmethod
+    def load(cls, dat_path):
+        """
+        读取已生成的 ConfigStrings.dat；文件不存在或无法解析时返回 None。
+        """
+        if not os.path.exists(dat_path):
+            return None
+        with open(dat_path, 'rb') as f:
+            data = f.read()
+        try:
+            values = _decode_repeated_strings(data)
+        except (IndexError, UnicodeDecodeError, ValueError):
+            return None
+        if not values or values[0] != "":
+            return None
+
+        pool = cls()
+        pool.values = values
+        pool.ids = {value: index for index, value in enumerate(values)}
+        return pool
+
+    def save(self, proto_path, dat_path):
+        """
+        写出 ConfigStrings.proto 和 ConfigStrings.dat。
+
+        :return: .proto 是否有变化
+        """
+        util.write_file_if_changed(dat_path, dat_encoder.encode_repeated_strings(self.values, VALUES_FIELD_NUMBER))
+        return util.write_file_if_changed(proto_path, POOL_PROTO)
+
+
+def get_ref_field_name(field_name):
+    return field_name + REF_SUFFIX
+
+
+def generate_accessor_cs(output_dir, schemas):
+    """
+    生成 ConfigStringPool.cs：加载字符串池的静态类，以及为每张表的 string 字段返回池中字符串的属性
+    （{Table}Row 为 protoc 生成的 partial 类，row.Name 的用法保持不变）。
+
+    :param schemas: 表名 -> TableSchema
+    :return: 文件是否有变化
+    """
+    partials = ""
+    for table_name in sorted(schemas):
+        string_fields = [field for field in schemas[table_name].fields if field.field_type == "string"]
+        if not string_fields:
+            continue
+        properties = "".join(
+            f"    public string {to_pascal_case(field.field_name)} => "
+            f"ConfigStringPool.Get({to_pascal_case(get_ref_field_name(field.field_name))});\n"
+            for field in string_fields
+        )
+        partials += f"""
+public sealed partial class {table_name}Row
+{{
+{properties}}}
+"""
+
+    os.makedirs(output_dir, exist_ok=True)
+    return util.write_file_if_changed(os.path.join(output_dir, ACCESSOR_FILE_NAME), ACCESSOR_TEMPLATE + partials)
+
+
+def remove_outputs(proto_dir, dat_dir, python_out_dir, csharp_out_dir):
+    """
+    关闭字符串池时删除其输出，避免残留的访问器引用已不存在的 *Ref 字段。
+    """
+    files = [
+        os.path.join(proto_dir, f"{POOL_TABLE_NAME}.proto"),
+        os.path.join(dat_dir, f"{POOL_TABLE_NAME}.dat"),
+        os.path.join(python_out_dir, f"{POOL_TABLE_NAME}_pb2.py"),
+        os.path.join(csharp_out_dir, f"{to_pascal_case(POOL_TABLE_NAME)}.cs"),
+        os.path.join(csharp_out_dir, ACCESSOR_FILE_NAME),
+    ]
+    for file_path in files:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _decode_repeated_strings(data):
+    values = []
+    position = 0
+    while position < len(data):
+        tag, position = _decode_varint(data, position)
+        if tag != (VALUES_FIELD_NUMBER << 3) | dat_encoder.WIRE_LENGTH_DELIMITED:
+            raise ValueError(f"Unexpected tag {tag}")
+        length, position = _decode_varint(data, position)
+        if position + length > len(data):
+            raise ValueError("Truncated string")
+        values.append(data[position:position + length].decode("utf-8"))
+        position += length
+    return values
+
+
+def _decode_varint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+POOL_PROTO = f"""
+syntax = "proto3";
+
+message {POOL_TABLE_NAME} {{
+    repeated string values = {VALUES_FIELD_NUMBER};
+}}
+"""
+
+
+ACCESSOR_TEMPLATE = f"""
+using System;
+using System.IO;
+
+// 跨表字符串池：启用 --string-pool 时 string 字段在 .dat 中存为 {POOL_TABLE_NAME} 的下标
+// 需在使用任何配置表之前加载 {POOL_TABLE_NAME}.dat
+public static class ConfigStringPool
+{{
+    private static string[] values = {{ "" }};
+
+    public static void Load(byte[] data)
+    {{
+        var pool = {POOL_TABLE_NAME}.Parser.ParseFrom(data);
+        var newValues = new string[pool.Values.Count];
+        pool.Values.CopyTo(newValues, 0);
+        values = newValues;
+    }}
+
+    public static void Load(string path)
+    {{
+        if (!File.Exists(path))
+            throw new FileNotFoundException($"String pool not found: {{path}}");
+        Load(File.ReadAllBytes(path));
+    }}
+
+    public static int Count => values.Length;
+
+    // 每个下标始终返回同一个字符串实例
+    public static string Get(int id)
+    {{
+        return (uint)id < (uint)values.Length ? values[id] : "";
+    }}
+}}
+"""
@@ -0,0 +1,202 @@
+import os
+import pickle
+import threading
+from contextlib import nullcontext
+import pandas as pd
+import excel_reader
+import util
+from schema import build_table_schema
+
+# 缓存文件格式版本：缓存内容结构变化时修改
+CACHE_FORMAT = 1
+
+
+class TableRegistry:
+    """
+    一次构建内共享的已加载表集合。
+
+    每个工作簿只解析一次，校验、.proto、.dat 等各阶段都从这里取数据；
+    指定 cache_dir 时，解析结果会按文件内容摘要缓存到磁盘，工作簿未变化时不再调用 openpyxl；
+    指定 output_cache 时本地缓存未命中的工作簿再从共享输出缓存中查找（见 output_cache.py），
+    切换分支或在新机器上构建时同样不需要重新解析；共享缓存按 JSON 存储，只有本机的解析缓存使用 pickle。
+    load 可以在多个线程中并发调用（见 scheduler.py），每个工作簿只能由一个线程读取。
+
+    指定 chunked_threshold 时，不小于该大小的工作簿按分块模式处理（见 chunked_table.py）：只读取表头，
+    tables 中为只有表头、没有数据行的 DataFrame，数据在处理时逐批读取，不写入解析缓存。
+    """
+
+    def __init__(self, input_dir, cache_dir=None, reader="pandas", profiler=None, chunked_threshold=None,
+                 output_cache=None):
+        """
+        :param chunked_threshold: 按分块模式处理的工作簿大小下限（字节），None 表示不使用分块模式
+        :param output_cache: output_cache.OutputCache，共享的解析结果缓存
+        """
+        self.input_dir = input_dir
+        self.cache_dir = cache_dir
+        self.reader = reader
+        self.profiler = profiler  # profiler.BuildProfiler，记录每张表的读取阶段
+        self.chunked_threshold = chunked_threshold
+        self.output_cache = output_cache
+        self.tables = {}          # table_name -> DataFrame
+        self.chunked_files = {}   # 分块模式的 table_name -> 工作簿路径
+        self.schemas = {}         # table_name -> TableSchema（首次使用时解析）
+        self.file_paths = {}      # table_name -> 工作簿路径
+        self.content_hashes = {}  # table_name -> 工作簿内容摘要
+        self.errors = {}          # table_name -> 读取失败的异常
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+
+    def load_all(self):
+        """
+        读取 input_dir 下所有 .xlsx 工作簿。
+        """
+        for file_path in list_excel_files(self.input_dir):
+            self.try_load(file_path)
+        return self
+
+    def try_load(self, file_path):
+        """
+        读取单个工作簿；失败时记录到 errors 并返回 None。
+        """
+        try:
+            return self.load(file_path)
+        except Exception as e:
+            with self._lock:
+                self.errors[get_table_name(file_path)] = e
+            print(f"Error reading {file_path}: {e}")
+            return None
+
+    def load(self, file_path):
+        """
+        读取单个工作簿，优先使用磁盘缓存。
+
+        :param file_path: 工作簿路径
+        :return: 解析后的 DataFrame
+        """
+        table_name = get_table_name(file_path)
+        stage = self.profiler.table_stage(table_name, "read") if self.profiler is not None else nullcontext()
+        with stage:
+            content_hash = util.get_file_hash(file_path)
+            chunked = self.is_chunked(file_path)
+            if chunked:
+                df = pd.DataFrame(columns=excel_reader.read_header(file_path))
+                cache_hit = False
+            else:
+                cache_key = self._get_cache_key(content_hash)
+                df = self._read_cache(table_name, cache_key)
+                cache_hit = df is not None
+                if df is None and self.output_cache is not None:
+                    df = self.output_cache.load_table(self.output_cache.get_table_key(cache_key))
+                    cache_hit = df is not None
+                    if df is not None:
+                        self._write_cache(table_name, cache_key, df)
+                if df is None:
+                    df = excel_reader.read_excel(file_path, self.reader)
+                    self._write_cache(table_name, cache_key, df)
+                    if self.output_cache is not None:
+                        self.output_cache.save_table(self.output_cache.get_table_key(cache_key), df)
+
+        with self._lock:
+            self.cache_hits += cache_hit
+            self.tables[table_name] = df
+            if chunked:
+                self.chunked_files[table_name] = file_path
+            else:
+                self.chunked_files.pop(table_name, None)
+            self.schemas.pop(table_name, None)
+            self.file_paths[table_name] = file_path
+            self.content_hashes[table_name] = content_hash
+            self.errors.pop(table_name, None)
+        return df
+
+    def remove(self, table_name):
+        """
+        移除一张表（工作簿被删除时）。
+        """
+        for values in (self.tables, self.chunked_files, self.schemas, self.file_paths, self.content_hashes, self.errors):
+            values.pop(table_name, None)
+
+    def is_chunked(self, file_path):
+        """
+        工作簿是否按分块模式处理。
+        """
+        return self.chunked_threshold is not None and os.path.getsize(file_path) >= self.chunked_threshold
+
+    def get(self, table_name):
+        return self.tables.get(table_name)
+
+    def get_schema(self, table_name):
+        """
+        返回表的 TableSchema，每张表只解析一次表头；表头格式错误时抛出 ValueError。
+        """
+        schema = self.schemas.get(table_name)
+        if schema is None:
+            schema = build_table_schema(table_name, self.tables[table_name].columns)
+            self.schemas[table_name] = schema
+        return schema
+
+    def get_schemas(self, table_names):
+        """
+        返回多张表的 TableSchema；不存在或表头格式错误的表不包含在结果中。
+        """
+        schemas = {}
+        for table_name in table_names:
+            if table_name not in self.tables:
+                continue
+            try:
+                schemas[table_name] = self.get_schema(table_name)
+            except ValueError:
+                continue
+        return schemas
+
+    def _get_cache_key(self, content_hash):
+        return f"{CACHE_FORMAT}:{util.TOOL_VERSION}:{pd.__version__}:{self.reader}:{content_hash}"
+
+    def _get_cache_path(self, table_name):
+        return os.path.join(self.cache_dir, "tables", f"{table_name}.pkl")
+
+    def _read_cache(self, table_name, cache_key):
+        if not self.cache_dir:
+            return None
+
+        cache_path = self._get_cache_path(table_name)
+        if not os.path.exists(cache_path):
+            return None
+
+        try:
+            with open(cache_path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            # 缓存损坏或版本不兼容时视为未命中
+            return None
+
+        if entry.get("key") != cache_key:
+            return None
+        return entry.get("df")
+
+    def _write_cache(self, table_name, cache_key, df):
+        if not self.cache_dir:
+            return
+
+        cache_path = self._get_cache_path(table_name)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        # 先写临时文件再替换，避免并发构建读到半截缓存
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({"key": cache_key, "df": df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+
+def list_excel_files(input_dir):
+    """
+    列出目录下所有 .xlsx 工作簿（忽略 Excel 打开文件时产生的 ~$ 临时文件）。
+    """
+    return sorted(
+        os.path.join(input_dir, f) for f in os.listdir(input_dir)
+        if f.endswith('.xlsx') and not f.startswith('~$')
+    )
+
+
+def get_table_name(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
@@ -0,0 +1,70 @@
+"""
+测试公用的 fixture：Tools 下的模块按模块名直接导入（与 main.py 相同）。
+"""
+import os
+import shutil
+import sys
+import pandas as pd
+import pytest
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
+
+
+@pytest.fixture
+def write_workbook():
+    """
+    write_workbook(path, columns)：columns 为 表头 -> 各行的值，写出单个工作表的 .xlsx。
+    """
+    def write(path, columns):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pd.DataFrame(columns).to_excel(path, index=False)
+        return path
+    return write
+
+
+class BuildProject:
+    """
+    临时的构建目录：Excel/ 为输入，Output/ 下为各类输出，Tools/protoc/bin 指向本机的 protoc。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.input_dir = os.path.join(root, "Excel")
+        self.proto_dir = os.path.join(root, "Output", "proto")
+        self.dat_dir = os.path.join(root, "Output", "dat")
+        self.python_out_dir = os.path.join(root, "Output", "proto_py")
+        self.csharp_out_dir = os.path.join(root, "Output", "proto_cs")
+        self.cache_dir = os.path.join(root, "Output", ".cache")
+        for directory in (self.input_dir, self.proto_dir, self.dat_dir, self.python_out_dir, self.csharp_out_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def workbook(self, table_name):
+        return os.path.join(self.input_dir, f"{table_name}.xlsx")
+
+    def build(self, **options):
+        import main
+        options.setdefault("cache_dir", self.cache_dir)
+        return main.process_excel_directory(self.input_dir, self.proto_dir, self.dat_dir, self.python_out_dir,
+                                            self.csharp_out_dir, **options)
+
+    def outputs(self, table_name):
+        import main
+        return main.get_output_files(table_name, self.proto_dir, self.dat_dir, self.python_out_dir,
+                                     self.csharp_out_dir)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    完整构建（含 protoc）用的 BuildProject；本机没有 protoc 时跳过。
+    """
+    protoc = shutil.which("protoc")
+    if protoc is None:
+        pytest.skip("protoc is not installed")
+    protoc_dir = tmp_path / "Tools" / "protoc" / "bin"
+    protoc_dir.mkdir(parents=True)
+    os.symlink(protoc, protoc_dir / ("protoc.exe" if os.name == "nt" else "protoc"))
+    monkeypatch.chdir(tmp_path)
+    return BuildProject(str(tmp_path))
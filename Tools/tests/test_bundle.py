@@ -0,0 +1,87 @@
+import os
+import pytest
+import bundle
+
+
+def write_dats(dat_dir, tables):
+    os.makedirs(dat_dir, exist_ok=True)
+    for name, data in tables.items():
+        with open(os.path.join(dat_dir, f"{name}.dat"), "wb") as f:
+            f.write(data)
+
+
+TABLES = {
+    "Item": b"item row " * 200,          # 可压缩
+    "Level": os.urandom(512),            # 压缩后不会变小，原样存储
+    "Empty": b"",
+    "中文": b"unicode name " * 10,
+}
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_round_trip(tmp_path, compression):
+    dat_dir, bundle_path = str(tmp_path / "dat"), str(tmp_path / "config.bundle")
+    write_dats(dat_dir, TABLES)
+    (tmp_path / "dat" / "notes.txt").write_text("ignored")
+
+    changed, entries = bundle.write_bundle(dat_dir, bundle_path, compression)
+
+    assert changed
+    toc = bundle.read_toc(bundle_path)
+    assert sorted(toc) == sorted(TABLES) == [entry["name"] for entry in entries]
+    for name, data in TABLES.items():
+        assert bundle.read_entry(bundle_path, name, toc) == data
+        assert toc[name]["raw_length"] == len(data)
+    compressed = {name for name, entry in toc.items() if entry["flags"] & bundle.FLAG_ZLIB}
+    assert compressed == ({"Item", "中文"} if compression == "zlib" else set())
+    with pytest.raises(KeyError):
+        bundle.read_entry(bundle_path, "Missing")
+
+
+def test_unchanged_entries_are_reused(tmp_path, monkeypatch):
+    dat_dir, bundle_path = str(tmp_path / "dat"), str(tmp_path / "config.bundle")
+    write_dats(dat_dir, TABLES)
+    bundle.write_bundle(dat_dir, bundle_path)
+
+    compressed = []
+    compress = bundle._compress
+    monkeypatch.setattr(bundle, "_compress", lambda raw, *args: compressed.append(raw) or compress(raw, *args))
+    write_dats(dat_dir, {"Item": b"changed row " * 200})
+    changed, _ = bundle.write_bundle(dat_dir, bundle_path)
+
+    # Level 在 zlib 下原样存储，仍会重新尝试压缩
+    assert changed
+    assert sorted(compressed) == sorted([b"changed row " * 200, TABLES["Level"], TABLES["Empty"]])
+    assert bundle.read_entry(bundle_path, "Item") == b"changed row " * 200
+
+    # 压缩方式变化时只复用原样存储的条目
+    compressed.clear()
+    bundle.write_bundle(dat_dir, bundle_path, "none")
+    assert sorted(compressed) == sorted([b"changed row " * 200, TABLES["中文"]])
+
+
+def test_hash_mismatch_is_rejected(tmp_path):
+    dat_dir, bundle_path = str(tmp_path / "dat"), str(tmp_path / "config.bundle")
+    write_dats(dat_dir, TABLES)
+    bundle.write_bundle(dat_dir, bundle_path, "none")
+    entry = bundle.read_toc(bundle_path)["Item"]
+
+    with open(bundle_path, "r+b") as f:
+        f.seek(entry["offset"])
+        f.write(b"X")
+
+    with pytest.raises(ValueError, match="Hash mismatch for table 'Item'"):
+        bundle.read_entry(bundle_path, "Item")
+    assert bundle.read_entry(bundle_path, "Level") == TABLES["Level"]
+
+
+def test_unchanged_rebuild_keeps_bundle(tmp_path):
+    dat_dir, bundle_path = str(tmp_path / "dat"), str(tmp_path / "config.bundle")
+    write_dats(dat_dir, TABLES)
+    bundle.write_bundle(dat_dir, bundle_path)
+    mtime = os.stat(bundle_path).st_mtime_ns
+
+    changed, _ = bundle.write_bundle(dat_dir, bundle_path)
+
+    assert not changed
+    assert os.stat(bundle_path).st_mtime_ns == mtime
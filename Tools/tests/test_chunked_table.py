@@ -0,0 +1,103 @@
+import os
+import pytest
+import chunked_table
+import key_index
+
+ROWS = 1100  # 第一批最多 excel_reader.PROBE_ROWS 行，之后每批 1 行（chunked_memory=1）
+
+
+def sample_columns():
+    return {
+        "id|int": list(range(1, ROWS + 1)),
+        "level|int^id(Level)": [i % 3 + 1 for i in range(ROWS)],
+        "code|int^Index(unique)": [i * 7 for i in range(ROWS)],
+        "power|long": [(i - 500) * (1 << 33) for i in range(ROWS)],
+        "rate|float|null": [None if i % 5 == 0 else i / 8 for i in range(ROWS)],
+        "enabled|bool": [i % 2 == 0 for i in range(ROWS)],
+        "name|string|null": [None if i % 7 == 0 else f"name{i % 50}" for i in range(ROWS)],
+        "startTime|time": ["2024-01-01-00-00-00"] * ROWS,
+    }
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """
+    记录每张表以分块模式读取的批数。
+    """
+    counts = {}
+    iter_batches = chunked_table.iter_batches
+
+    def counting(file_path, memory_limit, usecols=None):
+        table_name = os.path.splitext(os.path.basename(file_path))[0]
+        for batch in iter_batches(file_path, memory_limit, usecols):
+            counts[table_name] = counts.get(table_name, 0) + 1
+            yield batch
+
+    monkeypatch.setattr(chunked_table, "iter_batches", counting)
+    return counts
+
+
+def write_tables(project, write_workbook, sample=None):
+    write_workbook(project.workbook("Level"), {"id|int": [1, 2, 3], "exp|int": [10, 20, 30]})
+    write_workbook(project.workbook("Sample"), sample or sample_columns())
+
+
+def read_dat(project, table_name):
+    with open(project.outputs(table_name)["dat"], "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("dat_format", ["message", "indexed"])
+def test_matches_stream_reader(project, write_workbook, batches, dat_format):
+    write_tables(project, write_workbook)
+    assert all(result["ok"] for result in project.build(reader="stream", dat_format=dat_format).values())
+    expected = {table_name: read_dat(project, table_name) for table_name in ("Level", "Sample")}
+
+    results = project.build(full_rebuild=True, dat_format=dat_format, chunked_threshold=0, chunked_memory=1)
+
+    assert all(result["ok"] for result in results.values())
+    assert batches["Sample"] > 2
+    assert {table_name: read_dat(project, table_name) for table_name in expected} == expected
+
+
+def test_unique_duplicate_across_batches(project, write_workbook, batches):
+    columns = sample_columns()
+    columns["code|int^Index(unique)"][ROWS - 5] = columns["code|int^Index(unique)"][ROWS - 20]
+    write_tables(project, write_workbook, columns)
+
+    results = project.build(chunked_threshold=0, chunked_memory=1)
+
+    # 行位置 ROWS - 20 与 ROWS - 5 重复（都在第一批之后的批中），Excel 行号为位置 + 2
+    assert batches["Sample"] > 2
+    assert not results["Sample"]["ok"]
+    assert results["Sample"]["error"] == \
+        f"Column 'code' has duplicate values in a unique index at Excel row(s) {ROWS - 18}, {ROWS - 3}."
+
+
+def test_foreign_key_to_chunked_table(project, write_workbook, monkeypatch):
+    write_workbook(project.workbook("Level"), {"id|int": list(range(1, ROWS + 1)), "exp|int": [1] * ROWS})
+    write_workbook(project.workbook("Sample"), {"id|int": [1, 2, 3], "level|int^id(Level)": [1, ROWS, ROWS + 1]})
+    reads = []
+    read_unique_values = key_index._read_unique_values
+    monkeypatch.setattr(key_index, "_read_unique_values",
+                        lambda file_path, column: reads.append((os.path.basename(file_path), column))
+                        or read_unique_values(file_path, column))
+
+    # 只有 Level 达到分块阈值
+    threshold = os.path.getsize(project.workbook("Sample")) + 1
+    assert os.path.getsize(project.workbook("Level")) >= threshold
+    results = project.build(chunked_threshold=threshold, chunked_memory=1)
+
+    assert reads == [("Level.xlsx", "id|int")]
+    assert results["Level"]["ok"] and not results["Sample"]["ok"]
+    assert "not found in 'id' of table 'Level' at Excel row(s) 4" in results["Sample"]["error"]
+
+
+@pytest.mark.parametrize("options, column", [({}, "exp|int^Backend(soa)"), ({"backend": "soa"}, "exp|int")])
+def test_soa_backend_is_rejected(project, write_workbook, options, column):
+    write_workbook(project.workbook("Level"), {"id|int": [1, 2], column: [10, 20]})
+
+    results = project.build(chunked_threshold=0, **options)
+
+    assert not results["Level"]["ok"]
+    assert "Chunked mode does not support the 'soa' backend" in results["Level"]["error"]
@@ -0,0 +1,44 @@
+import pytest
+from config_database import ConfigDatabase, ConfigTable
+
+
+def test_config_table_is_abstract():
+    with pytest.raises(TypeError):
+        ConfigTable("Table", "Table.dat", b"", None)
+
+
+def test_reload_after_schema_change(project, write_workbook, monkeypatch):
+    # 表名在测试进程内唯一：pb2 模块导入后留在 sys.modules 和默认 DescriptorPool 中
+    monkeypatch.syspath_prepend(project.python_out_dir)
+    workbook = project.workbook("ReloadSchema")
+    write_workbook(workbook, {"id|int": [1, 2], "exp|int": [10, 20], "startTime|time": ["2024-01-01-00-00-00"] * 2})
+    assert all(result["ok"] for result in project.build().values())
+
+    db = ConfigDatabase(project.dat_dir)
+    table = db["ReloadSchema"]
+    assert table.get(2).exp == 20
+    assert [row.id for row in table.find("startTime", 1704067200)] == [1, 2]
+
+    write_workbook(workbook, {"id|int": [1, 2, 3], "exp|int": [10, 20, 30], "name|string": ["a", "b", "c"],
+                              "startTime|time": ["2024-01-01-00-00-00"] * 3})
+    assert all(result["ok"] for result in project.build().values())
+
+    assert db.reload() == ["ReloadSchema"]
+    table = db["ReloadSchema"]
+    assert table.get(3).name == "c"
+    assert [row.id for row in table.find("name", "b")] == [2]
+    assert [row.id for row in table.find("startTime", 1704067200)] == [1, 2, 3]
+    db.close()
+
+
+def test_message_table_rows(project, write_workbook, monkeypatch):
+    monkeypatch.syspath_prepend(project.python_out_dir)
+    write_workbook(project.workbook("MessageRows"), {"id|int": [3, 1, 2], "exp|int": [30, 10, 20]})
+    assert all(result["ok"] for result in project.build().values())
+
+    with ConfigDatabase(project.dat_dir) as db:
+        table = db["MessageRows"]
+        assert len(table) == 3
+        assert [row.id for row in table] == [3, 1, 2]
+        assert table.get(1).exp == 10 and table.get(4) is None
+        assert table.find_one("exp", 20).id == 2
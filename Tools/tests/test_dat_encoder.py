@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+import dat_encoder
+import data_generator
+from schema import build_table_schema
+
+COLUMNS = {
+    "id|int": [1, 2, 3, 4, 5],
+    "level|int|null": [0, -1, None, (1 << 31) - 1, -(1 << 31)],
+    "power|long|null": [None, 0, -(1 << 63), 1 << 62, 1 << 40],
+    "rate|float|null": [0.0, -1.5, None, 3.4e38, 1e-7],
+    "enabled|bool|null": [True, False, None, "TRUE", 0],
+    "name|string|null": ["", "a", None, "中文", 12],
+    "startTime|time|null": ["2024-01-01-00-00-00", None, "1970-01-01-00-00-00", "1969-12-31-23-59-59",
+                            "9999-12-31-23-59-59"],
+}
+
+
+def encode_both(df):
+    schema = build_table_schema("Sample", df.columns)
+    return dat_encoder.encode_table(df, schema), data_generator.encode_table_protobuf(df, "Sample", schema)
+
+
+def test_every_field_type_matches_serialize_to_string():
+    columnar, reference = encode_both(pd.DataFrame(COLUMNS))
+
+    assert columnar == reference
+
+
+@pytest.mark.parametrize("pattern", ["all_null", "no_null", "zeros"])
+def test_null_patterns_match_serialize_to_string(pattern):
+    columns = {"id|int": COLUMNS["id|int"]}
+    for column, values in COLUMNS.items():
+        if column == "id|int":
+            continue
+        if pattern == "all_null":
+            values = [None] * len(values)
+        elif pattern == "no_null":
+            values = [value for value in values if value is not None] * 2
+            values = values[:5]
+        else:
+            values = [{"int": 0, "long": 0, "float": 0.0, "bool": False, "string": "",
+                       "time": "1970-01-01-00-00-00"}[column.split("|")[1]]] * 5
+        columns[column] = values
+    columnar, reference = encode_both(pd.DataFrame(columns))
+
+    assert columnar == reference
+
+
+def test_float_read_int_column_matches_serialize_to_string():
+    # 含空值的整数列被 pandas 读为 float64
+    df = pd.DataFrame({"id|int": [1.0, 2.0, 3.0], "exp|long|null": [np.nan, -5.0, 2.0 ** 40]})
+    columnar, reference = encode_both(df)
+
+    assert columnar == reference
+
+
+def test_empty_table_matches_serialize_to_string():
+    columnar, reference = encode_both(pd.DataFrame({column: [] for column in COLUMNS}))
+
+    assert columnar == reference == b""
+
+
+def test_long_extremes_match_serialize_to_string():
+    df = pd.DataFrame({"id|int": [1, 2, 3], "power|long": [-(1 << 63), (1 << 63) - 1, -1]})
+    columnar, reference = encode_both(df)
+
+    assert columnar == reference
+
+
+def test_float_read_long_out_of_range_is_rejected():
+    # float64 的 2**63 超出 int64，两种编码方式都报告同样的错误
+    df = pd.DataFrame({"id|int": [1.0, 2.0], "power|long|null": [np.nan, 2.0 ** 63]})
+    schema = build_table_schema("Sample", df.columns)
+
+    for encode in (lambda: dat_encoder.encode_table(df, schema),
+                   lambda: data_generator.encode_table_protobuf(df, "Sample", schema)):
+        with pytest.raises(TypeError, match="Value out of range: 9223372036854775808"):
+            encode()
@@ -0,0 +1,88 @@
+import hashlib
+import pandas as pd
+import pytest
+import dat_encoder
+import delta_patch
+import indexed_dat
+from schema import build_table_schema
+
+COLUMNS = ["id|int", "exp|int", "name|string"]
+
+
+def encode(rows, dat_format="message"):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    schema = build_table_schema("Item", df.columns)
+    if dat_format == "indexed":
+        return indexed_dat.encode_indexed_table(df, schema, chunk_rows=16)
+    return dat_encoder.encode_table(df, schema)
+
+
+def encode_message(records):
+    # message 格式：每行为 {Table}.rows 字段（tag 0x0A + varint 长度 + 记录）
+    parts = []
+    for record in records:
+        length = len(record)
+        varint = bytearray()
+        while length >= 0x80:
+            varint.append((length & 0x7F) | 0x80)
+            length >>= 7
+        varint.append(length)
+        parts += [b"\x0a", bytes(varint), bytes(record)]
+    return b"".join(parts)
+
+
+def base_rows():
+    return [[i, i * 10, f"item{i}"] for i in range(1, 201)]
+
+
+def apply(base_data, patch_data):
+    patch = delta_patch.read_patch(patch_data)
+    base = delta_patch.get_keyed_records(base_data, patch["key_field_number"])
+    return list(delta_patch.apply_patch(base, patch).values())
+
+
+@pytest.mark.parametrize("dat_format", ["message", "indexed"])
+def test_base_plus_patch_equals_target(dat_format):
+    target_rows = base_rows()
+    target_rows[5][1] = -1                              # 修改
+    del target_rows[10]                                 # 删除
+    target_rows.append([1000, 5, "new"])                # 新增
+    base_data, target_data = encode(base_rows(), dat_format), encode(target_rows, dat_format)
+
+    patch, entry = delta_patch.make_table_patch(base_data, target_data, key_field_number=1)
+
+    assert entry["mode"] == "patch"
+    assert (entry["added"], entry["modified"], entry["deleted"]) == (1, 1, 1)
+    records = apply(base_data, patch)
+    assert records == delta_patch.read_records(target_data)[0]
+    if dat_format == "message":
+        assert hashlib.sha256(encode_message(records)).digest() == delta_patch.read_patch(patch)["target_hash"]
+
+
+def test_reordered_rows_fall_back_to_full():
+    target_rows = base_rows()
+    target_rows[0], target_rows[1] = target_rows[1], target_rows[0]
+
+    patch, entry = delta_patch.make_table_patch(encode(base_rows()), encode(target_rows), key_field_number=1)
+
+    assert patch is None
+    assert entry["mode"] == "full" and entry["reason"] == "row order changed"
+
+
+def test_inserted_row_falls_back_to_full():
+    target_rows = base_rows()
+    target_rows.insert(3, [1000, 5, "new"])
+
+    patch, entry = delta_patch.make_table_patch(encode(base_rows()), encode(target_rows), key_field_number=1)
+
+    assert patch is None and entry["reason"] == "row order changed"
+
+
+def test_duplicate_ids_fall_back_to_full():
+    target_rows = base_rows()
+    target_rows[7][0] = target_rows[8][0]
+
+    patch, entry = delta_patch.make_table_patch(encode(base_rows()), encode(target_rows), key_field_number=1)
+
+    assert patch is None
+    assert entry["mode"] == "full" and "duplicate id" in entry["reason"]
@@ -0,0 +1,76 @@
+import os
+import re
+import pytest
+import generate_config_cs
+
+
+def table_info(id_type, id_range):
+    return {"fields": [{"name": "id", "type": id_type, "nullable": False, "index": None}], "id": id_range}
+
+
+@pytest.mark.parametrize("loader", ["eager", "lazy"])
+def test_get_row_by_id_uses_id_type(tmp_path, loader):
+    info = table_info("long", {"min": 1, "max": 5_000_000_000, "count": 2})
+    generate_config_cs.generate_config_cs("Big", str(tmp_path), loader, table_info=info)
+
+    code = (tmp_path / "BigConfig.cs").read_text(encoding="utf-8")
+    assert "GetRowById(long id)" in code and "GetRowById(int id)" not in code
+
+
+def test_dense_ids_are_int_only(tmp_path):
+    dense = {"min": 1, "max": 3, "count": 3}
+    assert generate_config_cs.is_dense_ids(table_info("int", dense))
+    assert not generate_config_cs.is_dense_ids(table_info("long", dense))
+
+    generate_config_cs.generate_config_cs("Dense", str(tmp_path), "eager", table_info=table_info("int", dense))
+    code = (tmp_path / "DenseConfig.cs").read_text(encoding="utf-8")
+    assert "rowsById" in code and "GetRowById(int id)" in code
+
+
+def test_lazy_count_is_header_row_count(tmp_path):
+    # 没有 int/long id 或 id 重复时主键表比行数少，Count 取文件头中的 row_count（与 IndexedDatReader 一致）
+    generate_config_cs.generate_config_cs("Lazy", str(tmp_path), "lazy")
+
+    code = (tmp_path / "LazyConfig.cs").read_text(encoding="utf-8")
+    assert "rowCount = (int)accessor.ReadUInt32(8);" in code
+    assert "public int Count => rowCount;" in code
+
+
+def get_entry_order(code):
+    return [(name, int(priority)) for name, priority in re.findall(r'new TableEntry\("(\w+)", (\d+),', code)]
+
+
+def test_priority_tiers(project, write_workbook):
+    write_workbook(project.workbook("Level"), {"id|int^Priority(0)": [1]})
+    write_workbook(project.workbook("Item"), {"id|int": [1], "name|string^Priority(2)": ["a"]})
+    write_workbook(project.workbook("Quest"), {"id|int": [1]})
+    write_workbook(project.workbook("Audio"), {"id|int": [1], "exp|int^Priority(5)": [1]})
+    assert all(result["ok"] for result in project.build(string_pool=True).values())
+    output_dir = os.path.join(project.root, "Scripts")
+
+    generate_config_cs.generate_config_cs_all(project.proto_dir, output_dir, default_priority=3)
+
+    code = open(os.path.join(output_dir, generate_config_cs.MANAGER_FILE_NAME), encoding="utf-8").read()
+    # 按优先级分层，同层按表名；未声明 Priority 的表使用 --default-priority；字符串池不生成 Config 类
+    assert get_entry_order(code) == [("Level", 0), ("Item", 2), ("Quest", 3), ("Audio", 5)]
+    assert "ConfigStrings" not in [name for name, _ in get_entry_order(code)]
+    assert not os.path.exists(os.path.join(output_dir, "ConfigStringsConfig.cs"))
+    assert "await EnsureStringPoolAsync(dataDirectory);" in code
+
+    tables = {table_name: generate_config_cs.load_table_info(project.proto_dir, table_name)
+              for table_name in ("Level", "Item", "Quest", "Audio")}
+    assert generate_config_cs.generate_config_manager_cs(tables, output_dir) == [0, 2, 5]
+    code = open(os.path.join(output_dir, generate_config_cs.MANAGER_FILE_NAME), encoding="utf-8").read()
+    assert get_entry_order(code) == [("Level", 0), ("Quest", 0), ("Item", 2), ("Audio", 5)]
+
+
+def test_unchanged_scripts_are_not_rewritten(tmp_path):
+    info = table_info("int", {"min": 1, "max": 3, "count": 3})
+    assert generate_config_cs.generate_config_cs("Item", str(tmp_path), table_info=info)
+    generate_config_cs.generate_config_manager_cs({"Item": info}, str(tmp_path))
+    mtimes = {path.name: path.stat().st_mtime_ns for path in tmp_path.iterdir()}
+
+    assert not generate_config_cs.generate_config_cs("Item", str(tmp_path), table_info=info)
+    generate_config_cs.generate_config_manager_cs({"Item": info}, str(tmp_path))
+
+    assert {path.name: path.stat().st_mtime_ns for path in tmp_path.iterdir()} == mtimes
@@ -0,0 +1,63 @@
+import os
+
+
+def write_level(project, write_workbook, level_exp=(100, 200)):
+    write_workbook(project.workbook("Level"), {"id|int": [1, 2], "exp|int": list(level_exp)})
+
+
+def write_tables(project, write_workbook):
+    # .xlsx 中带有写出时间，只改写需要变化的工作簿
+    write_level(project, write_workbook)
+    write_workbook(project.workbook("Sample"), {"id|int": [1, 2], "level|int^id(Level)": [1, 2]})
+    write_workbook(project.workbook("Other"), {"id|int": [1], "name|string": ["a"]})
+
+
+def get_mtimes(project, table_name):
+    return {kind: os.stat(path).st_mtime_ns for kind, path in project.outputs(table_name).items()
+            if os.path.exists(path)}
+
+
+def test_unchanged_tables_are_skipped(project, write_workbook):
+    write_tables(project, write_workbook)
+    assert sorted(project.build()) == ["Level", "Other", "Sample"]
+    mtimes = {table_name: get_mtimes(project, table_name) for table_name in ("Level", "Sample", "Other")}
+
+    assert project.build() == {}
+    assert {table_name: get_mtimes(project, table_name) for table_name in mtimes} == mtimes
+
+
+def test_changed_table_rebuilds_dependents(project, write_workbook):
+    write_tables(project, write_workbook)
+    project.build()
+    other = get_mtimes(project, "Other")
+
+    write_level(project, write_workbook, level_exp=(100, 300))
+    results = project.build()
+
+    assert sorted(results) == ["Level", "Sample"]
+    assert all(result["ok"] for result in results.values())
+    assert get_mtimes(project, "Other") == other
+
+
+def test_missing_or_edited_output_is_rebuilt(project, write_workbook):
+    write_tables(project, write_workbook)
+    project.build()
+    outputs = project.outputs("Other")
+    with open(outputs["dat"], "rb") as f:
+        data = f.read()
+
+    os.remove(outputs["dat"])
+    assert sorted(project.build()) == ["Other"]
+
+    with open(outputs["dat"], "ab") as f:
+        f.write(b"\0")
+    assert sorted(project.build()) == ["Other"]
+    with open(outputs["dat"], "rb") as f:
+        assert f.read() == data
+
+
+def test_full_rebuild_ignores_manifest(project, write_workbook):
+    write_tables(project, write_workbook)
+    project.build()
+
+    assert sorted(project.build(full_rebuild=True)) == ["Level", "Other", "Sample"]
@@ -0,0 +1,64 @@
+import io
+import pandas as pd
+import pytest
+import dat_encoder
+import indexed_dat
+import message_types
+from indexed_dat import IndexedDatReader
+from schema import build_table_schema
+
+
+def sample_table():
+    # id 无序、含负数和超出 int32 的值；id 7 重复，索引指向最后一行
+    ids = [7, -3, 1 << 40, 2, 7, 0, 15, -(1 << 50), 11, 5]
+    df = pd.DataFrame({"id|long": ids, "exp|int": [i * 3 - 10 for i in range(len(ids))],
+                       "name|string": [f"row{i}" if i % 3 else "" for i in range(len(ids))]})
+    return df, build_table_schema("IndexedSample", df.columns)
+
+
+def write(tmp_path, data):
+    path = tmp_path / "IndexedSample.dat"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_indexed_round_trip(tmp_path):
+    df, schema = sample_table()
+    table_class, row_class = message_types.get_message_classes("IndexedSample", schema)
+    expected = list(table_class.FromString(dat_encoder.encode_table(df, schema)).rows)
+
+    path = write(tmp_path, indexed_dat.encode_indexed_table(df, schema, chunk_rows=3))
+    with IndexedDatReader(path, row_class.FromString) as reader:
+        assert len(reader) == len(df) and reader.chunk_count == 4
+        assert list(reader) == expected
+        assert [reader.get_row(row) for row in range(len(df))] == expected
+        assert reader.get_chunk(1) == expected[3:6]
+        for row in expected:
+            last = [candidate for candidate in expected if candidate.id == row.id][-1]
+            assert reader.get(row.id) == last
+        assert reader.get(7).exp == expected[4].exp
+        assert reader.get(3) is None and reader.get(1 << 60) is None
+        with pytest.raises(IndexError):
+            reader.get_row(len(df))
+
+
+def test_writer_matches_whole_table_encoding(tmp_path):
+    df, schema = sample_table()
+    file = io.BytesIO()
+    writer = indexed_dat.IndexedTableWriter(file, schema, chunk_rows=3)
+    for start in range(0, len(df), 4):
+        writer.write_rows(df.iloc[start:start + 4])
+    writer.close()
+
+    assert file.getvalue() == indexed_dat.encode_indexed_table(df, schema, chunk_rows=3)
+
+
+def test_table_without_id_is_read_by_row(tmp_path):
+    df = pd.DataFrame({"level|int": [3, 1, 2]})
+    schema = build_table_schema("IndexedNoKey", df.columns)
+    _, row_class = message_types.get_message_classes("IndexedNoKey", schema)
+
+    with IndexedDatReader(write(tmp_path, indexed_dat.encode_indexed_table(df, schema)), row_class.FromString) as reader:
+        assert len(reader.keys) == 0 and reader.key_field_number == 0
+        assert [row.level for row in reader] == [3, 1, 2]
+        assert reader.get_row(2).level == 2
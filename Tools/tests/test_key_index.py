@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+from key_index import KeyIndex
+from schema import build_table_schema
+
+
+def make_index():
+    tables = {"Level": pd.DataFrame({"id|int": [1, 2, 2, 3], "name|string": ["a", "b", "b", None]})}
+    schemas = {"Level": build_table_schema("Level", tables["Level"].columns)}
+    return KeyIndex(tables, schemas)
+
+
+def test_keys_are_built_once_per_column(monkeypatch):
+    index = make_index()
+    calls = []
+    build_keys = index._build_keys
+    monkeypatch.setattr(index, "_build_keys", lambda *key: calls.append(key) or build_keys(*key))
+
+    first = index.get_keys("Level", "id")
+    assert index.get_keys("Level", "id") is first
+    index.find_missing(pd.Series([1, 4]), "Level", "id", "Sample.level")
+    index.find_missing(pd.Series([3]), "Level", "id", "Reward.level")
+    index.get_keys("Level", "name")
+
+    assert calls == [("Level", "id"), ("Level", "name")]
+    assert list(first) == [1, 2, 3]
+
+
+def test_find_missing_records_misses_per_referrer():
+    index = make_index()
+
+    missing = index.find_missing(pd.Series([1, 4, None, 4, 5]), "Level", "id", "Sample.level")
+
+    assert missing.tolist() == [False, True, False, True, True]
+    assert index.get_misses("Sample") == {"Sample.level -> Level.id": {"count": 2, "values": [4, 5]}}
+    assert index.get_misses("Reward") == {}
+
+
+def test_invalidate_and_subset():
+    index = make_index()
+    keys = index.get_keys("Level", "id")
+
+    subset = index.subset([("Level", "id"), ("Missing", "id")])
+    assert subset.get_keys("Level", "id") is keys and not subset.has_table("Missing")
+
+    index.tables["Level"] = pd.DataFrame({"id|int": [7], "name|string": ["x"]})
+    index.invalidate("Level", index.schemas["Level"])
+    assert list(index.get_keys("Level", "id")) == [7]
+
+    index.invalidate("Level")
+    with pytest.raises(ValueError, match="not found"):
+        index.get_keys("Level", "id")
+
+
+@pytest.mark.parametrize("engine", ["thread", "process"])
+def test_dependents_are_checked_against_rebuilt_table(project, write_workbook, engine):
+    write_workbook(project.workbook("Level"), {"id|int": [1, 2], "exp|int": [100, 200]})
+    write_workbook(project.workbook("Sample"), {"id|int": [1, 2], "level|int^id(Level)": [1, 2]})
+    write_workbook(project.workbook("Other"), {"id|int": [1], "name|string": ["a"]})
+    assert all(result["ok"] for result in project.build(engine=engine).values())
+
+    # 删除被引用的 id 2：Level 自身构建成功，引用它的 Sample 重新校验后失败
+    write_workbook(project.workbook("Level"), {"id|int": [1], "exp|int": [100]})
+    results = project.build(engine=engine)
+
+    assert sorted(results) == ["Level", "Sample"]
+    assert results["Level"]["ok"] and not results["Sample"]["ok"]
+    assert "not found in 'id' of table 'Level' at Excel row(s) 3" in results["Sample"]["error"]
@@ -0,0 +1,47 @@
+import importlib
+import pytest
+import message_types
+from google.protobuf import descriptor_pb2
+from schema import build_table_schema
+
+COLUMNS = {
+    "id|int": [1, 2, 3, 4],
+    "level|int": [0, -1, -(1 << 31), (1 << 31) - 1],
+    "power|long": [-(1 << 50), 1 << 52, 1 << 40, 0],
+    "rate|float|null": [0.0, -1.5, None, 1e-7],
+    "enabled|bool|null": [True, False, None, "TRUE"],
+    "name|string|null": ["", "a", None, "中文"],
+    "startTime|time|null": ["2024-01-01-00-00-00", None, "1970-01-01-00-00-00", "1969-12-31-23-59-59"],
+}
+
+
+def get_fields(message_proto):
+    return [(field.name, field.number, field.type, field.label, field.type_name) for field in message_proto.field]
+
+
+@pytest.mark.parametrize("table_name, string_pool", [("TypesMessage", False), ("TypesPooled", True)])
+def test_matches_protoc_generated_module(project, write_workbook, monkeypatch, table_name, string_pool):
+    # 表名在测试进程内唯一：pb2 模块导入后留在 sys.modules 和默认 DescriptorPool 中
+    monkeypatch.syspath_prepend(project.python_out_dir)
+    write_workbook(project.workbook(table_name), COLUMNS)
+    options = {"string_pool": True} if string_pool else {"dat_encoder": "protobuf"}
+    assert all(result["ok"] for result in project.build(**options).values())
+
+    module = importlib.import_module(f"{table_name}_pb2")
+    schema = build_table_schema(table_name, list(COLUMNS))
+
+    expected = descriptor_pb2.FileDescriptorProto()
+    module.DESCRIPTOR.CopyToProto(expected)
+    actual = message_types.build_file_descriptor(table_name, schema, string_pool)
+    assert list(actual.dependency) == list(expected.dependency)
+    assert [(message.name, get_fields(message)) for message in actual.message_type] == \
+           [(message.name, get_fields(message)) for message in expected.message_type]
+
+    # 进程内的消息类与 protoc 生成的模块对同一份 .dat 解析、序列化的结果逐字节一致
+    with open(project.outputs(table_name)["dat"], "rb") as f:
+        data = f.read()
+    table_class, _ = message_types.get_message_classes(table_name, schema, string_pool)
+    generated = getattr(module, table_name).FromString(data)
+    assert generated.SerializeToString() == data
+    assert table_class.FromString(data).SerializeToString() == data
+    assert [row.id for row in generated.rows] == COLUMNS["id|int"]
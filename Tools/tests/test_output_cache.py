@@ -0,0 +1,68 @@
+import datetime
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import output_cache
+from output_cache import OutputCache
+from table_registry import TableRegistry
+
+
+class Exploit:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, "w")
+
+
+def test_encode_table_round_trip():
+    df = pd.DataFrame({
+        "id|int": np.array([1, 2, 3]),
+        "exp|float": [1.5, np.nan, -0.0],
+        "flag|bool": [True, "false", np.nan],
+        "name|string": ["a", 1, 2.0],
+        "startTime|time": [datetime.datetime(2024, 1, 1), pd.Timestamp("2024-01-01 00:00:00.000000001"), None],
+        "day": pd.to_datetime(["2024-01-01", "2024-02-01", None]),
+    }, index=pd.RangeIndex(5, 8))
+
+    decoded = output_cache.decode_table(output_cache.encode_table(df))
+
+    assert decoded.equals(df) and decoded.index.equals(df.index)
+    assert list(decoded.dtypes) == list(df.dtypes)
+    for column in df.columns:
+        assert [type(value) for value in decoded[column]] == [type(value) for value in df[column]]
+
+
+def test_shared_parse_cache_is_not_pickled(tmp_path, write_workbook):
+    input_dir = str(tmp_path / "Excel")
+    write_workbook(os.path.join(input_dir, "Level.xlsx"), {"id|int": [1, 2], "name|string": ["a", None]})
+    cache = OutputCache(str(tmp_path / "shared"))
+
+    first = TableRegistry(input_dir, str(tmp_path / "local1"), output_cache=cache).load_all()
+    second = TableRegistry(input_dir, str(tmp_path / "local2"), output_cache=cache).load_all()
+
+    assert second.cache_hits == 1
+    assert second.tables["Level"].equals(first.tables["Level"])
+
+    # 共享目录中的对象被替换为 pickle 数据：不会被反序列化，按未命中重新解析
+    marker = tmp_path / "executed"
+    key = cache.get_table_key(first._get_cache_key(first.content_hashes["Level"]))
+    data = pickle.dumps(Exploit(str(marker)))
+    object_path = cache._get_object_path(output_cache.util.get_bytes_hash(data))
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    with open(object_path, "wb") as f:
+        f.write(data)
+    cache._write_entry(key, {"table": {"hash": output_cache.util.get_bytes_hash(data), "size": len(data)}})
+
+    assert cache.load_table(key) is None
+    third = TableRegistry(input_dir, str(tmp_path / "local3"), output_cache=cache).load_all()
+    assert third.cache_hits == 0 and third.tables["Level"].equals(first.tables["Level"])
+    assert not marker.exists()
+
+
+def test_unsupported_values_are_not_shared(tmp_path):
+    cache = OutputCache(str(tmp_path / "shared"))
+    cache.save_table("key", pd.DataFrame({"value": [object()]}))
+
+    assert cache.load_table("key") is None
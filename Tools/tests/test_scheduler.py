@@ -0,0 +1,55 @@
+import scheduler
+from table_registry import TableRegistry
+
+
+def test_malformed_constraint_fails_only_its_table(project, write_workbook):
+    write_workbook(project.workbook("Level"), {"id|int": [1, 2], "exp|int": [100, 200]})
+    write_workbook(project.workbook("Sample"), {"id|int": [1, 2], "level|int^id(Level)": [1, 2]})
+    write_workbook(project.workbook("Bad"), {"id|int": [1, 2], "x|int^Foo": [1, 2]})
+
+    results = project.build()
+
+    assert not results["Bad"]["ok"]
+    assert "Invalid constraint format" in results["Bad"]["error"]
+    assert results["Level"]["ok"] and results["Sample"]["ok"]
+
+
+def test_malformed_constraint_has_no_references(tmp_path, write_workbook):
+    files = [write_workbook(str(tmp_path / "Bad.xlsx"), {"id|int": [1], "x|int^Foo": [1]})]
+    registry = TableRegistry(str(tmp_path))
+    pipeline = scheduler.PipelineScheduler(registry, files, read_workers=1)
+    ready = []
+
+    pipeline.run(lambda table_name: None, lambda table_name: ready.append(table_name), lambda *args: None)
+
+    assert ready == ["Bad"]
+    assert pipeline.references["Bad"] == []
+    assert "Bad" in registry.errors
+
+
+def write_sized_tables(tmp_path, write_workbook):
+    # 表名顺序与工作簿大小顺序相反
+    return [write_workbook(str(tmp_path / f"{table_name}.xlsx"), {"id|int": list(range(rows))})
+            for table_name, rows in (("A", 10), ("B", 1000), ("C", 5000))]
+
+
+def run_loaded(tmp_path, files, ordered):
+    # 所有表已加载（增量构建或解析缓存命中），不再读取
+    registry = TableRegistry(str(tmp_path)).load_all()
+    pipeline = scheduler.PipelineScheduler(registry, files, ordered=ordered)
+    submitted = []
+    pipeline.run(lambda table_name: None, lambda table_name: submitted.append(table_name), lambda *args: None)
+    assert pipeline.read_count == 0
+    return submitted
+
+
+def test_ready_tables_are_submitted_largest_first(tmp_path, write_workbook):
+    files = write_sized_tables(tmp_path, write_workbook)
+
+    assert run_loaded(tmp_path, files, ordered=False) == ["C", "B", "A"]
+
+
+def test_ordered_tables_are_submitted_by_name(tmp_path, write_workbook):
+    files = write_sized_tables(tmp_path, write_workbook)
+
+    assert run_loaded(tmp_path, files, ordered=True) == ["A", "B", "C"]
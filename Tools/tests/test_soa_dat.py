@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import dat_encoder
+import message_types
+import soa_dat
+from schema import build_table_schema
+from soa_dat import SoaDatReader
+
+COLUMNS = {
+    "id|int": [9, -2, 4, 9, 0, 1 << 30, 3, 8, 5, 6, 7],
+    "power|long|null": [None, -(1 << 62), 1 << 40, 0, 5, None, -1, 2, 3, 4, 6],
+    "rate|float|null": [0.5, None, -1.25, 3.0, 0.0, 1e-3, None, 2.0, 1.0, 4.5, 8.0],
+    "enabled|bool|null": [True, False, None, "TRUE", 0, 1, "false", None, True, False, True],
+    "name|string|null": ["", "a", None, "中文", "a", "b", None, "", "a", "c", "d"],
+    "startTime|time|null": ["2024-01-01-00-00-00", None, "1970-01-01-00-00-00", "1969-12-31-23-59-59",
+                            None, "2000-02-29-12-30-45", None, None, None, None, "2038-01-19-03-14-08"],
+}
+
+
+def write(tmp_path, df, schema):
+    path = tmp_path / f"{schema.table_name}.dat"
+    path.write_bytes(soa_dat.encode_soa_table(df, schema))
+    return str(path)
+
+
+def test_soa_round_trip(tmp_path):
+    df = pd.DataFrame(COLUMNS)
+    schema = build_table_schema("SoaSample", df.columns)
+    table_class, _ = message_types.get_message_classes("SoaSample", schema)
+    rows = table_class.FromString(dat_encoder.encode_table(df, schema)).rows
+
+    with SoaDatReader(write(tmp_path, df, schema)) as reader:
+        assert len(reader) == len(df) and reader.key_field_number == 1
+        for field in schema.fields:
+            number, values = field.field_number, list(df[field.column])
+            assert [reader.is_null(number, row) for row in range(len(df))] == \
+                   [field.nullable and pd.isna(value) for value in values]
+            # 取值与 Protobuf .dat 一致（空值为默认值）
+            if field.field_type == "string":
+                actual = [reader.get_string(number, row) for row in range(len(df))]
+                expected = [getattr(row, field.field_name) for row in rows]
+            elif field.field_type == "time":
+                actual = reader.column(number).tolist()
+                expected = [getattr(row, field.field_name).seconds for row in rows]
+            else:
+                actual = reader.column(number).tolist()
+                expected = [getattr(row, field.field_name) for row in rows]
+            assert actual == expected, field.field_name
+
+        # id 重复时指向最后一行
+        assert reader.find_row(9) == 3 and reader.find_row(1 << 30) == 5 and reader.find_row(-2) == 1
+        assert reader.find_row(100) == -1
+        assert not reader.column(1).flags.owndata
+
+
+def test_strings_are_stored_once(tmp_path):
+    df = pd.DataFrame({"id|int": range(100), "name|string": ["same"] * 100})
+    schema = build_table_schema("SoaStrings", df.columns)
+
+    with SoaDatReader(write(tmp_path, df, schema)) as reader:
+        assert {tuple(entry) for entry in reader.column(2)} == {(0, 4)}
+        assert reader.get_string(2, 99) == "same"
+
+
+def test_empty_table_and_table_without_id(tmp_path):
+    empty = pd.DataFrame({column: [] for column in COLUMNS})
+    schema = build_table_schema("SoaEmpty", empty.columns)
+    with SoaDatReader(write(tmp_path, empty, schema)) as reader:
+        assert len(reader) == 0 and reader.column(2).size == 0 and reader.find_row(1) == -1
+
+    df = pd.DataFrame({"level|int": [3, 1, 2]})
+    schema = build_table_schema("SoaNoKey", df.columns)
+    with SoaDatReader(write(tmp_path, df, schema)) as reader:
+        assert reader.key_field_number == 0 and reader.find_row(1) == -1
+        assert reader.column(1).dtype == np.dtype("<i4") and reader.column(1).tolist() == [3, 1, 2]
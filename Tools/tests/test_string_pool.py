@@ -0,0 +1,96 @@
+import os
+import pytest
+import string_pool
+from string_pool import POOL_TABLE_NAME, StringPool
+
+
+def write_tables(project, write_workbook, item_names=("sword", "shield")):
+    write_workbook(project.workbook("Item"), {"id|int": list(range(1, len(item_names) + 1)),
+                                              "name|string": list(item_names)})
+
+
+def write_level(project, write_workbook):
+    write_workbook(project.workbook("Level"), {"id|int": [1, 2], "title|string": ["start", "sword"]})
+
+
+def load_pool(project):
+    return StringPool.load(os.path.join(project.dat_dir, f"{POOL_TABLE_NAME}.dat"))
+
+
+def pool_files(project):
+    return [os.path.join(project.proto_dir, f"{POOL_TABLE_NAME}.proto"),
+            os.path.join(project.dat_dir, f"{POOL_TABLE_NAME}.dat"),
+            os.path.join(project.python_out_dir, f"{POOL_TABLE_NAME}_pb2.py"),
+            os.path.join(project.csharp_out_dir, f"{POOL_TABLE_NAME}.cs"),
+            os.path.join(project.csharp_out_dir, string_pool.ACCESSOR_FILE_NAME)]
+
+
+def test_incremental_build_only_appends(project, write_workbook):
+    write_level(project, write_workbook)
+    write_tables(project, write_workbook)
+    assert all(result["ok"] for result in project.build(string_pool=True).values())
+    before = load_pool(project).values
+    assert before[0] == ""
+
+    # 删除 shield、新增 bow：已有下标不变，新字符串追加在末尾，未变化的表不重建
+    write_tables(project, write_workbook, ("bow", "sword"))
+    results = project.build(string_pool=True)
+
+    assert sorted(results) == ["Item"] and results["Item"]["ok"]
+    after = load_pool(project).values
+    assert after[:len(before)] == before and after[len(before):] == ["bow"]
+
+
+def test_missing_pool_rebuilds_everything(project, write_workbook):
+    write_level(project, write_workbook)
+    write_tables(project, write_workbook)
+    project.build(string_pool=True)
+    before = load_pool(project).values
+
+    os.remove(os.path.join(project.dat_dir, f"{POOL_TABLE_NAME}.dat"))
+    results = project.build(string_pool=True)
+
+    assert sorted(results) == ["Item", "Level"]
+    assert load_pool(project).values == before
+
+
+def test_disabling_removes_pool_outputs(project, write_workbook):
+    write_tables(project, write_workbook)
+    project.build(string_pool=True)
+    assert all(os.path.exists(path) for path in pool_files(project))
+
+    results = project.build()
+
+    assert sorted(results) == ["Item"] and results["Item"]["ok"]
+    assert not any(os.path.exists(path) for path in pool_files(project))
+
+
+def test_process_engine_uses_the_same_ids(project, write_workbook, monkeypatch):
+    write_level(project, write_workbook)
+    write_tables(project, write_workbook)
+    project.build(string_pool=True)
+    outputs = {table_name: project.outputs(table_name)["dat"] for table_name in ("Item", "Level")}
+    expected = {table_name: open(path, "rb").read() for table_name, path in outputs.items()}
+    values = load_pool(project).values
+
+    subsets = []
+    subset = StringPool.subset
+    monkeypatch.setattr(StringPool, "subset", lambda self, strings: subsets.append(sorted(strings))
+                        or subset(self, strings))
+    results = project.build(string_pool=True, full_rebuild=True, engine="process", workers=2)
+
+    # 子进程只拿到本表字符串的子集
+    assert all(result["ok"] for result in results.values())
+    assert sorted(subsets) == [["shield", "sword"], ["start", "sword"]]
+    assert load_pool(project).values == values
+    assert {table_name: open(path, "rb").read() for table_name, path in outputs.items()} == expected
+
+
+def test_subset_keeps_ids():
+    pool = StringPool(["a", "b", "c"])
+
+    subset = pool.subset(["c", "a"])
+
+    assert subset.get_ids(["c", "", "a"]).tolist() == [3, 0, 1]
+    with pytest.raises(ValueError, match="not found in string pool"):
+        subset.get_ids(["b"])
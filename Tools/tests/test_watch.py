@@ -0,0 +1,52 @@
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from conftest import TOOLS_DIR
+
+
+def start_watch(project, *options):
+    process = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(TOOLS_DIR, "main.py"), project.input_dir, project.proto_dir,
+         project.dat_dir, project.python_out_dir, project.csharp_out_dir, "--watch", "--poll-interval", "0.05",
+         *options],
+        cwd=project.root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8")
+    lines = queue.Queue()
+    threading.Thread(target=lambda: [lines.put(line) for line in process.stdout], daemon=True).start()
+    return process, lines
+
+
+def wait_for(lines, text, timeout=30):
+    deadline = time.monotonic() + timeout
+    output = []
+    while time.monotonic() < deadline:
+        try:
+            line = lines.get(timeout=deadline - time.monotonic())
+        except queue.Empty:
+            break
+        output.append(line)
+        if text in line:
+            return line
+    raise AssertionError(f"'{text}' not found in output:\n{''.join(output)}")
+
+
+def test_failed_rebuild_keeps_watching(project, write_workbook):
+    write_workbook(project.workbook("Level"), {"id|int": [1], "name|string": ["a"]})
+    process, lines = start_watch(project, "--string-pool")
+    try:
+        wait_for(lines, "Watching")
+
+        # 保留表名：整次构建抛出 ValueError，监视模式报告错误后继续运行
+        write_workbook(project.workbook("ConfigStrings"), {"id|int": [1]})
+        assert "reserved for the string pool" in wait_for(lines, "Rebuild failed")
+        assert process.poll() is None
+
+        os.remove(project.workbook("ConfigStrings"))
+        write_workbook(project.workbook("Level"), {"id|int": [1, 2], "name|string": ["a", "b"]})
+        wait_for(lines, "[Rebuilt in")
+        assert process.poll() is None
+    finally:
+        process.kill()
+        process.wait()
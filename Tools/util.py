@@ -1,3 +1,8 @@
+import hashlib
+import os
+import threading
+
+
 def get_field_components(field_definition):
     """
     解析字段定义，返回字段成分字典。
@@ -59,4 +64,111 @@ def parse_constraint(constraint):
     if not field_ref or not table_name:
         raise ValueError(f"Invalid constraint format: '{constraint}' (field or table name is empty)")
 
-    return field_ref.strip(), table_name.strip()
\ No newline at end of file
+    return field_ref.strip(), table_name.strip()
+
+# 不引用其他表的约束：Range(min,max) 数值范围；Index(unique|multi) 生成 Config 的二级索引；
+# Backend(protobuf|soa) .dat 格式；Priority(n) 客户端加载优先级
+NON_REFERENCE_CONSTRAINTS = ("Range", "Index", "Backend", "Priority")
+
+# 工具版本号：输出格式或解析逻辑变化时需同步修改，用于使各类缓存失效
+TOOL_VERSION = "0.1.0"
+
+
+def get_file_hash(file_path, chunk_size=1 << 20):
+    """
+    计算文件内容的 SHA-256 摘要。
+
+    :param file_path: 文件路径
+    :param chunk_size: 每次读取的字节数
+    :return: 十六进制摘要字符串
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_bytes_hash(data):
+    """
+    计算字节串的 SHA-256 摘要。
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_file_if_changed(file_path, data):
+    """
+    仅在内容变化时写文件，保持未变化文件的修改时间不变（避免 Unity 重新导入）。
+
+    先写入同目录下的临时文件再替换目标文件：正在内存映射旧文件的进程（如 config_database.py）读到的仍是完整的旧内容，
+    不会看到写了一半的文件。
+
+    :param file_path: 目标文件路径
+    :param data: 要写入的 bytes 或 str（str 按 UTF-8 编码）
+    :return: 是否实际写入了文件
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+
+    if os.path.exists(file_path) and os.path.getsize(file_path) == len(data):
+        with open(file_path, 'rb') as f:
+            if f.read() == data:
+                return False
+
+    tmp_path = get_temp_path(file_path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def get_temp_path(file_path):
+    """
+    同目录下、当前进程和线程专用的临时文件路径。
+    """
+    return f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def replace_file_if_changed(tmp_path, file_path, chunk_size=1 << 20):
+    """
+    用已写完的临时文件替换目标文件；内容相同时删除临时文件，保持目标文件不变。
+    用于分块写出、不在内存中保留完整内容的文件，逐块比较内容。
+
+    :return: 是否实际替换了文件
+    """
+    try:
+        if os.path.exists(file_path) and os.path.getsize(file_path) == os.path.getsize(tmp_path):
+            with open(file_path, 'rb') as old, open(tmp_path, 'rb') as new:
+                while True:
+                    old_chunk = old.read(chunk_size)
+                    if old_chunk != new.read(chunk_size):
+                        break
+                    if not old_chunk:
+                        return False
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+
+def get_referenced_tables(columns):
+    """
+    从表头中收集外键约束引用的表名（不含 Range、Index 等非外键约束）。
+
+    :param columns: 表头列表
+    :return: 表名集合
+    """
+    referenced_tables = set()
+    for column in columns:
+        constraints = get_field_components(column).get("constraints")
+        if not constraints:
+            continue
+        for field_ref, table_name in constraints.items():
+            if field_ref not in NON_REFERENCE_CONSTRAINTS:
+                referenced_tables.add(table_name)
+    return referenced_tables
@@ -1,160 +1,69 @@
-import util
+import numpy as np
 import pandas as pd
-from google.protobuf.timestamp_pb2 import Timestamp
-from datetime import datetime, timezone
+from dat_encoder import parse_time_seconds
 
-def validate_excel(df: pd.DataFrame, all_excel_data):
-    # 遍历 DataFrame，找到空白行并停止读取
-    for index, row in df.iterrows():
-        if row.isnull().all():  # 如果一行所有列为空，视为空白行
-            df = df.iloc[:index]
-            break
+# 数据第一行在 Excel 中的行号（第 1 行为表头）
+FIRST_DATA_ROW = 2
+
+# 错误信息中最多列出的行号个数
+MAX_REPORTED_ROWS = 10
+
+def validate_excel(df: pd.DataFrame, schema, key_index):
+    """
+    :param df: 表数据
+    :param schema: 该表的 TableSchema
+    :param key_index: 跨表外键索引 KeyIndex
+    :return: 截断到第一个空白行之前的表数据
+    """
+    # 找到空白行并停止读取
+    df = truncate_at_blank_row(df)
 
     # 验证表头
-    validate_header(df.columns, all_excel_data)
+    validate_header(schema, key_index)
     # 验证数据
-    validate_data(df, all_excel_data)
+    validate_data(df, schema, key_index)
+    return df
 
 
-def validate_header(columns, all_excel_data: dict):
+def truncate_at_blank_row(df: pd.DataFrame):
     """
-    验证表头格式，支持以下形式：
-    name|type^optional_field_ref(table)|optional_null
+    用整行空值掩码找到第一个空白行（所有列为空），返回其之前的部分。
     """
+    blank = df.isnull().all(axis=1).to_numpy()
+    if not blank.any():
+        return df
+    return df.iloc[:int(np.argmax(blank))]
 
-    seen_fields = set()  # 用于检查字段重复
-    supported_types = {'int', 'long', 'float', 'string', 'bool', 'time'}  # 支持的类型
-
-    for index, column in enumerate(columns):
-
-        components = util.get_field_components(column)
-
-        field_name = components.get("field_name")
-        field_type = components.get("field_type")
-        constraints = components.get("constraints")
-        nullable_flag = components.get("nullable_flag")
-
-        # 检查字段名+类型
-        if field_name == None or field_type == None:
-            raise ValueError(f"Invalid header format in column {index}: '{column}' (expected format: name|type^optional_field_ref(table)|optional_null)")
-
-        # 检查字段类型是否合法
-        if field_type not in supported_types:
-            raise ValueError(f"Unsupported type in column {index}: '{field_type}'")
-
-        # 检查字段名是否重复
-        if field_name in seen_fields:
-            raise ValueError(f"Duplicate field name '{field_name}' in column {index}")
-
-        # 检查字段链接有效性
-        if constraints != None and len(constraints) > 0:
-
-            for field_ref, table_name in constraints.items():
-
-                """
-                讨论 constraint 的不同形式
-                """
-
-                if field_ref == "Range": # 数值范围
-                    if field_type != "int" and field_type != "long" and field_type != "float":
-                        raise ValueError(f"Invalid constraint defined in: {column}. 'Range' can only be applied to numbers.")
-                    else:
-                        range_components = table_name.split(',')
-                        if len(range_components) != 2:
-                            raise ValueError(f"Invalid 'Range' definition in: {column}.")
-                        
-                        range_min = range_components[0].strip()
-                        range_max = range_components[1].strip()
-
-                        if field_type == "int" or field_type == "long":
-                            try:
-                                range_min = int(range_min)
-                            except Exception as e:
-                                raise ValueError(f"Invalid 'Range' min definition in: {column}. Exception: {e}")
-
-                            if range_max != "!":
-                                try:
-                                    range_max = int(range_max)
-                                except Exception as e:
-                                    raise ValueError(f"Invalid 'Range' min definition in: {column}. Exception: {e}")
-
-                                if range_min >= range_max:
-                                    raise ValueError(f"Invalid 'Range' definition in: {column}.")
-                            
-                        elif field_type == "float":
-                            try:
-                                range_min = float(range_min)
-                            except Exception as e:
-                                raise ValueError(f"Invalid 'Range' min definition in: {column}. Exception: {e}")
-
-                            if range_max != "!":
-                                try:
-                                    range_max = float(range_max)
-                                except Exception as e:
-                                    raise ValueError(f"Invalid 'Range' min definition in: {column}. Exception: {e}")
-
-                                if range_min >= range_max:
-                                    raise ValueError(f"Invalid 'Range' definition in: {column}.")
-                                
-                        else:
-                            raise ValueError(f"Invalid field_type: {field_type}")
-                            
-                
-                else: # 字段链接
-                    # 遍历all_excel_data，确认目标table中是否存在列field_ref
-                    is_passed = False
-
-                    if table_name not in all_excel_data:
-                        raise ValueError(f"Invalid constraint defined in: {column}. Table '{table_name}' is not found.")
-
-                    df = pd.DataFrame(all_excel_data.get(table_name))
-                    if df is not None and not df.empty:
-                        for column_ref in df.columns.tolist():
-                            components_ref = util.get_field_components(column_ref)
-                            if components_ref.get("field_name") == field_ref:
-                                is_passed = True
-                                break
-
-                    if not is_passed:
-                        raise ValueError(f"Invalid constraint defined in: {column}. {field_ref} not found in {table_name}")
-
-        # 检查空标记
-        if nullable_flag != None and nullable_flag.lower() != "null":
-            raise ValueError(f"Invalid null flag in column {index}: '{nullable_flag}' (expected 'null' or 'NULL')")
-
-        seen_fields.add(field_name)
-
-
-def validate_data(df: pd.DataFrame, all_excel_data):
+
+def validate_header(schema, key_index):
     """
-    验证数据，根据字段类型和是否允许空值进行检查
+    验证表头。格式、类型、重复字段、Range 定义和空标记在 schema.build_table_schema 中已检查，
+    这里检查外键链接的目标表和字段是否存在。
     """
+    schema.resolve_foreign_keys(key_index.schemas)
 
-    for column in df.columns:
 
-        components = util.get_field_components(column)
-        field_name = components.get("field_name")
-        field_type = components.get("field_type")
-        constraints = components.get("constraints")
-        nullable_flag = components.get("nullable_flag")            
+def validate_data(df: pd.DataFrame, schema, key_index, row_offset=0):
+    """
+    验证数据，根据字段类型和是否允许空值进行检查
 
-        # 检查空标记
-        if nullable_flag == None:
-            allow_null = False
-        else:
-            if nullable_flag.lower() != "null":
-                raise ValueError(f"Invalid null flag in column {index}: '{nullable_flag}' (expected 'null' or 'NULL')")
-            allow_null = True
+    :param row_offset: df 第一行在整张表中的行位置（分块模式下逐批验证时用于报告 Excel 行号）
+    """
 
-        column_data = df[column]
+    for field in schema.fields:
+
+        field_name = field.field_name
+        field_type = field.field_type
+        column_data = df[field.column]
 
         # 空值验证
-        if not allow_null:
-            if column_data.isnull().any():
-                raise ValueError(f"Column '{field_name}' contains null values but null is not allowed.")
+        if not field.nullable:
+            null_rows = np.flatnonzero(column_data.isnull().to_numpy())
+            if len(null_rows) > 0:
+                raise ValueError(f"Column '{field_name}' contains null values but null is not allowed{format_rows(null_rows, row_offset)}.")
 
         # 类型验证（使用矢量化操作）
-        if field_type == 'int':
+        if field_type in ('int', 'long'):
             if not pd.api.types.is_integer_dtype(column_data):
                 raise ValueError(f"Column '{field_name}' contains non-integer values.")
         elif field_type == 'float':
@@ -167,92 +76,104 @@ def validate_data(df: pd.DataFrame, all_excel_data):
             except Exception as e:
                 raise ValueError(f"Column '{field_name}' contains values that cannot be converted to string: {e}")
         elif field_type == 'bool':
-            if not column_data.map(is_valid_bool).all():
-                raise ValueError(f"Column '{field_name}' contains invalid boolean values.")
+            invalid_rows = find_invalid_bool_rows(column_data)
+            if len(invalid_rows) > 0:
+                raise ValueError(f"Column '{field_name}' contains invalid boolean values{format_rows(invalid_rows, row_offset)}.")
         elif field_type == 'time':
-            if not column_data.map(is_valid_time).all():
-                raise ValueError(f"Column '{field_name}' contains invalid time values.")
+            invalid_rows = find_invalid_time_rows(column_data)
+            if len(invalid_rows) > 0:
+                raise ValueError(f"Column '{field_name}' contains invalid time values{format_rows(invalid_rows, row_offset)}.")
         else:
             raise ValueError(f"Unsupported field type '{field_type}' in column '{field_name}'.")
 
         # 约束验证
-        if constraints:
-            validate_constraints(column_data, constraints, all_excel_data, field_name)
+        if field.has_range or field.foreign_keys or field.index_kind == "unique":
+            validate_constraints(column_data, field, key_index, schema.table_name, row_offset)
 
         continue
 
 
-def validate_constraints(column_data, constraints, all_excel_data, field_name):
+def validate_constraints(column_data, field, key_index, table_name=None, row_offset=0):
     """
-    验证字段的约束条件，包括数值范围和外键关系。
+    验证字段的约束条件，包括数值范围、外键关系和唯一索引。外键目标值从共享的 key_index 中查找，空值不参与外键检查。
     """
-    for field_ref, table_name in constraints.items():
-        if field_ref == "Range":
-            # 范围验证
-            range_components = table_name.split(',')
-            range_min = float(range_components[0].strip())
-            range_max = float(range_components[1].strip()) if range_components[1].strip() != "!" else float("inf")
-            if not ((column_data >= range_min) & (column_data < range_max)).all():
-                raise ValueError(f"Column '{field_name}' has values out of range [{range_min}, {range_max}).")
-        else:
-            # 外键验证
-            if table_name not in all_excel_data:
-                raise ValueError(f"Table '{table_name}' referenced in column '{field_name}' not found.")
-            
-            foreign_table = all_excel_data[table_name]
-            
-            # 在 foreign_table.columns 中找到与 field_ref 匹配的字段
-            matching_column = None
-            for col in foreign_table.columns:
-                components = util.get_field_components(col)
-                if components["field_name"] == field_ref:
-                    matching_column = col
-                    break
-            
-            if matching_column is None:
-                raise ValueError(f"Field '{field_ref}' not found in table '{table_name}'.")
-            
-            # 提取外键列的所有唯一值进行验证
-            foreign_values = foreign_table[matching_column].dropna().unique()
-            if not column_data.isin(foreign_values).all():
-                raise ValueError(f"Column '{field_name}' contains values not found in '{field_ref}' of table '{table_name}'.")
-
-
-
-def is_valid_bool(value):
+    field_name = field.field_name
+
+    if field.has_range:
+        # 范围验证
+        range_min = float(field.range_min)
+        range_max = float(field.range_max) if field.range_max is not None else float("inf")
+        out_of_range = ~((column_data >= range_min) & (column_data < range_max)).to_numpy()
+        if out_of_range.any():
+            raise ValueError(f"Column '{field_name}' has values out of range [{range_min}, {range_max})"
+                             f"{format_rows(np.flatnonzero(out_of_range), row_offset)}.")
+
+    for fk in field.foreign_keys:
+        # 外键验证
+        if not key_index.has_table(fk.table_name):
+            raise ValueError(f"Table '{fk.table_name}' referenced in column '{field_name}' not found.")
+
+        referrer = f"{table_name}.{field_name}" if table_name else None
+        missing = key_index.find_missing(column_data, fk.table_name, fk.field_name, referrer)
+        if missing.any():
+            raise ValueError(f"Column '{field_name}' contains values not found in '{fk.field_name}' of table '{fk.table_name}'"
+                             f"{format_rows(np.flatnonzero(missing), row_offset)}.")
+
+    if field.index_kind == "unique":
+        # 唯一索引验证（空值不参与）
+        duplicated = (column_data.duplicated(keep=False) & column_data.notna()).to_numpy()
+        if duplicated.any():
+            raise ValueError(f"Column '{field_name}' has duplicate values in a unique index"
+                             f"{format_rows(np.flatnonzero(duplicated), row_offset)}.")
+
+
+def find_invalid_bool_rows(column_data: pd.Series):
     """
-    验证布尔值是否有效，包括以下形式：
+    找出非法布尔值所在的行（空值不在此检查）。合法形式：
     1. 布尔类型：True, False
     2. 数值类型：0, 1
     3. 字符串类型："true", "false"（不区分大小写）
+
+    :return: 非法值的行位置数组
     """
+    if pd.api.types.is_bool_dtype(column_data):
+        return np.zeros(0, dtype=np.int64)
 
-    if isinstance(value, bool):
-        return True
-    if isinstance(value, (int, float)) and int(value) in [0, 1]:
-        return True
-    if isinstance(value, str) and value.lower() in ['true', 'false']:
-        return True
-    return False
-
-
-def is_valid_time(value):
-    try:
-        if isinstance(value, str):
-            components = value.split("-")
-            if len(components) != 6:
-                return False
-            
-            # 提取时间组件
-            year, month, day, hour, minute, second = map(int, components)
-            
-            # 构造 UTC 时间对象
-            dt = datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc)
-            
-            # 转换为 Protobuf Timestamp
-            timestamp = Timestamp()
-            timestamp.FromDatetime(dt)
-            return True
-
-    except ValueError:
-        return False
+    notnull = column_data.notnull().to_numpy()
+    if pd.api.types.is_numeric_dtype(column_data):
+        valid = np.isin(np.trunc(column_data.to_numpy(dtype=np.float64)), (0, 1))
+        return np.flatnonzero(notnull & ~valid)
+
+    # 混合类型列：字符串统一小写去空格后用 isin 判断，数值按截断后是否为 0/1 判断
+    is_str = (column_data.map(type) == str).to_numpy()
+    strings = column_data.where(is_str).str.strip().str.lower()
+    valid_str = strings.isin(("true", "false")).to_numpy()
+
+    numbers = pd.to_numeric(column_data.where(~is_str), errors="coerce").to_numpy(dtype=np.float64)
+    valid_number = np.isin(np.trunc(numbers), (0, 1))
+
+    valid = np.where(is_str, valid_str, valid_number)
+    return np.flatnonzero(notnull & ~valid)
+
+
+def find_invalid_time_rows(column_data: pd.Series):
+    """
+    找出不符合 'yyyy-MM-dd-HH-mm-ss' 的时间值所在的行（空值不在此检查）。整列按格式一次性解析。
+
+    :return: 非法值的行位置数组
+    """
+    _, invalid = parse_time_seconds(column_data)
+    return np.flatnonzero(invalid & column_data.notnull().to_numpy())
+
+
+def format_rows(positions, row_offset=0):
+    """
+    把行位置转换为 Excel 行号描述，如 " at Excel row(s) 2, 5, 9"
+
+    :param row_offset: 加到每个行位置上的偏移
+    """
+    rows = [str(int(position) + row_offset + FIRST_DATA_ROW) for position in positions[:MAX_REPORTED_ROWS]]
+    text = f" at Excel row(s) {', '.join(rows)}"
+    if len(positions) > MAX_REPORTED_ROWS:
+        text += f" and {len(positions) - MAX_REPORTED_ROWS} more"
+    return text
@@ -0,0 +1,68 @@
+import os
+import time
+from table_registry import list_excel_files
+
+# 检测到变化后等待文件稳定的时间（Excel 保存时会先写临时文件再替换）
+SETTLE_SECONDS = 0.2
+
+
+class ExcelWatcher:
+    """
+    轮询 Excel 目录，按修改时间和大小检测新增、修改和删除的工作簿。
+    不依赖第三方文件监听库，Windows/Mac 行为一致。
+    """
+
+    def __init__(self, input_dir):
+        self.input_dir = input_dir
+        self.snapshot = self._take_snapshot()
+
+    def poll(self):
+        """
+        :return: (新增或修改的工作簿路径列表, 删除的工作簿路径列表)
+        """
+        snapshot = self._take_snapshot()
+        if snapshot == self.snapshot:
+            return [], []
+
+        # 等待正在保存的文件写完
+        while True:
+            time.sleep(SETTLE_SECONDS)
+            settled = self._take_snapshot()
+            if settled == snapshot:
+                break
+            snapshot = settled
+
+        changed = sorted(path for path, stat in snapshot.items() if self.snapshot.get(path) != stat)
+        removed = sorted(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changed, removed
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for file_path in list_excel_files(self.input_dir):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+
+def watch(input_dir, on_change, poll_interval=0.5):
+    """
+    持续监视 Excel 目录，有变化时调用 on_change(changed, removed)；Ctrl+C 退出。
+
+    :param input_dir: Excel 目录
+    :param on_change: 回调，参数为新增/修改和删除的工作簿路径列表
+    :param poll_interval: 轮询间隔（秒）
+    """
+    watcher = ExcelWatcher(input_dir)
+    print(f"\nWatching {input_dir} for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            changed, removed = watcher.poll()
+            if changed or removed:
+                on_change(changed, removed)
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")